@@ -1,6 +1,12 @@
 from django.contrib import admin
 
-from api.models import Client, Distribution, Message
+from api.models import (
+    Client,
+    Distribution,
+    DistributionSchedule,
+    FailedDelivery,
+    Message,
+)
 
 
 class ClientAdmin(admin.ModelAdmin):
@@ -22,8 +28,10 @@ class DistributionAdmin(admin.ModelAdmin):
         "message_text",
         "client_filter_operator_code",
         "client_filter_tag",
+        "priority",
+        "state",
     )
-    list_filter = ("client_filter_operator_code", "client_filter_tag")
+    list_filter = ("state", "client_filter_operator_code", "client_filter_tag")
     search_fields = ("message_text",)
 
     fieldsets = (
@@ -36,6 +44,8 @@ class DistributionAdmin(admin.ModelAdmin):
                     "message_text",
                     "client_filter_operator_code",
                     "client_filter_tag",
+                    "priority",
+                    "state",
                 ),
             },
         ),
@@ -48,6 +58,7 @@ class DistributionAdmin(admin.ModelAdmin):
     )
 
     readonly_fields = (
+        "state",
         "total_messages",
         "sent_messages",
         "not_sent_messages",
@@ -57,6 +68,11 @@ class DistributionAdmin(admin.ModelAdmin):
         return obj.total_messages - obj.sent_messages
 
 
+class DistributionScheduleAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "run_at", "claimed_at")
+    raw_id_fields = ("distribution",)
+
+
 class MessageAdmin(admin.ModelAdmin):
     list_display = (
         "__str__",
@@ -69,6 +85,21 @@ class MessageAdmin(admin.ModelAdmin):
     search_fields = ("distribution__message_text", "client__phone_number")
 
 
+class FailedDeliveryAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "attempts",
+        "error",
+        "status_code",
+        "last_attempt_at",
+        "next_attempt_at",
+    )
+    list_filter = ("error", "status_code")
+    raw_id_fields = ("message",)
+
+
 admin.site.register(Client, ClientAdmin)
 admin.site.register(Distribution, DistributionAdmin)
+admin.site.register(DistributionSchedule, DistributionScheduleAdmin)
 admin.site.register(Message, MessageAdmin)
+admin.site.register(FailedDelivery, FailedDeliveryAdmin)
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+from typing import Iterable, Iterator, Sequence
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.utils import split_into_batches
+from config.settings import EXPORT_CHUNK_SIZE
+
+CLIENT_EXPORT_FIELDS = ("id", "phone_number", "operator_code", "tag", "timezone")
+MESSAGE_EXPORT_FIELDS = ("id", "created_at", "status", "distribution", "client")
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+def render_csv(rows: Iterable[Sequence]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def render_ndjson(fields: Sequence[str], rows: Iterable[Sequence]) -> str:
+    encoder = JSONEncoder(ensure_ascii=False)
+    return "".join(encoder.encode(dict(zip(fields, row))) + "\n" for row in rows)
+
+
+def iter_export(
+    queryset: QuerySet,
+    fields: Sequence[str],
+    file_format: str,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Renders a queryset as CSV with a header row or as NDJSON chunk by chunk.
+
+    The rows are read with a server-side cursor and only one chunk
+    of them is held in memory, so memory use does not depend on the number of rows.
+
+    Args:
+        queryset (QuerySet): The objects to export, ordered.
+        fields (Sequence[str]): The exported fields.
+        file_format (str): 'csv' or 'ndjson'.
+        chunk_size (int): The number of rows fetched and rendered at a time.
+
+    Yields:
+        bytes: The next rendered chunk of rows.
+    """
+
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+    if file_format == "csv":
+        yield render_csv([fields]).encode()
+
+    for chunk in split_into_batches(rows, chunk_size):
+        if file_format == "csv":
+            yield render_csv(chunk).encode()
+        else:
+            yield render_ndjson(fields, chunk).encode()
+
+
+def export_response(
+    queryset: QuerySet, fields: Sequence[str], file_format: str, filename: str
+) -> StreamingHttpResponse:
+    """
+    Streams an export of a queryset as a file attachment.
+
+    Args:
+        queryset (QuerySet): The objects to export, ordered.
+        fields (Sequence[str]): The exported fields.
+        file_format (str): 'csv' or 'ndjson'.
+        filename (str): The attachment file name without an extension.
+
+    Returns:
+        StreamingHttpResponse: The response rendering the rows while it is sent.
+    """
+
+    response = StreamingHttpResponse(
+        iter_export(queryset, fields, file_format),
+        content_type=EXPORT_CONTENT_TYPES[file_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+
+    return response
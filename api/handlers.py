@@ -3,7 +3,8 @@ from django.dispatch import receiver
 from django.utils import timezone
 
 from api.logs import logger
-from api.models import Distribution
+from api.models import Distribution, DistributionSchedule
+from api.send_context import forget_send_context
 from api.tasks import start_distribution_task
 
 
@@ -16,6 +17,12 @@ def handle_distribution_creation(
     checks conditions for execution,
     sends messages to clients if conditions are met.
 
+    A distribution that starts later is scheduled, and is started
+    by start_due_distributions when its start time comes.
+    If the start time of a scheduled distribution is changed,
+    the distribution is rescheduled. Starts scheduled for other times,
+    such as a failed start retried an hour later, are kept.
+
     Args:
         sender: The sender of the distribution (Distribution model).
         instance: The instance of the distribution model.
@@ -24,6 +31,15 @@ def handle_distribution_creation(
     """
 
     if not created:
+        forget_send_context(instance.id)
+        saved_start_time = getattr(instance, "saved_start_datetime", None)
+        if saved_start_time is not None and saved_start_time != instance.start_datetime:
+            DistributionSchedule.objects.filter(
+                distribution=instance,
+                client_timezone__isnull=True,
+                claimed_at__isnull=True,
+                run_at=saved_start_time,
+            ).update(run_at=instance.start_datetime)
         return
 
     current_time = timezone.now()
@@ -31,13 +47,17 @@ def handle_distribution_creation(
     end_time = instance.end_datetime
 
     if start_time <= current_time <= end_time:
-        start_distribution_task.apply_async(args=[instance.id], countdown=0)
+        DistributionSchedule.objects.create(
+            distribution=instance, run_at=start_time, claimed_at=current_time
+        )
+        start_distribution_task.apply_async(
+            args=[instance.id], countdown=0, priority=instance.priority
+        )
         return
 
     if current_time <= start_time <= end_time:
         logger.info(f"Distribution #{instance.id}: Will start at {start_time}.")
-        delay = (start_time - current_time).total_seconds()
-        start_distribution_task.apply_async(args=[instance.id], countdown=delay)
+        DistributionSchedule.objects.create(distribution=instance, run_at=start_time)
         return
 
     logger.info(f"Distribution #{instance.id}: Will not be started!")
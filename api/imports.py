@@ -0,0 +1,249 @@
+import codecs
+import csv
+import io
+import json
+import re
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from api.logs import logger
+from api.models import Client
+from api.utils import split_into_batches
+from config.settings import CLIENT_IMPORT_CHUNK_SIZE
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+PHONE_NUMBER_PATTERN = re.compile(r"7\d{10}")
+OPERATOR_CODE_PATTERN = re.compile(r"\d{3}")
+TAG_MAX_LENGTH = Client._meta.get_field("tag").max_length
+MIN_TIMEZONE = -12
+MAX_TIMEZONE = 14
+
+STAGING_TABLE_SQL = """
+CREATE TEMPORARY TABLE client_import (
+    line integer,
+    phone_number varchar(12),
+    operator_code varchar(3),
+    tag varchar(255),
+    timezone smallint
+) ON COMMIT DROP
+"""
+
+# The last row of a phone number in the chunk wins. Unchanged clients are not
+# rewritten, and xmax = 0 tells inserted rows from updated ones.
+UPSERT_SQL = """
+WITH upserted AS (
+    INSERT INTO api_client (phone_number, operator_code, tag, timezone)
+    SELECT DISTINCT ON (phone_number) phone_number, operator_code, tag, timezone
+    FROM client_import
+    ORDER BY phone_number, line DESC
+    ON CONFLICT (phone_number) DO UPDATE SET
+        operator_code = EXCLUDED.operator_code,
+        tag = EXCLUDED.tag,
+        timezone = EXCLUDED.timezone
+    WHERE (api_client.operator_code, api_client.tag, api_client.timezone)
+        IS DISTINCT FROM (EXCLUDED.operator_code, EXCLUDED.tag, EXCLUDED.timezone)
+    RETURNING xmax = 0 AS created
+)
+SELECT
+    count(*) FILTER (WHERE created),
+    count(*) FILTER (WHERE NOT created)
+FROM upserted
+"""
+
+Row = Tuple[int, Optional[dict]]
+
+
+def iter_lines(stream: IO[bytes], block_size: int = 1 << 20) -> Iterator[str]:
+    """
+    Decodes a UTF-8 stream by large blocks and splits it into lines,
+    which is much faster than decoding it line by line.
+
+    Args:
+        stream (IO[bytes]): The stream to read from.
+        block_size (int): The number of bytes read at a time.
+
+    Yields:
+        str: The next line with its line break.
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+
+    while True:
+        block = stream.read(block_size)
+        lines = (tail + decoder.decode(block, final=not block)).split("\n")
+        tail = lines.pop()
+
+        for line in lines:
+            yield line + "\n"
+
+        if not block:
+            break
+
+    if tail:
+        yield tail
+
+
+def read_rows(stream: IO[bytes], file_format: str) -> Iterator[Row]:
+    """
+    Reads client rows from a UTF-8 CSV stream with a header row
+    or from an NDJSON stream with one JSON object per line.
+
+    Args:
+        stream (IO[bytes]): The stream to read from.
+        file_format (str): 'csv' or 'ndjson'.
+
+    Yields:
+        Row: The line number and the row, or None if the line is not a JSON object.
+    """
+
+    lines = iter_lines(stream)
+
+    if file_format == "csv":
+        reader = csv.reader(lines)
+        header = next(reader, [])
+        for row in reader:
+            yield reader.line_num, dict(zip(header, row))
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def validate_rows(rows: Iterable[Row]) -> Tuple[List[tuple], List[dict]]:
+    """
+    Validates and normalizes client rows in a single pass.
+    An empty operator code is taken from the phone number.
+
+    Args:
+        rows (Iterable[Row]): The line numbers and rows.
+
+    Returns:
+        Tuple[List[tuple], List[dict]]: The valid clients as
+            (line, phone_number, operator_code, tag, timezone) tuples,
+            and the errors of invalid rows as {'line': ..., 'errors': {...}}.
+    """
+
+    clients = []
+    errors = []
+
+    for line, row in rows:
+        if row is None:
+            errors.append(
+                {"line": line, "errors": {"non_field_errors": "Invalid JSON object."}}
+            )
+            continue
+
+        row_errors = {}
+
+        phone_number = str(row.get("phone_number") or "").strip()
+        if not PHONE_NUMBER_PATTERN.fullmatch(phone_number):
+            row_errors["phone_number"] = "Expected format: 7XXXXXXXXXX."
+
+        operator_code = str(row.get("operator_code") or "").strip()
+        if not operator_code:
+            operator_code = phone_number[1:4]
+        if not OPERATOR_CODE_PATTERN.fullmatch(operator_code):
+            row_errors["operator_code"] = "Expected 3 digits."
+
+        tag = str(row.get("tag") or "")
+        if len(tag) > TAG_MAX_LENGTH:
+            row_errors["tag"] = f"Expected at most {TAG_MAX_LENGTH} characters."
+
+        timezone = str(row.get("timezone") or 0).strip()
+        try:
+            timezone = int(timezone)
+        except ValueError:
+            timezone = None
+        if timezone is None or not MIN_TIMEZONE <= timezone <= MAX_TIMEZONE:
+            row_errors["timezone"] = (
+                f"Expected an integer from {MIN_TIMEZONE} to {MAX_TIMEZONE}."
+            )
+
+        if row_errors:
+            errors.append({"line": line, "errors": row_errors})
+        else:
+            clients.append((line, phone_number, operator_code, tag, timezone))
+
+    return clients, errors
+
+
+def load_clients(clients: List[tuple]) -> Tuple[int, int]:
+    """
+    Copies valid clients into a temporary staging table with COPY
+    and upserts them into the clients table by phone number.
+
+    Args:
+        clients (List[tuple]): The clients returned by validate_rows.
+
+    Returns:
+        Tuple[int, int]: The numbers of created and updated clients.
+    """
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(clients)
+    buffer.seek(0)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(STAGING_TABLE_SQL)
+        cursor.copy_expert(
+            "COPY client_import FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (tag))",
+            buffer,
+        )
+        cursor.execute(UPSERT_SQL)
+        created, updated = cursor.fetchone()
+        # dropped explicitly, as an outer transaction may be still open
+        cursor.execute("DROP TABLE client_import")
+
+    return created, updated
+
+
+def import_clients(
+    stream: IO[bytes], file_format: str, chunk_size: int = CLIENT_IMPORT_CHUNK_SIZE
+) -> dict:
+    """
+    Imports clients from a CSV or NDJSON stream chunk by chunk.
+    Existing clients are updated by phone number.
+    Invalid rows are reported and skipped, the rest of the chunk is imported.
+
+    Client signals are not sent for imported clients.
+
+    Args:
+        stream (IO[bytes]): The stream to read lines from.
+        file_format (str): 'csv' or 'ndjson'.
+        chunk_size (int): The number of rows loaded into the database at a time.
+
+    Returns:
+        dict: The import result with the following keys:
+            - 'rows': The number of read rows.
+            - 'created': The number of created clients.
+            - 'updated': The number of updated clients.
+            - 'errors': The errors of invalid rows by line number.
+    """
+
+    result = {"rows": 0, "created": 0, "updated": 0, "errors": []}
+
+    for rows in split_into_batches(read_rows(stream, file_format), chunk_size):
+        clients, errors = validate_rows(rows)
+        result["rows"] += len(rows)
+        result["errors"] += errors
+
+        if clients:
+            created, updated = load_clients(clients)
+            result["created"] += created
+            result["updated"] += updated
+
+    logger.info(
+        f"Clients import: {result['rows']} rows, {result['created']} created, "
+        f"{result['updated']} updated, {len(result['errors'])} rejected."
+    )
+
+    return result
@@ -0,0 +1,315 @@
+import logging
+import resource
+import statistics
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from celery.contrib.testing.worker import start_worker
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from api import services
+from api.models import Client, Distribution, Message
+from api.services import start_distribution
+from api.utils import get_delivery_time
+from config.celery import celery_app
+from config.settings import DELIVERY_WINDOW_END_HOUR, DELIVERY_WINDOW_START_HOUR
+from external.backends import FakeMailingService
+from external.mailing_service import MailingServiceClient, OutgoingMessage
+from external.stub_server import stub_server_process
+
+
+class QueryCounter:
+    """
+    Counts the queries of every connection it is installed on.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class TimedMailingBackend:
+    """
+    Records the time every message was sent at.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.sent_at: List[float] = []
+
+    def send_messages(
+        self, messages: List[OutgoingMessage]
+    ) -> Dict[int, Optional[Exception]]:
+        results = self.backend.send_messages(messages)
+
+        sent_at = time.perf_counter()
+        self.sent_at += [sent_at for error in results.values() if error is None]
+
+        return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the whole distribution pipeline: seeds clients, starts "
+        "a distribution with start_distribution and sends its messages through "
+        "eager tasks or in-process Celery workers to a fake mailing backend. "
+        "Reports fan-out time, send throughput, delivery latency percentiles, "
+        "database queries and peak memory. The seeded rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clients",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000, 1_000_000],
+            help="Numbers of clients to run the benchmark for.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=0,
+            help="Worker threads consuming the queues, 0 to run the tasks eagerly.",
+        )
+        parser.add_argument(
+            "--backend",
+            choices=("fake", "stub"),
+            default="fake",
+            help="The in-process fake backend, or the HTTP client "
+            "against a local stub server.",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.0,
+            help="Mailing service latency per message (fake) "
+            "or per request (stub), in seconds.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=3600,
+            help="Seconds to wait for the workers to send the messages.",
+        )
+
+    def handle(self, *args, **options):
+        # per-message logs would dominate the measurement
+        logging.disable(logging.INFO)
+
+        try:
+            with ExitStack() as stack:
+                counter = stack.enter_context(self.count_worker_queries())
+                backend = stack.enter_context(self.mailing_backend(**options))
+                if options["workers"]:
+                    stack.enter_context(
+                        start_worker(
+                            celery_app,
+                            concurrency=options["workers"],
+                            pool="threads",
+                            queues=["distributions", "messages"],
+                            perform_ping_check=False,
+                        )
+                    )
+                else:
+                    stack.enter_context(self.eager_tasks())
+
+                for clients in options["clients"]:
+                    self.run(clients, backend, counter, options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    @contextmanager
+    def mailing_backend(self, **options) -> Iterator[TimedMailingBackend]:
+        """
+        Replaces the mailing backend of the services for the benchmark.
+        """
+
+        mailing_service = services.mailing_service
+
+        with ExitStack() as stack:
+            if options["backend"] == "stub":
+                url = stack.enter_context(
+                    stub_server_process(latency=options["latency"])
+                )
+                backend = MailingServiceClient(base_url=url)
+                stack.callback(backend.close)
+            else:
+                backend = FakeMailingService(latency=options["latency"], error_rate=0)
+
+            services.mailing_service = TimedMailingBackend(backend)
+            try:
+                yield services.mailing_service
+            finally:
+                services.mailing_service = mailing_service
+
+    @contextmanager
+    def eager_tasks(self) -> Iterator[None]:
+        task_always_eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        try:
+            yield
+        finally:
+            celery_app.conf.task_always_eager = task_always_eager
+
+    @contextmanager
+    def count_worker_queries(self) -> Iterator[QueryCounter]:
+        """
+        Counts the queries of the connections opened by worker threads.
+        The connection of the command itself is opened beforehand,
+        so the queries waiting for the workers are not counted.
+        """
+
+        counter = QueryCounter()
+
+        def install(sender, **kwargs):
+            kwargs["connection"].execute_wrappers.append(counter)
+
+        connection.ensure_connection()
+        connection_created.connect(install)
+        try:
+            yield counter
+        finally:
+            connection_created.disconnect(install)
+
+    def run(
+        self,
+        clients: int,
+        backend: TimedMailingBackend,
+        counter: QueryCounter,
+        options: dict,
+    ) -> None:
+        tag = f"benchmark-{uuid.uuid4().hex[:8]}"
+
+        try:
+            distribution = self.seed(clients, tag)
+            backend.sent_at = []
+            counter.count = 0
+
+            started_at = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                start_distribution(distribution.id)
+            started_in = time.perf_counter() - started_at
+
+            if options["workers"]:
+                self.wait_until_sent(distribution, options["timeout"])
+            queries = counter.count
+
+            distribution.refresh_from_db()
+            self.report(distribution, started_at, started_in, backend.sent_at, queries)
+        finally:
+            Distribution.objects.filter(client_filter_tag=tag).delete()
+            Client.objects.filter(tag=tag).delete()
+
+    @staticmethod
+    def seed(clients: int, tag: str) -> Distribution:
+        """
+        Inserts the clients on the database side, in a timezone where
+        the delivery window is open, and creates their distribution.
+        """
+
+        start_datetime = timezone.now()
+        end_datetime = start_datetime + timezone.timedelta(days=1)
+        client_timezone = next(
+            utc_offset
+            for utc_offset in range(-12, 15)
+            if get_delivery_time(
+                start_datetime,
+                end_datetime,
+                utc_offset,
+                DELIVERY_WINDOW_START_HOUR,
+                DELIVERY_WINDOW_END_HOUR,
+            )
+            == start_datetime
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO api_client (phone_number, operator_code, tag, timezone)
+                SELECT '7' || lpad(i::text, 10, '0'), '900', %s, %s
+                FROM generate_series(1, %s) AS i
+                ON CONFLICT (phone_number) DO NOTHING
+                """,
+                [tag, client_timezone, clients],
+            )
+
+        # bulk_create does not send post_save, so the distribution is not started
+        (distribution,) = Distribution.objects.bulk_create(
+            [
+                Distribution(
+                    start_datetime=start_datetime,
+                    end_datetime=end_datetime,
+                    message_text="Benchmark",
+                    client_filter_tag=tag,
+                )
+            ]
+        )
+
+        return distribution
+
+    @staticmethod
+    def wait_until_sent(distribution: Distribution, timeout: float) -> None:
+        """
+        Waits until every message is sent or has failed.
+        """
+
+        pending_messages = Message.objects.filter(
+            distribution=distribution,
+            status__in=[Message.MessageStatus.NOT_SENT, Message.MessageStatus.SENDING],
+            failed_delivery__isnull=True,
+        )
+        deadline = time.monotonic() + timeout
+
+        # start_distribution has created all the messages by now
+        while pending_messages.exists():
+            if time.monotonic() > deadline:
+                raise TimeoutError("The messages were not sent in time.")
+            time.sleep(0.5)
+
+    def report(
+        self,
+        distribution: Distribution,
+        started_at: float,
+        started_in: float,
+        sent_at: List[float],
+        queries: int,
+    ) -> None:
+        messages = distribution.total_messages_count
+        sent = distribution.sent_messages_count
+        latencies = [moment - started_at for moment in sent_at]
+
+        self.stdout.write(f"Clients: {messages}")
+        self.stdout.write(f"start_distribution: {started_in:.2f} s")
+
+        if latencies:
+            elapsed = max(latencies)
+            self.stdout.write(
+                f"Fan-out: first message sent after {min(latencies):.2f} s"
+            )
+            self.stdout.write(
+                f"Sending: {sent} of {messages} messages sent in {elapsed:.2f} s, "
+                f"{sent / elapsed:.0f} messages/second"
+            )
+
+        # quantiles need at least two points
+        if len(latencies) >= 2:
+            percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+            self.stdout.write(
+                f"Delivery latency since start: p50 {percentiles[49]:.2f} s, "
+                f"p99 {percentiles[98]:.2f} s"
+            )
+
+        self.stdout.write(
+            f"Queries: {queries}, {queries / max(messages, 1):.3f} per message"
+        )
+        # the peak resident memory of the process so far, in kilobytes on Linux
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(f"Max RSS: {max_rss:.0f} MB")
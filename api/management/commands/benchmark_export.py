@@ -0,0 +1,122 @@
+import json
+import resource
+import time
+from typing import Iterator
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.exports import CLIENT_EXPORT_FIELDS, MESSAGE_EXPORT_FIELDS, iter_export
+from api.models import Client, Distribution, Message
+from api.serializers import MessageSerializer
+from config.settings import EXPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures rows/second and memory use of the streaming exports "
+        "on seeded clients and messages. The seeded rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument(
+            "--baseline-rows",
+            type=int,
+            default=100_000,
+            help="Messages serialized as a whole list for comparison, 0 to skip.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            distribution = self.seed(options["rows"])
+
+            exports = (
+                ("Clients", Client.objects.order_by("id"), CLIENT_EXPORT_FIELDS),
+                (
+                    "Messages",
+                    Message.objects.filter(distribution=distribution).order_by("id"),
+                    MESSAGE_EXPORT_FIELDS,
+                ),
+            )
+            for name, queryset, fields in exports:
+                rows = queryset.count()
+                for file_format in ("ndjson", "csv"):
+                    chunks = iter_export(
+                        queryset, fields, file_format, options["chunk_size"]
+                    )
+                    self.report(f"{name} ({file_format})", rows, chunks)
+
+            if options["baseline_rows"]:
+                messages = Message.objects.filter(distribution=distribution)
+                messages = messages.select_related("distribution", "client").order_by(
+                    "id"
+                )[: options["baseline_rows"]]
+                self.report(
+                    "Before: messages serialized as a list (json)",
+                    len(messages),
+                    self.serialize_list(messages),
+                )
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def seed(rows: int) -> Distribution:
+        """
+        Inserts the clients and the messages of a new distribution
+        on the database side, without fetching them.
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO api_client (phone_number, operator_code, tag, timezone)
+                SELECT '7' || lpad(i::text, 10, '0'), '900', 'benchmark', 0
+                FROM generate_series(1, %s) AS i
+                ON CONFLICT (phone_number) DO NOTHING
+                """,
+                [rows],
+            )
+
+        # bulk_create does not send post_save, so the distribution is not started
+        (distribution,) = Distribution.objects.bulk_create(
+            [
+                Distribution(
+                    end_datetime=timezone.now() + timezone.timedelta(days=1),
+                    message_text="Benchmark",
+                )
+            ]
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO api_message (created_at, status, distribution_id, client_id)
+                SELECT now(), 'SENT', %s, id
+                FROM api_client
+                ORDER BY id
+                LIMIT %s
+                """,
+                [distribution.id, rows],
+            )
+
+        return distribution
+
+    @staticmethod
+    def serialize_list(messages) -> Iterator[bytes]:
+        yield json.dumps(MessageSerializer(messages, many=True).data).encode()
+
+    def report(self, name: str, rows: int, chunks: Iterator[bytes]) -> None:
+        started_at = time.perf_counter()
+        size = sum(len(chunk) for chunk in chunks)
+        elapsed = time.perf_counter() - started_at
+
+        # the peak resident memory of the process so far, in kilobytes on Linux
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        self.stdout.write(
+            f"{name}: {rows} rows, {size / 2**20:.0f} MB, "
+            f"{rows / elapsed:.0f} rows/s, max RSS {max_rss:.0f} MB"
+        )
@@ -0,0 +1,77 @@
+import statistics
+import time
+
+from celery.contrib.testing.worker import start_worker
+from django.core.management.base import BaseCommand
+
+from config.celery import celery_app
+
+BENCHMARK_QUEUE = "benchmark"
+
+
+@celery_app.task(name="benchmark.send_batch")
+def send_batch_probe_task(enqueued_at: float, duration: float) -> float:
+    """
+    Stands for a batch of messages: returns the time the batch waited
+    in the queue and takes as long as sending it would.
+    """
+
+    waited = time.time() - enqueued_at
+    time.sleep(duration)
+    return waited
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures how long batches of a small distribution wait in the messages "
+        "queue behind a large distribution, with and without priorities. "
+        "Runs a worker in-process against the configured broker and result backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--big-batches", type=int, default=500)
+        parser.add_argument("--small-batches", type=int, default=5)
+        parser.add_argument(
+            "--batch-time",
+            type=float,
+            default=0.02,
+            help="Seconds a worker spends on a batch.",
+        )
+        parser.add_argument("--concurrency", type=int, default=4)
+
+    def handle(self, *args, **options):
+        with start_worker(
+            celery_app,
+            concurrency=options["concurrency"],
+            pool="threads",
+            queues=[BENCHMARK_QUEUE],
+            perform_ping_check=False,
+        ):
+            for name, small_priority in (("Before (FIFO)", 5), ("After (priority)", 0)):
+                latencies = self.measure(small_priority, **options)
+                self.stdout.write(
+                    f"{name}: small distribution batches waited "
+                    f"median {statistics.median(latencies):.2f} s, "
+                    f"max {max(latencies):.2f} s"
+                )
+
+    @staticmethod
+    def send(priority: int, duration: float):
+        return send_batch_probe_task.apply_async(
+            args=[time.time(), duration], queue=BENCHMARK_QUEUE, priority=priority
+        )
+
+    def measure(self, small_priority: int, **options) -> list:
+        big = [
+            self.send(5, options["batch_time"]) for _ in range(options["big_batches"])
+        ]
+        small = [
+            self.send(small_priority, options["batch_time"])
+            for _ in range(options["small_batches"])
+        ]
+
+        latencies = [result.get(timeout=600) for result in small]
+        for result in big:
+            result.get(timeout=600)
+
+        return latencies
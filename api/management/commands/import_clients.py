@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import IMPORT_FORMATS, import_clients
+from config.settings import CLIENT_IMPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports clients from a CSV file with a header row or from an NDJSON file. "
+        "Existing clients are updated by phone number."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The file to import, '-' for stdin.")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=IMPORT_FORMATS,
+            help="The file format. By default it is taken from the file extension.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CLIENT_IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"]
+
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip(".").lower()
+            if file_format not in IMPORT_FORMATS:
+                raise CommandError("Cannot detect the file format, use --format.")
+
+        started_at = time.perf_counter()
+
+        if path == "-":
+            result = import_clients(sys.stdin.buffer, file_format, options["chunk_size"])
+        else:
+            with open(path, "rb") as file:
+                result = import_clients(file, file_format, options["chunk_size"])
+
+        elapsed = time.perf_counter() - started_at
+
+        for error in result["errors"]:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+
+        self.stdout.write(
+            f"Rows: {result['rows']}, created: {result['created']}, "
+            f"updated: {result['updated']}, rejected: {len(result['errors'])}. "
+            f"{result['rows'] / elapsed:.0f} rows/s."
+        )
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from api.models import Distribution, Message
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconciles the denormalized message counters of distributions "
+        "with the messages table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "distribution_ids",
+            nargs="*",
+            type=int,
+            help="Distributions to check. All distributions by default.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        distributions = Distribution.objects.order_by("id")
+        if options["distribution_ids"]:
+            distributions = distributions.filter(id__in=options["distribution_ids"])
+
+        checked = fixed = 0
+        last_distribution_id = 0
+
+        while True:
+            chunk = distributions.filter(id__gt=last_distribution_id)
+            distribution_ids = list(
+                chunk.values_list("id", flat=True)[: options["chunk_size"]]
+            )
+            if not distribution_ids:
+                break
+
+            last_distribution_id = distribution_ids[-1]
+            checked += len(distribution_ids)
+
+            mismatched_ids = list(
+                Distribution.objects.filter(id__in=distribution_ids)
+                .with_stats()
+                .exclude(
+                    total_messages_count=F("stats_total_messages"),
+                    sent_messages_count=F("stats_sent_messages"),
+                )
+                .values_list("id", flat=True)
+            )
+            if mismatched_ids:
+                fixed += self.rebuild(mismatched_ids)
+
+        self.stdout.write(f"Distributions checked: {checked}, fixed: {fixed}.")
+
+    @staticmethod
+    def rebuild(distribution_ids) -> int:
+        """
+        Recounts the counters in a single UPDATE, so increments made
+        by running distributions are not lost between reading and writing.
+        """
+
+        messages = (
+            Message.objects.filter(distribution=OuterRef("id"))
+            .order_by()
+            .values("distribution")
+        )
+        total_messages = messages.annotate(count=Count("id")).values("count")
+        sent_messages = messages.annotate(
+            count=Count("id", filter=Q(status=Message.MessageStatus.SENT))
+        ).values("count")
+
+        return Distribution.objects.filter(id__in=distribution_ids).update(
+            total_messages_count=Coalesce(Subquery(total_messages), 0),
+            sent_messages_count=Coalesce(Subquery(sent_messages), 0),
+        )
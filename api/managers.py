@@ -1,8 +1,42 @@
-from django.db.models import Manager
+import random
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, transaction
+from django.db.models import Count, F, Manager, Q, QuerySet
 from django.utils import timezone
 
+from api.utils import get_retry_delay
+from config.settings import (
+    MESSAGE_CLAIM_TIMEOUT,
+    MESSAGE_MAX_ATTEMPTS,
+    MESSAGE_RETRY_DELAY,
+    MESSAGE_RETRY_MAX_DELAY,
+)
+
+
+class DistributionQuerySet(QuerySet):
+    def with_stats(self):
+        """
+        Annotates distributions with their message counts in one grouped query:
+        'stats_total_messages' and 'stats_sent_messages'.
+
+        The counts are computed from the messages table, unlike the
+        denormalized counters, and are used to reconcile the counters.
+        """
+
+        from api.models import Message
 
-class DistributionManager(Manager):
+        return self.annotate(
+            stats_total_messages=Count("message"),
+            stats_sent_messages=Count(
+                "message", filter=Q(message__status=Message.MessageStatus.SENT)
+            ),
+        )
+
+
+class DistributionManager(Manager.from_queryset(DistributionQuerySet)):
     def get_by_previous_day(self):
         previous_day_start = timezone.now() - timezone.timedelta(days=1)
         previous_day_end = timezone.now()
@@ -12,3 +46,335 @@ class DistributionManager(Manager):
         )
 
         return previous_day_distributions
+
+    def increment_stats(
+        self, distribution_id: int, total_messages: int = 0, sent_messages: int = 0
+    ) -> None:
+        """
+        Adds to the message counters of a distribution in the database.
+        """
+
+        counters = {}
+        if total_messages:
+            counters["total_messages_count"] = F("total_messages_count") + total_messages
+        if sent_messages:
+            counters["sent_messages_count"] = F("sent_messages_count") + sent_messages
+
+        if counters:
+            self.filter(id=distribution_id).update(**counters)
+
+
+class DistributionScheduleManager(Manager):
+    def claim_due(self, limit: int) -> List[Tuple[int, int, Optional[int]]]:
+        """
+        Claims the due unclaimed schedules, the earliest first.
+
+        The schedules are locked with SELECT ... FOR UPDATE SKIP LOCKED
+        and marked as claimed in the same transaction, so concurrent
+        schedulers never claim the same schedule twice.
+
+        Args:
+            limit (int): The maximum number of schedules to claim.
+
+        Returns:
+            List[Tuple[int, int, Optional[int]]]: The IDs and priorities
+                of the distributions of the claimed schedules,
+                and the client timezones of the schedules.
+        """
+
+        current_time = timezone.now()
+
+        with transaction.atomic():
+            due_schedules = list(
+                self.select_for_update(skip_locked=True, of=("self",))
+                .filter(claimed_at__isnull=True, run_at__lte=current_time)
+                .order_by("run_at")
+                .values_list(
+                    "id",
+                    "distribution_id",
+                    "distribution__priority",
+                    "client_timezone",
+                )[:limit]
+            )
+
+            self.filter(
+                id__in=[schedule_id for schedule_id, *_ in due_schedules]
+            ).update(claimed_at=current_time)
+
+        return [schedule[1:] for schedule in due_schedules]
+
+
+class MessageManager(Manager):
+    def claim(
+        self, message_ids: List[int], distribution_id: Optional[int] = None
+    ) -> Tuple[Optional[datetime], List[Tuple[int, int, int, str, Optional[int]]]]:
+        """
+        Claims messages for sending with a single UPDATE ... RETURNING:
+        not sent messages, and messages whose previous claim has expired,
+        are marked as being sent for MESSAGE_CLAIM_TIMEOUT seconds.
+
+        A message is claimed by one worker only, even if its batch is
+        enqueued twice, so duplicate work is dropped before any network call.
+
+        The claimed_until value written by the claim identifies it: the messages
+        are released with it, so a claim that has expired and been taken over
+        by another worker cannot release the messages of the new claim.
+
+        Args:
+            message_ids (List[int]): The IDs of the messages to claim.
+            distribution_id (Optional[int]): If given, only the messages
+                of this distribution are claimed.
+
+        Returns:
+            Tuple[Optional[datetime], List[Tuple[int, int, int, str, Optional[int]]]]:
+                The claimed_until value of the claim, or None if no message
+                was claimed, and the claimed messages ordered by ID,
+                as (id, distribution_id, client_id, phone_number,
+                failed_delivery_id) tuples.
+        """
+
+        from api.models import Client, FailedDelivery, Message
+
+        distribution_filter = ""
+        params = [
+            Message.MessageStatus.SENDING,
+            MESSAGE_CLAIM_TIMEOUT,
+            list(message_ids),
+            Message.MessageStatus.NOT_SENT,
+            Message.MessageStatus.SENDING,
+        ]
+        if distribution_id is not None:
+            distribution_filter = "AND message.distribution_id = %s"
+            params.append(distribution_id)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {self.model._meta.db_table} AS message
+                SET status = %s, claimed_until = now() + make_interval(secs => %s)
+                FROM {Client._meta.db_table} AS client
+                WHERE client.id = message.client_id
+                    AND message.id = ANY(%s)
+                    AND (
+                        message.status = %s
+                        OR (message.status = %s AND message.claimed_until < now())
+                    )
+                    {distribution_filter}
+                RETURNING
+                    message.id,
+                    message.distribution_id,
+                    message.client_id,
+                    client.phone_number,
+                    (
+                        SELECT failed_delivery.id
+                        FROM {FailedDelivery._meta.db_table} AS failed_delivery
+                        WHERE failed_delivery.message_id = message.id
+                    ),
+                    message.claimed_until
+                """,
+                params,
+            )
+            rows = sorted(cursor.fetchall())
+
+        claimed_until = rows[0][-1] if rows else None
+        return claimed_until, [row[:-1] for row in rows]
+
+    def release(
+        self, message_ids: List[int], status: str, claimed_until: datetime
+    ) -> int:
+        """
+        Releases claimed messages that were not sent.
+        Messages claimed again since, by another claim, are not released.
+
+        Args:
+            message_ids (List[int]): The IDs of the claimed messages.
+            status (str): NOT_SENT to send the messages again later,
+                or FAILED to give them up.
+            claimed_until (datetime): The claimed_until value of the claim.
+
+        Returns:
+            int: The number of released messages.
+        """
+
+        from api.models import Message
+
+        return self.filter(
+            id__in=message_ids,
+            status=Message.MessageStatus.SENDING,
+            claimed_until=claimed_until,
+        ).update(status=status, claimed_until=None)
+
+    def mark_sent(self, distribution_id: int, message_ids: List[int]) -> int:
+        """
+        Marks not sent or claimed messages of a distribution as sent
+        and adds them to the sent messages counter of the distribution.
+
+        Args:
+            distribution_id (int): The ID of the distribution of the messages.
+            message_ids (List[int]): The IDs of the sent messages.
+
+        Returns:
+            int: The number of messages marked as sent.
+        """
+
+        from api.models import Distribution, Message
+
+        with transaction.atomic():
+            sent_messages = self.filter(
+                id__in=message_ids,
+                distribution_id=distribution_id,
+                status__in=[
+                    Message.MessageStatus.NOT_SENT,
+                    Message.MessageStatus.SENDING,
+                ],
+            ).update(status=Message.MessageStatus.SENT, claimed_until=None)
+
+            if sent_messages:
+                Distribution.objects.increment_stats(
+                    distribution_id, sent_messages=sent_messages
+                )
+
+        return sent_messages
+
+    def create_for_clients(
+        self, distribution_id: int, clients: QuerySet
+    ) -> Tuple[int, int, Optional[int]]:
+        """
+        Creates not sent messages of a distribution for the given clients
+        with a single INSERT ... SELECT, so the clients are not fetched.
+        Clients that already have a message of the distribution are skipped.
+
+        Args:
+            distribution_id (int): The ID of the distribution.
+            clients (QuerySet): The clients to create messages for.
+
+        Returns:
+            Tuple[int, int, Optional[int]]: The numbers of created and already
+                existing messages, and the greatest ID of the given clients,
+                or None if there are no clients.
+        """
+
+        from api.models import Message
+
+        try:
+            clients_sql, clients_params = clients.values("id").query.sql_with_params()
+        except EmptyResultSet:
+            return 0, 0, None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH clients AS ({clients_sql}),
+                created AS (
+                    INSERT INTO {self.model._meta.db_table}
+                        (created_at, status, distribution_id, client_id)
+                    SELECT now(), %s, %s, id FROM clients
+                    ON CONFLICT (distribution_id, client_id) DO NOTHING
+                    RETURNING id
+                )
+                SELECT
+                    (SELECT count(*) FROM created),
+                    (SELECT count(*) FROM clients) - (SELECT count(*) FROM created),
+                    (SELECT max(id) FROM clients)
+                """,
+                [*clients_params, Message.MessageStatus.NOT_SENT, distribution_id],
+            )
+            created_messages, existing_messages, last_client_id = cursor.fetchone()
+
+        return created_messages, existing_messages, last_client_id
+
+
+class FailedDeliveryManager(Manager):
+    def record(self, errors: Dict[int, Exception]) -> List[int]:
+        """
+        Records failed attempts to send messages: the error class,
+        the HTTP status of the mailing service and the number of attempts.
+        The next attempt is scheduled with an exponential backoff,
+        not sooner than the mailing service asked for.
+        Messages that have used up MESSAGE_MAX_ATTEMPTS are not scheduled anymore.
+
+        Args:
+            errors (Dict[int, Exception]): The errors by message ID.
+
+        Returns:
+            List[int]: The IDs of the messages that have used up their attempts.
+        """
+
+        previous_attempts = dict(
+            self.filter(message_id__in=errors).values_list("message_id", "attempts")
+        )
+        current_time = timezone.now()
+        failed_deliveries = []
+        abandoned_message_ids = []
+
+        for message_id, error in errors.items():
+            attempts = previous_attempts.get(message_id, 0) + 1
+            next_attempt_at = None
+
+            if attempts < MESSAGE_MAX_ATTEMPTS:
+                delay = get_retry_delay(
+                    attempts,
+                    MESSAGE_RETRY_DELAY,
+                    MESSAGE_RETRY_MAX_DELAY,
+                    getattr(error, "retry_after", None),
+                )
+                next_attempt_at = current_time + timezone.timedelta(seconds=delay)
+            else:
+                abandoned_message_ids.append(message_id)
+
+            failed_deliveries.append(
+                self.model(
+                    message_id=message_id,
+                    attempts=attempts,
+                    error=type(error).__name__,
+                    status_code=getattr(error, "status", None),
+                    last_attempt_at=current_time,
+                    next_attempt_at=next_attempt_at,
+                )
+            )
+
+        self.bulk_create(
+            failed_deliveries,
+            update_conflicts=True,
+            unique_fields=["message"],
+            update_fields=[
+                "attempts",
+                "error",
+                "status_code",
+                "last_attempt_at",
+                "next_attempt_at",
+            ],
+        )
+
+        return abandoned_message_ids
+
+    def park(self, errors: Dict[int, Exception]) -> None:
+        """
+        Postpones messages that were not sent because the mailing service
+        is unavailable. Their attempts are not counted, and their next attempts
+        are spread over MESSAGE_RETRY_DELAY after the service is expected back.
+        Messages that have failed before keep their last error and HTTP status.
+
+        Args:
+            errors (Dict[int, Exception]): The errors by message ID.
+        """
+
+        current_time = timezone.now()
+
+        self.bulk_create(
+            [
+                self.model(
+                    message_id=message_id,
+                    error=type(error).__name__,
+                    next_attempt_at=current_time
+                    + timezone.timedelta(
+                        seconds=getattr(error, "retry_after", 0)
+                        + random.uniform(0, MESSAGE_RETRY_DELAY)
+                    ),
+                )
+                for message_id, error in errors.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["message"],
+            update_fields=["next_attempt_at"],
+        )
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="distribution",
+            name="sent_messages_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Отправлено сообщений"
+            ),
+        ),
+        migrations.AddField(
+            model_name="distribution",
+            name="total_messages_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Всего сообщений"
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE api_distribution
+                SET total_messages_count = stats.total_messages,
+                    sent_messages_count = stats.sent_messages
+                FROM (
+                    SELECT distribution_id,
+                           COUNT(*) AS total_messages,
+                           COUNT(*) FILTER (WHERE status = 'SENT') AS sent_messages
+                    FROM api_message
+                    GROUP BY distribution_id
+                ) AS stats
+                WHERE stats.distribution_id = api_distribution.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
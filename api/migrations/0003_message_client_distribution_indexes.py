@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_distribution_message_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(
+                fields=["operator_code", "tag", "id"], name="api_client_operator_tag_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["tag", "id"], name="api_client_tag_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="distribution",
+            index=models.Index(
+                fields=["start_datetime"], name="api_distribution_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["distribution", "status"], name="api_message_dist_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                condition=models.Q(("status", "NOT_SENT")),
+                fields=["distribution", "id"],
+                name="api_message_not_sent_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="distribution",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="api.distribution",
+                verbose_name="ID рассылки",
+            ),
+        ),
+    ]
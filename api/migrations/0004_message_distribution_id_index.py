@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_message_client_distribution_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["distribution", "id"], name="api_message_dist_id_idx"
+            ),
+        ),
+    ]
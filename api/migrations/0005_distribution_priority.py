@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-17 22:04
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_message_distribution_id_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="distribution",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                default=5,
+                help_text="Сообщения рассылок с более высоким приоритетом отправляются первыми. От 0 (наивысший) до 9 (низший).",
+                validators=[django.core.validators.MaxValueValidator(9)],
+                verbose_name="Приоритет",
+            ),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.0.1 on 2026-10-17 22:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_distribution_priority"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FailedDelivery",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Количество попыток"
+                    ),
+                ),
+                ("error", models.CharField(max_length=255, verbose_name="Ошибка")),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(
+                        blank=True, null=True, verbose_name="HTTP статус ответа"
+                    ),
+                ),
+                (
+                    "last_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Время последней попытки",
+                    ),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Не задано, если попытки отправки исчерпаны.",
+                        null=True,
+                        verbose_name="Время следующей попытки",
+                    ),
+                ),
+                (
+                    "message",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="failed_delivery",
+                        to="api.message",
+                        verbose_name="ID сообщения",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Неудачная отправка",
+                "verbose_name_plural": "Неудачные отправки",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("next_attempt_at__isnull", False)),
+                        fields=["next_attempt_at"],
+                        name="api_failed_delivery_next_idx",
+                    )
+                ],
+            },
+        ),
+    ]
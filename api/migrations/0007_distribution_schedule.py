@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-17 22:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_failed_delivery"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DistributionSchedule",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("run_at", models.DateTimeField(verbose_name="Время запуска")),
+                (
+                    "claimed_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Время взятия в работу"
+                    ),
+                ),
+                (
+                    "distribution",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="schedules",
+                        to="api.distribution",
+                        verbose_name="ID рассылки",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Запуск рассылки",
+                "verbose_name_plural": "Запуски рассылок",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("claimed_at__isnull", True)),
+                        fields=["run_at"],
+                        name="api_schedule_unclaimed_idx",
+                    )
+                ],
+            },
+        ),
+    ]
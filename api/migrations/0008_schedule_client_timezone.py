@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-17 22:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_distribution_schedule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="distributionschedule",
+            name="client_timezone",
+            field=models.SmallIntegerField(
+                blank=True,
+                help_text="Отправка сообщений клиентам этого часового пояса. Не задан: запуск рассылки.",
+                null=True,
+                verbose_name="Часовой пояс клиентов",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="distributionschedule",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("claimed_at__isnull", True)),
+                fields=("distribution", "client_timezone"),
+                name="api_schedule_unclaimed_timezone_uniq",
+            ),
+        ),
+    ]
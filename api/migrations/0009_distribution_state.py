@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-17 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_schedule_client_timezone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="distribution",
+            name="state",
+            field=models.CharField(
+                choices=[
+                    ("ACTIVE", "Активна"),
+                    ("PAUSED", "Приостановлена"),
+                    ("CANCELLED", "Отменена"),
+                ],
+                default="ACTIVE",
+                editable=False,
+                max_length=9,
+                verbose_name="Состояние",
+            ),
+        ),
+    ]
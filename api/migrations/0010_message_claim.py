@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-17 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_distribution_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="claimed_until",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="После этого времени сообщение может взять в отправку другой воркер.",
+                null=True,
+                verbose_name="Отправляется до",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("SENT", "Отправлено"),
+                    ("NOT_SENT", "Не отправлено"),
+                    ("SENDING", "Отправляется"),
+                    ("FAILED", "Не доставлено"),
+                ],
+                default="NOT_SENT",
+                max_length=8,
+                verbose_name="Статус отправки",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                condition=models.Q(("status", "SENDING")),
+                fields=["claimed_until"],
+                name="api_message_sending_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_message_claim"),
+    ]
+
+    operations = [
+        # keep the first unclaimed start of every distribution
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM api_distributionschedule AS duplicate
+                USING api_distributionschedule AS schedule
+                WHERE duplicate.distribution_id = schedule.distribution_id
+                    AND duplicate.client_timezone IS NULL
+                    AND schedule.client_timezone IS NULL
+                    AND duplicate.claimed_at IS NULL
+                    AND schedule.claimed_at IS NULL
+                    AND duplicate.id > schedule.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="distributionschedule",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    ("claimed_at__isnull", True), ("client_timezone__isnull", True)
+                ),
+                fields=("distribution",),
+                name="api_schedule_unclaimed_start_uniq",
+            ),
+        ),
+    ]
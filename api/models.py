@@ -1,9 +1,15 @@
-from typing import Tuple
+from typing import Dict, Iterator, List, Optional
 
-from django.db import models
+from django.core.validators import MaxValueValidator
+from django.db import models, transaction
 from django.utils import timezone
 
-from api.managers import DistributionManager
+from api.managers import (
+    DistributionManager,
+    DistributionScheduleManager,
+    FailedDeliveryManager,
+    MessageManager,
+)
 
 
 class Client(models.Model):
@@ -32,11 +38,23 @@ class Client(models.Model):
     class Meta:
         verbose_name = "Клиент"
         verbose_name_plural = "Клиенты"
+        indexes = [
+            # distribution audience: filter by operator code and tag, walk by ID
+            models.Index(
+                fields=["operator_code", "tag", "id"], name="api_client_operator_tag_idx"
+            ),
+            models.Index(fields=["tag", "id"], name="api_client_tag_idx"),
+        ]
 
 
 class Distribution(models.Model):
     objects = DistributionManager()
 
+    class State(models.TextChoices):
+        ACTIVE = "ACTIVE", "Активна"
+        PAUSED = "PAUSED", "Приостановлена"
+        CANCELLED = "CANCELLED", "Отменена"
+
     id = models.AutoField(primary_key=True)
     start_datetime = models.DateTimeField(
         "Время запуска рассылки",
@@ -70,18 +88,70 @@ class Distribution(models.Model):
         blank=True,
         help_text="Фильтр для рассылки по тэгу клиентов. Необязательно.",
     )
+    priority = models.PositiveSmallIntegerField(
+        "Приоритет",
+        default=5,
+        validators=[MaxValueValidator(9)],
+        help_text=(
+            "Сообщения рассылок с более высоким приоритетом отправляются первыми. "
+            "От 0 (наивысший) до 9 (низший)."
+        ),
+    )
+    state = models.CharField(
+        "Состояние",
+        max_length=9,
+        choices=State.choices,
+        default=State.ACTIVE,
+        editable=False,
+    )
+    total_messages_count = models.PositiveIntegerField(
+        "Всего сообщений", default=0, editable=False
+    )
+    sent_messages_count = models.PositiveIntegerField(
+        "Отправлено сообщений", default=0, editable=False
+    )
+
+    # changed only with UPDATE queries: the counters so that concurrent changes
+    # add up, the state by change_distribution_state with its transition check
+    DATABASE_MANAGED_FIELDS = ("state", "total_messages_count", "sent_messages_count")
 
     @property
     def total_messages(self):
-        return self.message_set.count()
+        return self.total_messages_count
 
     @property
     def sent_messages(self):
-        return self.message_set.filter(status=Message.MessageStatus.SENT).count()
+        return self.sent_messages_count
 
     def __str__(self):
         return f"Рассылка №{self.id}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        distribution = super().from_db(db, field_names, values)
+        # the start time in the database, to reschedule the distribution
+        # if it is changed, see handle_distribution_creation
+        distribution.saved_start_datetime = distribution.__dict__.get("start_datetime")
+        return distribution
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the distribution. An existing distribution is saved without
+        the fields in DATABASE_MANAGED_FIELDS, so an edit through the API
+        or the admin does not write back their stale values.
+        """
+
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DATABASE_MANAGED_FIELDS
+            ]
+
+        super().save(*args, **kwargs)
+        self.saved_start_datetime = self.start_datetime
+
     def get_filtered_clients(self) -> models.QuerySet[Client]:
         """
         Get the filtered clients for the current distribution.
@@ -102,30 +172,116 @@ class Distribution(models.Model):
 
         return filtered_clients
 
-    def get_or_create_messages_for_sending(
-        self,
-    ) -> Tuple[models.QuerySet["Message"], bool]:
+    def materialize_messages(self, chunk_size: int) -> dict:
         """
-        Retrieves or creates messages to send for the current distribution.
+        Creates the messages of the current distribution for its filtered clients.
+
+        Filtered clients are walked with keyset pagination by their IDs,
+        and the messages of each chunk are created on the database side,
+        without fetching the clients. Clients that already have a message
+        are skipped, so the distribution can be materialized again after a restart.
+        The total messages counter is increased by the number of created messages.
+
+        Args:
+            chunk_size (int): The number of clients to process per chunk.
 
         Returns:
-            Tuple[QuerySet[Message], bool]: The message instances
-                and a flag indicating whether new messages were created.
+            dict: The counts with the following keys:
+                - 'created': The number of created messages.
+                - 'existing': The number of messages that already existed.
+        """
+
+        clients = self.get_filtered_clients().order_by("id")
+        counts = {"created": 0, "existing": 0}
+        last_client_id = 0
+
+        while True:
+            with transaction.atomic():
+                created_messages, existing_messages, last_client_id = (
+                    Message.objects.create_for_clients(
+                        self.id, clients.filter(id__gt=last_client_id)[:chunk_size]
+                    )
+                )
+                if last_client_id is None:
+                    return counts
+
+                if created_messages:
+                    Distribution.objects.increment_stats(
+                        self.id, total_messages=created_messages
+                    )
+                    self.total_messages_count += created_messages
+
+            counts["created"] += created_messages
+            counts["existing"] += existing_messages
+
+    def iter_pending_message_ids(
+        self, chunk_size: int, client_timezones: Optional[List[int]] = None
+    ) -> Iterator[List[int]]:
         """
+        Walks the not sent messages of the current distribution by their IDs.
+
+        The lookup is served by the partial index on not sent messages,
+        so sent messages of a restarted distribution are not read at all.
+        Failed messages whose next attempts are not due yet, including parked
+        ones, are left to retry_failed_deliveries, so a restart or a resume
+        does not skip their backoff.
 
-        clients = self.get_filtered_clients()
+        Args:
+            chunk_size (int): The number of message IDs per chunk.
+            client_timezones (Optional[List[int]]): If given, only the messages
+                to the clients in these timezones are walked.
 
-        created_messages = Message.objects.bulk_create(
-            [Message(distribution=self, client=client) for client in clients],
-            ignore_conflicts=True,
+        Yields:
+            List[int]: The IDs of the next chunk of not sent messages.
+        """
+
+        pending_messages = (
+            Message.objects.filter(
+                distribution=self, status=Message.MessageStatus.NOT_SENT
+            )
+            .exclude(failed_delivery__next_attempt_at__gt=timezone.now())
+            .order_by("id")
         )
-        messages = Message.objects.filter(distribution=self, client__in=clients)
+        if client_timezones is not None:
+            pending_messages = pending_messages.filter(
+                client__timezone__in=client_timezones
+            )
+        last_message_id = 0
+
+        while True:
+            message_ids = list(
+                pending_messages.filter(id__gt=last_message_id).values_list(
+                    "id", flat=True
+                )[:chunk_size]
+            )
+            if not message_ids:
+                return
+
+            last_message_id = message_ids[-1]
+            yield message_ids
+
+    def count_pending_messages_by_timezone(self) -> Dict[int, int]:
+        """
+        Counts the not sent messages of the current distribution
+        by the timezones of their clients, with one grouped query.
+
+        Returns:
+            Dict[int, int]: The numbers of not sent messages by client timezone.
+        """
 
-        return messages, bool(created_messages)
+        return dict(
+            Message.objects.filter(
+                distribution=self, status=Message.MessageStatus.NOT_SENT
+            )
+            .values_list("client__timezone")
+            .annotate(messages=models.Count("id"))
+            .order_by()
+        )
 
     def get_stats(self) -> dict:
         """
-        Returns statistics about the current distribution.
+        Returns statistics about the current distribution
+        from its denormalized message counters, without querying the messages.
 
         Returns:
             dict: The statistics as a dictionary with the following keys:
@@ -149,13 +305,74 @@ class Distribution(models.Model):
     class Meta:
         verbose_name = "Рассылка"
         verbose_name_plural = "Рассылки"
+        indexes = [
+            models.Index(fields=["start_datetime"], name="api_distribution_start_idx"),
+        ]
+
+
+class DistributionSchedule(models.Model):
+    objects = DistributionScheduleManager()
+
+    id = models.AutoField(primary_key=True)
+    distribution = models.ForeignKey(
+        Distribution,
+        verbose_name="ID рассылки",
+        on_delete=models.CASCADE,
+        related_name="schedules",
+    )
+    client_timezone = models.SmallIntegerField(
+        "Часовой пояс клиентов",
+        null=True,
+        blank=True,
+        help_text=(
+            "Отправка сообщений клиентам этого часового пояса. "
+            "Не задан: запуск рассылки."
+        ),
+    )
+    run_at = models.DateTimeField("Время запуска")
+    claimed_at = models.DateTimeField("Время взятия в работу", null=True, blank=True)
+
+    def __str__(self):
+        return f"Запуск рассылки №{self.distribution_id}"
+
+    class Meta:
+        verbose_name = "Запуск рассылки"
+        verbose_name_plural = "Запуски рассылок"
+        indexes = [
+            # due schedules, polled by the scheduler; claimed ones leave the index
+            models.Index(
+                fields=["run_at"],
+                condition=models.Q(claimed_at__isnull=True),
+                name="api_schedule_unclaimed_idx",
+            ),
+        ]
+        constraints = [
+            # a restarted distribution does not schedule its timezones twice
+            models.UniqueConstraint(
+                fields=["distribution", "client_timezone"],
+                condition=models.Q(claimed_at__isnull=True),
+                name="api_schedule_unclaimed_timezone_uniq",
+            ),
+            # nor its start: NULL client timezones are distinct in the constraint
+            # above, and Django 5.0 cannot combine nulls_distinct with a condition
+            models.UniqueConstraint(
+                fields=["distribution"],
+                condition=models.Q(
+                    claimed_at__isnull=True, client_timezone__isnull=True
+                ),
+                name="api_schedule_unclaimed_start_uniq",
+            ),
+        ]
 
 
 class Message(models.Model):
+    objects = MessageManager()
 
     class MessageStatus(models.TextChoices):
         SENT = "SENT", "Отправлено"
         NOT_SENT = "NOT_SENT", "Не отправлено"
+        SENDING = "SENDING", "Отправляется"
+        FAILED = "FAILED", "Не доставлено"
 
     id = models.AutoField(primary_key=True)
     created_at = models.DateTimeField(
@@ -167,8 +384,19 @@ class Message(models.Model):
         choices=MessageStatus.choices,
         default=MessageStatus.NOT_SENT,
     )
+    claimed_until = models.DateTimeField(
+        "Отправляется до",
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="После этого времени сообщение может взять в отправку другой воркер.",
+    )
+    # covered by the unique pair and the indexes below, which start with it
     distribution = models.ForeignKey(
-        Distribution, verbose_name="ID рассылки", on_delete=models.CASCADE
+        Distribution,
+        verbose_name="ID рассылки",
+        on_delete=models.CASCADE,
+        db_index=False,
     )
     client = models.ForeignKey(
         Client, verbose_name="ID клиента", on_delete=models.PROTECT
@@ -181,3 +409,65 @@ class Message(models.Model):
         unique_together = ("distribution", "client")
         verbose_name = "Сообщение"
         verbose_name_plural = "Сообщения"
+        indexes = [
+            # message counts of a distribution by status
+            models.Index(
+                fields=["distribution", "status"], name="api_message_dist_status_idx"
+            ),
+            # messages of a distribution, listed by ID
+            models.Index(fields=["distribution", "id"], name="api_message_dist_id_idx"),
+            # pending messages of a distribution, walked by ID;
+            # small, because sent messages leave the index
+            models.Index(
+                fields=["distribution", "id"],
+                condition=models.Q(status="NOT_SENT"),
+                name="api_message_not_sent_idx",
+            ),
+            # messages being sent, checked for expired claims; small as well
+            models.Index(
+                fields=["claimed_until"],
+                condition=models.Q(status="SENDING"),
+                name="api_message_sending_idx",
+            ),
+        ]
+
+
+class FailedDelivery(models.Model):
+    objects = FailedDeliveryManager()
+
+    id = models.AutoField(primary_key=True)
+    message = models.OneToOneField(
+        Message,
+        verbose_name="ID сообщения",
+        on_delete=models.CASCADE,
+        related_name="failed_delivery",
+    )
+    attempts = models.PositiveSmallIntegerField("Количество попыток", default=0)
+    error = models.CharField("Ошибка", max_length=255)
+    status_code = models.PositiveSmallIntegerField(
+        "HTTP статус ответа", null=True, blank=True
+    )
+    last_attempt_at = models.DateTimeField(
+        "Время последней попытки", default=timezone.now
+    )
+    next_attempt_at = models.DateTimeField(
+        "Время следующей попытки",
+        null=True,
+        blank=True,
+        help_text="Не задано, если попытки отправки исчерпаны.",
+    )
+
+    def __str__(self):
+        return f"Неудачная отправка сообщения №{self.message_id}"
+
+    class Meta:
+        verbose_name = "Неудачная отправка"
+        verbose_name_plural = "Неудачные отправки"
+        indexes = [
+            # failures due to be retried; abandoned ones leave the index
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(next_attempt_at__isnull=False),
+                name="api_failed_delivery_next_idx",
+            ),
+        ]
@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from config.settings import API_MAX_PAGE_SIZE, API_PAGE_SIZE
+
+
+class StatsPagination(PageNumberPagination):
+    page_size = API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = API_MAX_PAGE_SIZE
+
+
+class MessagePagination(CursorPagination):
+    """
+    Keyset pagination by message ID: the next page is fetched by `id > last id`
+    with an index, however deep it is, and no total count is calculated.
+    """
+
+    page_size = API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = API_MAX_PAGE_SIZE
+    ordering = "id"
@@ -0,0 +1,23 @@
+from rest_framework.parsers import BaseParser
+
+
+class ClientImportParser(BaseParser):
+    """
+    Passes the request body through as a stream, so a large import
+    is read row by row instead of being loaded into memory.
+    """
+
+    file_format = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {"format": self.file_format, "stream": stream}
+
+
+class CSVClientImportParser(ClientImportParser):
+    media_type = "text/csv"
+    file_format = "csv"
+
+
+class NDJSONClientImportParser(ClientImportParser):
+    media_type = "application/x-ndjson"
+    file_format = "ndjson"
@@ -0,0 +1,153 @@
+import time
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.utils import timezone
+from redis import RedisError
+
+from api.logs import logger
+from api.models import Distribution
+from config.settings import SEND_CONTEXT_CACHE_TTL
+from external.redis_client import get_redis_client
+
+# The number of cached distributions after which the cache is cleared,
+# so a long-running worker does not keep the contexts of old distributions.
+SEND_CONTEXT_CACHE_SIZE = 1024
+
+
+class SendContext(NamedTuple):
+    """
+    What a worker needs to know about a distribution to send its messages.
+    """
+
+    distribution_id: int
+    message_text: str
+    end_datetime: datetime
+    priority: int
+    state: str
+
+    def has_ended(self, current_time: datetime) -> bool:
+        return current_time > self.end_datetime
+
+
+_send_contexts: Dict[int, Tuple[float, Optional[SendContext]]] = {}
+
+
+def get_send_context(
+    distribution_id: int, use_cache: bool = True
+) -> Optional[SendContext]:
+    """
+    Returns the send context of a distribution, cached in the worker process
+    for SEND_CONTEXT_CACHE_TTL seconds, so the batches of a distribution
+    do not load the distribution again and again.
+    Changes of the distribution reach the workers when their cache expires.
+
+    Args:
+        distribution_id (int): The ID of the distribution.
+        use_cache (bool): Whether the cached context can be returned.
+            The context is loaded and cached again if not.
+
+    Returns:
+        Optional[SendContext]: The send context, or None if the distribution
+            does not exist.
+    """
+
+    current_time = time.monotonic()
+    cached = _send_contexts.get(distribution_id)
+    if use_cache and cached is not None and cached[0] > current_time:
+        return cached[1]
+
+    values = (
+        Distribution.objects.filter(id=distribution_id)
+        .values_list("message_text", "end_datetime", "priority", "state")
+        .first()
+    )
+    context = SendContext(distribution_id, *values) if values else None
+
+    if len(_send_contexts) >= SEND_CONTEXT_CACHE_SIZE:
+        _send_contexts.clear()
+    _send_contexts[distribution_id] = (current_time + SEND_CONTEXT_CACHE_TTL, context)
+
+    return context
+
+
+def forget_send_context(distribution_id: int) -> None:
+    """
+    Removes the send context of a distribution from the cache of the current process.
+
+    Args:
+        distribution_id (int): The ID of the distribution.
+    """
+
+    _send_contexts.pop(distribution_id, None)
+
+
+def get_state_key(distribution_id: int) -> str:
+    return f"distribution:{distribution_id}:state"
+
+
+def set_state_flag(distribution: Distribution) -> None:
+    """
+    Sets the state of a paused, cancelled or resumed distribution in Redis,
+    so the workers see it at once, without waiting for their cached
+    send contexts to expire. The flag expires when the distribution ends.
+    If Redis is not available, the workers see the state in SEND_CONTEXT_CACHE_TTL.
+
+    Args:
+        distribution (Distribution): The distribution with its new state.
+    """
+
+    expires_in = (distribution.end_datetime - timezone.now()).total_seconds()
+
+    try:
+        get_redis_client().set(
+            get_state_key(distribution.id),
+            distribution.state,
+            ex=max(1, int(expires_in)),
+        )
+    except RedisError as error:
+        logger.warning(
+            f"Distribution #{distribution.id}: Failed to set the state flag, "
+            "the workers will see the state when their send contexts expire. "
+            f"Error: {error!r}"
+        )
+
+
+def is_stopped(context: SendContext) -> bool:
+    """
+    Checks if a distribution is paused or cancelled by its state flag in Redis.
+    If there is no flag or Redis is not available,
+    the state of the send context is used.
+
+    The cached context may be older than the flag, e.g. if the distribution
+    has been resumed since it was cached, so it is loaded again
+    when its state disagrees with the flag, or when it is not active
+    and there is no flag to check it against.
+
+    Args:
+        context (SendContext): The send context of the distribution.
+
+    Returns:
+        bool: True if the messages of the distribution must not be sent.
+    """
+
+    try:
+        state = get_redis_client().get(get_state_key(context.distribution_id))
+    except RedisError as error:
+        logger.warning(
+            f"Distribution #{context.distribution_id}: "
+            f"Failed to check the state flag. Error: {error!r}"
+        )
+        state = None
+
+    if state is not None:
+        state = state.decode()
+        if state != context.state:
+            get_send_context(context.distribution_id, use_cache=False)
+        return state != Distribution.State.ACTIVE
+
+    if context.state == Distribution.State.ACTIVE:
+        return False
+
+    context = get_send_context(context.distribution_id, use_cache=False)
+    return context is None or context.state != Distribution.State.ACTIVE
@@ -1,6 +1,7 @@
 from rest_framework.serializers import (
     HyperlinkedModelSerializer,
     IntegerField,
+    PrimaryKeyRelatedField,
     Serializer,
 )
 
@@ -29,6 +30,8 @@ class DistributionSerializer(HyperlinkedModelSerializer):
             "message_text",
             "client_filter_operator_code",
             "client_filter_tag",
+            "priority",
+            "state",
         )
 
 
@@ -52,3 +55,22 @@ class MessageSerializer(HyperlinkedModelSerializer):
             "distribution",
             "client",
         )
+
+
+class MessageFlatSerializer(HyperlinkedModelSerializer):
+    """
+    Message with the IDs of its distribution and client instead of nested objects.
+    """
+
+    distribution = PrimaryKeyRelatedField(read_only=True)
+    client = PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = (
+            "id",
+            "created_at",
+            "status",
+            "distribution",
+            "client",
+        )
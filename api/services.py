@@ -1,26 +1,69 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
 from django.contrib.auth.models import User
 from django.core.mail import send_mail
+from django.db import transaction
 from django.utils import timezone
 
 from api.logs import logger
-from api.models import Distribution, Message
-from api.utils import generate_stats_message
-from config.settings import DEFAULT_FROM_EMAIL
-from external.mailing_service import MailingServiceClient
+from api.models import Distribution, DistributionSchedule, FailedDelivery, Message
+from api.send_context import (
+    forget_send_context,
+    get_send_context,
+    is_stopped,
+    set_state_flag,
+)
+from api.utils import generate_stats_message, get_delivery_time, split_into_batches
+from config.settings import (
+    DEFAULT_FROM_EMAIL,
+    DELIVERY_WINDOW_END_HOUR,
+    DELIVERY_WINDOW_START_HOUR,
+    DISTRIBUTION_CHUNK_SIZE,
+    MESSAGE_BATCH_SIZE,
+    MESSAGE_RETRY_MAX_DELAY,
+    MESSAGE_RETRY_SWEEP_LIMIT,
+)
+from external.backends import create_mailing_backend
+from external.circuit_breaker import create_circuit_breaker
+from external.mailing_service import MailingServiceUnavailable, OutgoingMessage
+from external.rate_limit import create_rate_limiter
 
-mailing_service = MailingServiceClient()
+rate_limiter = create_rate_limiter()
+circuit_breaker = create_circuit_breaker()
+mailing_service = create_mailing_backend(
+    rate_limiter=rate_limiter, circuit_breaker=circuit_breaker
+)
+# ended distributions whose not sent messages this worker has marked as failed
+aborted_distribution_ids = set()
 
 
-def start_distribution(distribution_id: int) -> None:
+class ClaimExpired(Exception):
+    """
+    The worker that claimed the message did not report the result in time.
+    """
+
+
+def start_distribution(
+    distribution_id: int, client_timezone: Optional[int] = None
+) -> None:
     """
     Starts the message distribution process.
 
+    The messages are sent to the clients of every timezone within the delivery
+    window of their local time. The clients whose window is open are sent
+    messages right away, the others are scheduled for the time their window opens.
+
+    The messages of a paused distribution are created, but not sent
+    until it is resumed. A cancelled distribution is not started.
+
     Args:
         distribution_id (int): The ID of the distribution to start.
+        client_timezone (Optional[int]): If given, the messages of an already
+            started distribution are sent to the clients in this timezone.
     """
 
-    from .tasks import send_message_task
-
     try:
         distribution = Distribution.objects.get(id=distribution_id)
     except Distribution.DoesNotExist:
@@ -29,54 +72,669 @@ def start_distribution(distribution_id: int) -> None:
         )
         return
 
-    messages, created = distribution.get_or_create_messages_for_sending()
-    if messages:
+    if timezone.now() > distribution.end_datetime:
+        logger.error(
+            f"Distribution #{distribution_id}: Sending aborted. "
+            "Distribution has already ended."
+        )
+        return
+
+    if distribution.state == Distribution.State.CANCELLED:
+        logger.error(
+            f"Distribution #{distribution_id}: Sending aborted. Distribution is cancelled."
+        )
+        return
+
+    if client_timezone is None:
+        logger.info(f"Distribution #{distribution_id}: Start sending messages...")
+
+        counts = distribution.materialize_messages(DISTRIBUTION_CHUNK_SIZE)
         logger.info(
-            f"Distribution #{distribution_id}: Start sending {len(messages)} messages..."
+            f"Distribution #{distribution_id}: {counts['created']} messages created, "
+            f"{counts['existing']} already existed."
         )
+
+    if distribution.state == Distribution.State.PAUSED:
+        logger.info(
+            f"Distribution #{distribution_id}: Distribution is paused. "
+            "Messages will be sent when it is resumed."
+        )
+        return
+
+    if client_timezone is None:
+        client_timezones = schedule_client_timezones(distribution)
     else:
-        logger.info(f"Distribution #{distribution_id}: No messages to send.")
+        logger.info(
+            f"Distribution #{distribution_id}: Start sending messages "
+            f"to the clients in UTC{client_timezone:+d}..."
+        )
+        client_timezones = [client_timezone]
 
-    for message in messages:
-        send_message_task.apply_async(args=[message.id], countdown=0)
+    enqueue_pending_messages(distribution, client_timezones)
 
 
-def send_message(message_id: int) -> None:
+def enqueue_pending_messages(
+    distribution: Distribution, client_timezones: Optional[List[int]]
+) -> int:
     """
-    Sends a message to the client.
-    Updates the message status accordingly.
+    Enqueues the not sent messages of a distribution in batches.
 
     Args:
-        message_id (int): The ID of the message in the database.
+        distribution (Distribution): The distribution of the messages.
+        client_timezones (Optional[List[int]]): If given, only the messages
+            to the clients in these timezones are enqueued.
+
+    Returns:
+        int: The number of enqueued messages.
+    """
+
+    from .tasks import send_message_batch_task
+
+    total_messages = 0
+    for message_ids in distribution.iter_pending_message_ids(
+        DISTRIBUTION_CHUNK_SIZE, client_timezones
+    ):
+        for batch in split_into_batches(message_ids, MESSAGE_BATCH_SIZE):
+            send_message_batch_task.apply_async(
+                args=[batch, distribution.id],
+                countdown=0,
+                priority=distribution.priority,
+            )
+
+        total_messages += len(message_ids)
+        logger.info(
+            f"Distribution #{distribution.id}: {len(message_ids)} messages enqueued "
+            f"({total_messages} in total)."
+        )
+
+    if not total_messages:
+        logger.info(f"Distribution #{distribution.id}: No messages to send.")
+
+    return total_messages
+
+
+def schedule_client_timezones(distribution: Distribution) -> Optional[List[int]]:
+    """
+    Groups the not sent messages of a distribution by the timezones
+    of their clients and schedules every timezone for the time
+    its delivery window opens within the distribution period.
+    The messages of the timezones whose window does not open
+    before the distribution ends are not sent.
+
+    Args:
+        distribution (Distribution): The distribution being started.
+
+    Returns:
+        Optional[List[int]]: The timezones whose messages are to be sent now,
+            or None if the messages of all timezones are.
+    """
+
+    current_time = timezone.now()
+    due_timezones = []
+    schedules = []
+    all_due = True
+
+    messages_by_timezone = distribution.count_pending_messages_by_timezone()
+
+    for client_timezone, messages in sorted(messages_by_timezone.items()):
+        delivery_time = get_delivery_time(
+            max(current_time, distribution.start_datetime),
+            distribution.end_datetime,
+            client_timezone,
+            DELIVERY_WINDOW_START_HOUR,
+            DELIVERY_WINDOW_END_HOUR,
+        )
+
+        if delivery_time is None:
+            all_due = False
+            logger.error(
+                f"Distribution #{distribution.id}: {messages} messages to the clients "
+                f"in UTC{client_timezone:+d} will not be sent. "
+                "Their delivery window does not open before the distribution ends."
+            )
+        elif delivery_time <= current_time:
+            due_timezones.append(client_timezone)
+        else:
+            all_due = False
+            schedules.append(
+                DistributionSchedule(
+                    distribution=distribution,
+                    client_timezone=client_timezone,
+                    run_at=delivery_time,
+                )
+            )
+            logger.info(
+                f"Distribution #{distribution.id}: {messages} messages to the clients "
+                f"in UTC{client_timezone:+d} will be sent at {delivery_time}."
+            )
+
+    DistributionSchedule.objects.bulk_create(schedules, ignore_conflicts=True)
+
+    return None if all_due else due_timezones
+
+
+def start_due_distributions() -> int:
+    """
+    Starts the distributions whose scheduled start time has come.
+
+    The schedules are claimed by chunks with SELECT ... FOR UPDATE SKIP LOCKED,
+    so every distribution is started once, even by concurrent schedulers.
+
+    Returns:
+        int: The number of started distributions.
+    """
+
+    from .tasks import start_distribution_task
+
+    started_distributions = 0
+
+    while True:
+        due_distributions = DistributionSchedule.objects.claim_due(
+            DISTRIBUTION_CHUNK_SIZE
+        )
+
+        for distribution_id, priority, client_timezone in due_distributions:
+            logger.info(f"Distribution #{distribution_id}: Start time has come.")
+            start_distribution_task.apply_async(
+                args=[distribution_id, client_timezone], countdown=0, priority=priority
+            )
+
+        started_distributions += len(due_distributions)
+
+        if len(due_distributions) < DISTRIBUTION_CHUNK_SIZE:
+            return started_distributions
+
+
+# The states a distribution can be changed to, and the states it can be changed from.
+DISTRIBUTION_STATE_TRANSITIONS = {
+    Distribution.State.PAUSED: [Distribution.State.ACTIVE],
+    Distribution.State.ACTIVE: [Distribution.State.PAUSED],
+    Distribution.State.CANCELLED: [
+        Distribution.State.ACTIVE,
+        Distribution.State.PAUSED,
+    ],
+}
+
+
+def change_distribution_state(distribution: Distribution, state: str) -> bool:
+    """
+    Pauses, resumes or cancels a distribution.
+
+    The new state is saved only if the distribution is still in a state
+    it can be changed from, and is set as a flag in Redis, so the workers
+    drop the queued messages of a paused or cancelled distribution at once.
+    The messages stay not sent: a resumed distribution enqueues them again,
+    a cancelled one stops retrying its failed messages.
+
+    Args:
+        distribution (Distribution): The distribution to change.
+        state (str): The new state.
+
+    Returns:
+        bool: False if the distribution cannot be changed to the state.
+    """
+
+    from .tasks import resume_distribution_task
+
+    changed = Distribution.objects.filter(
+        id=distribution.id, state__in=DISTRIBUTION_STATE_TRANSITIONS[state]
+    ).update(state=state)
+    if not changed:
+        return False
+
+    distribution.state = state
+    forget_send_context(distribution.id)
+    set_state_flag(distribution)
+
+    if state == Distribution.State.CANCELLED:
+        FailedDelivery.objects.filter(
+            message__distribution=distribution, next_attempt_at__isnull=False
+        ).update(next_attempt_at=None)
+        DistributionSchedule.objects.filter(
+            distribution=distribution, claimed_at__isnull=True
+        ).update(claimed_at=timezone.now())
+
+    if state == Distribution.State.ACTIVE:
+        resume_distribution_task.apply_async(
+            args=[distribution.id], priority=distribution.priority
+        )
+
+    logger.info(f"Distribution #{distribution.id}: State changed to {state}.")
+
+    return True
+
+
+def resume_distribution(distribution_id: int) -> None:
+    """
+    Enqueues again the not sent messages of a resumed distribution,
+    if it has already started. Messages that have been sent are not enqueued.
+
+    Args:
+        distribution_id (int): The ID of the resumed distribution.
     """
 
     try:
-        message = Message.objects.get(id=message_id)
-    except Message.DoesNotExist:
-        logger.error(f"Message #{message_id}: Sending aborted. Message does not exist.")
+        distribution = Distribution.objects.get(id=distribution_id)
+    except Distribution.DoesNotExist:
+        logger.error(
+            f"Distribution #{distribution_id}: Resuming aborted. Distribution does not exist."
+        )
+        return
+
+    current_time = timezone.now()
+
+    if distribution.state != Distribution.State.ACTIVE:
         return
 
-    if timezone.now() > message.distribution.end_datetime:
+    if current_time > distribution.end_datetime:
         logger.error(
-            f"Message #{message_id}: Sending aborted. Distribution has already ended."
+            f"Distribution #{distribution_id}: Resuming aborted. "
+            "Distribution has already ended."
         )
         return
 
-    if message.status == Message.MessageStatus.SENT:
+    if current_time < distribution.start_datetime:
         return
 
-    mailing_service.send_message(
-        text=message.distribution.message_text,
-        phone_number=message.client.phone_number,
-        message_id=message.id,
-    )
+    logger.info(f"Distribution #{distribution_id}: Resume sending messages...")
+
+    client_timezones = schedule_client_timezones(distribution)
+    enqueue_pending_messages(distribution, client_timezones)
+
 
-    message.status = Message.MessageStatus.SENT
-    message.save()
+def send_message(message_id: int) -> None:
+    """
+    Sends a message to the client.
+    Updates the message status accordingly.
+
+    A failed attempt is recorded, and the message is sent again
+    by retry_failed_deliveries when its next attempt is due.
+
+    Args:
+        message_id (int): The ID of the message in the database.
+    """
 
-    logger.info(
-        f"Message #{message_id}: Sent successfully to the Client #{message.client.id}."
+    send_message_batch([message_id])
+
+
+def send_message_batch(
+    message_ids: List[int], distribution_id: Optional[int] = None
+) -> None:
+    """
+    Sends a batch of messages to the clients.
+    Updates the statuses of the sent messages and the sent messages counter
+    with one query per distribution.
+
+    The text and the end time of a distribution are taken from its send context,
+    cached by the worker, so the distribution is not loaded for every message.
+    If the distribution of the batch is given and has ended, or is paused
+    or cancelled, the batch is dropped before the messages are queried.
+    The not sent messages of an ended distribution are marked as failed
+    with abort_ended_distribution.
+
+    The messages are claimed before they are sent, so messages that are
+    already sent or are being sent by another worker are skipped.
+    If sending the batch fails as a whole, the claimed messages are released
+    before the error is raised, so a retry of the task can claim them again.
+
+    Messages that fail to send are released as not sent, and their failed
+    attempts are recorded, so retry_failed_deliveries only resends the failed
+    ones when their next attempts are due.
+
+    While the circuit breaker of the mailing service is open, the messages
+    are parked without sending them, until the service is expected back.
+
+    Args:
+        message_ids (List[int]): The IDs of the messages in the database.
+        distribution_id (Optional[int]): The ID of the distribution of the messages,
+            if they belong to one distribution.
+    """
+
+    current_time = timezone.now()
+
+    if distribution_id is not None:
+        context = get_send_context(distribution_id)
+        if context is None or context.has_ended(current_time):
+            logger.error(
+                f"Distribution #{distribution_id}: {len(message_ids)} messages dropped. "
+                "Distribution has already ended."
+            )
+            if context is not None:
+                abort_ended_distribution(distribution_id)
+            return
+
+        if is_stopped(context):
+            logger.info(
+                f"Distribution #{distribution_id}: {len(message_ids)} messages dropped. "
+                "Distribution is paused or cancelled."
+            )
+            return
+
+    claimed_until, messages = Message.objects.claim(message_ids, distribution_id)
+
+    try:
+        send_claimed_messages(messages, claimed_until, distribution_id, current_time)
+    except Exception:
+        # released at once, not when the claim expires, so a retry of the task
+        # can claim them again
+        Message.objects.release(
+            [message_id for message_id, *_ in messages],
+            Message.MessageStatus.NOT_SENT,
+            claimed_until,
+        )
+        raise
+
+
+def send_claimed_messages(
+    messages: List[Tuple[int, int, int, str, Optional[int]]],
+    claimed_until: datetime,
+    distribution_id: Optional[int],
+    current_time: datetime,
+) -> None:
+    """
+    Sends messages claimed by send_message_batch and records the results:
+    sent messages are marked as sent, failed and skipped ones are released.
+
+    Args:
+        messages (List[Tuple[int, int, int, str, Optional[int]]]): The claimed
+            messages, as returned by Message.objects.claim.
+        claimed_until (datetime): The claimed_until value of the claim.
+        distribution_id (Optional[int]): The ID of the distribution of the messages,
+            if it has been checked already.
+        current_time (datetime): The time the batch is sent at.
+    """
+
+    outgoing_messages = []
+    messages_by_id = {}
+    skipped_message_ids = []
+    ended_distribution_ids = set()
+    # checked once per distribution, the batch has been checked already
+    stopped_distributions = {distribution_id: False}
+
+    for message in messages:
+        message_id, message_distribution_id, _, phone_number, _ = message
+        context = get_send_context(message_distribution_id)
+
+        if context.has_ended(current_time):
+            logger.error(
+                f"Message #{message_id}: Sending aborted. Distribution has already ended."
+            )
+            skipped_message_ids.append(message_id)
+            ended_distribution_ids.add(message_distribution_id)
+            continue
+
+        if message_distribution_id not in stopped_distributions:
+            stopped_distributions[message_distribution_id] = is_stopped(context)
+
+        if stopped_distributions[message_distribution_id]:
+            logger.error(
+                f"Message #{message_id}: Sending aborted. "
+                "Distribution is paused or cancelled."
+            )
+            skipped_message_ids.append(message_id)
+            continue
+
+        messages_by_id[message_id] = message
+        outgoing_messages.append(
+            OutgoingMessage(
+                message_id=message_id,
+                phone_number=phone_number,
+                text=context.message_text,
+            )
+        )
+
+    if skipped_message_ids:
+        Message.objects.release(
+            skipped_message_ids, Message.MessageStatus.NOT_SENT, claimed_until
+        )
+
+    for ended_distribution_id in ended_distribution_ids:
+        abort_ended_distribution(ended_distribution_id)
+
+    retry_after = circuit_breaker.get_retry_after() if circuit_breaker else 0
+
+    if retry_after and outgoing_messages:
+        results = {
+            message.message_id: MailingServiceUnavailable(
+                message.message_id, retry_after
+            )
+            for message in outgoing_messages
+        }
+    else:
+        results = send_outgoing_messages(outgoing_messages)
+
+    sent_message_ids = defaultdict(list)
+    retried_message_ids = []
+    errors = {}
+    parked_errors = {}
+
+    for message_id, error in results.items():
+        if isinstance(error, MailingServiceUnavailable):
+            parked_errors[message_id] = error
+            continue
+
+        if error is not None:
+            logger.error(f"Message #{message_id}: Sending failed. Error: {error!r}")
+            errors[message_id] = error
+            continue
+
+        _, message_distribution_id, client_id, _, failed_delivery_id = messages_by_id[
+            message_id
+        ]
+        sent_message_ids[message_distribution_id].append(message_id)
+        if failed_delivery_id is not None:
+            retried_message_ids.append(message_id)
+        logger.info(
+            f"Message #{message_id}: Sent successfully to the Client #{client_id}."
+        )
+
+    for message_distribution_id, distribution_message_ids in sent_message_ids.items():
+        Message.objects.mark_sent(message_distribution_id, distribution_message_ids)
+
+    if retried_message_ids:
+        FailedDelivery.objects.filter(message_id__in=retried_message_ids).delete()
+
+    if errors:
+        record_failed_deliveries(errors, claimed_until)
+
+    if parked_errors:
+        logger.warning(
+            f"{len(parked_errors)} messages parked. Mailing service is unavailable."
+        )
+        FailedDelivery.objects.park(parked_errors)
+        Message.objects.release(
+            list(parked_errors), Message.MessageStatus.NOT_SENT, claimed_until
+        )
+
+
+def abort_ended_distribution(distribution_id: int) -> int:
+    """
+    Marks the not sent messages of an ended distribution as failed with one UPDATE,
+    the first time the worker finds the distribution ended, so the rest of its
+    queued batches are dropped without leaving the messages without a final status.
+
+    Args:
+        distribution_id (int): The ID of the ended distribution.
+
+    Returns:
+        int: The number of messages marked as failed.
+    """
+
+    if distribution_id in aborted_distribution_ids:
+        return 0
+
+    aborted_messages = Message.objects.filter(
+        distribution_id=distribution_id, status=Message.MessageStatus.NOT_SENT
+    ).update(status=Message.MessageStatus.FAILED)
+    aborted_distribution_ids.add(distribution_id)
+
+    if aborted_messages:
+        logger.warning(
+            f"Distribution #{distribution_id}: {aborted_messages} not sent messages "
+            "failed. Distribution has already ended."
+        )
+
+    return aborted_messages
+
+
+def record_failed_deliveries(
+    errors: Dict[int, Exception], claimed_until: datetime
+) -> None:
+    """
+    Records failed attempts to send messages and schedules their next attempts.
+    The claimed messages are released as not sent, or as failed
+    if they have used up their attempts.
+
+    Args:
+        errors (Dict[int, Exception]): The errors by message ID.
+        claimed_until (datetime): The claimed_until value of the claim
+            of the messages.
+    """
+
+    abandoned_message_ids = FailedDelivery.objects.record(errors)
+
+    for message_id in abandoned_message_ids:
+        logger.error(
+            f"Message #{message_id}: Sending abandoned. Too many failed attempts."
+        )
+
+    Message.objects.release(
+        [message_id for message_id in errors if message_id not in abandoned_message_ids],
+        Message.MessageStatus.NOT_SENT,
+        claimed_until,
     )
+    if abandoned_message_ids:
+        Message.objects.release(
+            abandoned_message_ids, Message.MessageStatus.FAILED, claimed_until
+        )
+
+
+def retry_failed_deliveries() -> int:
+    """
+    Sends again the failed messages whose next attempts are due,
+    in batches by distribution, at the priority of the distribution.
+    At most MESSAGE_RETRY_SWEEP_LIMIT messages are sent again at a time.
+
+    The failures are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so
+    concurrent sweeps do not take the same messages, and their next attempts
+    are postponed for MESSAGE_RETRY_MAX_DELAY, so a lost batch is sent again later.
+    Failures of ended distributions are not scheduled anymore,
+    failures of paused distributions wait until they are resumed.
+
+    Messages whose claims have expired, e.g. because their worker was killed,
+    are recorded as failed attempts, so they are sent again as well.
+    They are locked while they are released, so a worker re-claiming them
+    at the same time either waits for the release or makes the sweep skip them.
+
+    Returns:
+        int: The number of messages sent again.
+    """
+
+    from .tasks import send_message_batch_task
+
+    current_time = timezone.now()
+
+    with transaction.atomic():
+        expired_messages = list(
+            Message.objects.select_for_update(skip_locked=True)
+            .filter(status=Message.MessageStatus.SENDING, claimed_until__lt=current_time)
+            .values_list("id", "claimed_until")[:MESSAGE_RETRY_SWEEP_LIMIT]
+        )
+        if expired_messages:
+            logger.error(
+                f"{len(expired_messages)} messages were not sent in time "
+                "by the workers that claimed them."
+            )
+
+        # released by claim, the messages of a batch share their claim
+        expired_message_ids_by_claim = defaultdict(list)
+        for message_id, claimed_until in expired_messages:
+            expired_message_ids_by_claim[claimed_until].append(message_id)
+
+        for claimed_until, message_ids in expired_message_ids_by_claim.items():
+            record_failed_deliveries(
+                {message_id: ClaimExpired() for message_id in message_ids},
+                claimed_until,
+            )
+
+    # messages sent by a worker whose claim had expired
+    FailedDelivery.objects.filter(
+        next_attempt_at__lte=current_time,
+        message__status=Message.MessageStatus.SENT,
+    ).delete()
+
+    FailedDelivery.objects.filter(
+        next_attempt_at__isnull=False,
+        message__distribution__end_datetime__lt=current_time,
+    ).update(next_attempt_at=None)
+
+    retried_messages = 0
+
+    while retried_messages < MESSAGE_RETRY_SWEEP_LIMIT:
+        chunk_size = min(
+            DISTRIBUTION_CHUNK_SIZE, MESSAGE_RETRY_SWEEP_LIMIT - retried_messages
+        )
+
+        with transaction.atomic():
+            due_messages = list(
+                FailedDelivery.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(
+                    next_attempt_at__lte=current_time,
+                    message__distribution__state=Distribution.State.ACTIVE,
+                )
+                .order_by("next_attempt_at")
+                .values_list(
+                    "message_id",
+                    "message__distribution_id",
+                    "message__distribution__priority",
+                )[:chunk_size]
+            )
+            if not due_messages:
+                break
+
+            message_ids_by_distribution = defaultdict(list)
+            for message_id, distribution_id, priority in due_messages:
+                message_ids_by_distribution[distribution_id, priority].append(message_id)
+
+            FailedDelivery.objects.filter(
+                message_id__in=[message_id for message_id, *_ in due_messages]
+            ).update(
+                next_attempt_at=current_time
+                + timezone.timedelta(seconds=MESSAGE_RETRY_MAX_DELAY)
+            )
+
+        for (
+            distribution_id,
+            priority,
+        ), message_ids in message_ids_by_distribution.items():
+            for batch in split_into_batches(message_ids, MESSAGE_BATCH_SIZE):
+                send_message_batch_task.apply_async(
+                    args=[batch, distribution_id], priority=priority
+                )
+
+        retried_messages += len(due_messages)
+
+    if retried_messages:
+        logger.info(f"{retried_messages} failed messages enqueued to be sent again.")
+
+    return retried_messages
+
+
+def send_outgoing_messages(
+    messages: List[OutgoingMessage],
+) -> Dict[int, Optional[Exception]]:
+    """
+    Sends messages with the mailing backend selected by MAILING_SERVICE_BACKEND.
+
+    Args:
+        messages (List[OutgoingMessage]): The messages to send.
+
+    Returns:
+        Dict[int, Optional[Exception]]: The outcome for every message ID:
+            None if the message was sent, otherwise the error.
+    """
+
+    return mailing_service.send_messages(messages)
 
 
 def send_daily_report_to_admins() -> None:
@@ -1,36 +1,97 @@
+from typing import List, Optional
+
 from celery import shared_task
 from celery.exceptions import MaxRetriesExceededError
+from django.utils import timezone
 
 from api.logs import logger
-from api.services import send_daily_report_to_admins, send_message, start_distribution
+from api.models import DistributionSchedule
+from api.services import (
+    resume_distribution,
+    retry_failed_deliveries,
+    send_daily_report_to_admins,
+    send_message,
+    send_message_batch,
+    start_distribution,
+    start_due_distributions,
+)
 
 
 @shared_task(
-    autoretry_for=(Exception,), max_retries=3, default_retry_delay=60, ignore_result=True
+    bind=True,
+    autoretry_for=(Exception,),
+    max_retries=3,
+    default_retry_delay=60,
+    ignore_result=True,
 )
-def start_distribution_task(distribution_id: int) -> None:
+def start_distribution_task(
+    self, distribution_id: int, client_timezone: Optional[int] = None
+) -> None:
     """
     A background task that starts a message distribution to clients.
+    If the last retry fails, the start is scheduled again in an hour.
 
     Args:
         distribution_id: The ID of the distribution instance to start.
+        client_timezone: If given, the timezone of the clients to send messages to.
     """
 
     try:
-        start_distribution(distribution_id)
+        start_distribution(distribution_id, client_timezone)
+
+    except Exception:
+        # autoretry_for retries the task, and after the last retry
+        # re-raises the error, not MaxRetriesExceededError
+        if self.request.retries < self.max_retries:
+            raise
 
-    except MaxRetriesExceededError:
         logger.error(
             f"Distribution #{distribution_id}: Distribution shifted. Too many retries."
         )
         delay = 60 * 60  # 1 hour
-        start_distribution_task.apply_async(args=[distribution_id], countdown=delay)
+        DistributionSchedule.objects.bulk_create(
+            [
+                DistributionSchedule(
+                    distribution_id=distribution_id,
+                    client_timezone=client_timezone,
+                    run_at=timezone.now() + timezone.timedelta(seconds=delay),
+                )
+            ],
+            ignore_conflicts=True,
+        )
 
 
+@shared_task(
+    autoretry_for=(Exception,), max_retries=3, default_retry_delay=60, ignore_result=True
+)
+def resume_distribution_task(distribution_id: int) -> None:
+    """
+    A background task that enqueues again the not sent messages
+    of a resumed distribution.
+
+    Args:
+        distribution_id: The ID of the resumed distribution instance.
+    """
+
+    resume_distribution(distribution_id)
+
+
+@shared_task(ignore_result=True)
+def start_due_distributions_task() -> None:
+    """
+    A periodic task that starts the distributions whose start time has come.
+    """
+
+    start_due_distributions()
+
+
+# Failed messages are recorded and sent again by retry_failed_deliveries_task,
+# so these tasks are retried only if they fail as a whole, e.g. on database errors.
 @shared_task(
     autoretry_for=(Exception,),
     max_retries=3,
-    default_retry_delay=60,
+    retry_backoff=60,
+    retry_jitter=True,
     ignore_result=True,
 )
 def send_message_task(message_id: int) -> None:
@@ -41,13 +102,38 @@ def send_message_task(message_id: int) -> None:
         message_id: The ID of the message instance to send.
     """
 
-    try:
-        send_message(message_id)
+    send_message(message_id)
 
-    except MaxRetriesExceededError:
-        logger.error(f"Message #{message_id}: Sending shifted. Too many retries.")
-        delay = 60 * 60  # 1 hour
-        send_message_task.apply_async(args=[message_id], countdown=delay)
+
+@shared_task(
+    autoretry_for=(Exception,),
+    max_retries=3,
+    retry_backoff=60,
+    retry_jitter=True,
+    ignore_result=True,
+)
+def send_message_batch_task(
+    message_ids: List[int], distribution_id: Optional[int] = None
+) -> None:
+    """
+    A background task that sends a batch of messages to clients
+    using the external mailing API.
+
+    Args:
+        message_ids: The IDs of the message instances to send.
+        distribution_id: The ID of the distribution of the messages, if known.
+    """
+
+    send_message_batch(message_ids, distribution_id)
+
+
+@shared_task(ignore_result=True)
+def retry_failed_deliveries_task() -> None:
+    """
+    A periodic task that sends again the failed messages whose next attempts are due.
+    """
+
+    retry_failed_deliveries()
 
 
 @shared_task(
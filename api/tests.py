@@ -1,23 +1,75 @@
+import csv
+import json
 import time
-from unittest.mock import call, patch
-
+from datetime import timezone as dt_timezone
+from io import BytesIO, StringIO
+from tempfile import NamedTemporaryFile
+from unittest import skipUnless
+from unittest.mock import MagicMock, call, patch
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
-from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
 from django.utils import timezone
+from redis import RedisError
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from api.exports import CLIENT_EXPORT_FIELDS, iter_export
+from api.imports import import_clients
 from api.logs import logger
-from api.models import Client, Distribution, Message
+from api.models import (
+    Client,
+    Distribution,
+    DistributionSchedule,
+    FailedDelivery,
+    Message,
+)
 from api.serializers import (
     ClientSerializer,
     DistributionSerializer,
     DistributionStatsSerializer,
+    MessageFlatSerializer,
     MessageSerializer,
 )
-from api.services import send_message
-from api.tasks import start_distribution
-from api.utils import generate_stats_message
+from api.services import (
+    resume_distribution,
+    retry_failed_deliveries,
+    send_message,
+    send_message_batch,
+    start_due_distributions,
+)
+from api.tasks import start_distribution, start_distribution_task
+from api.utils import (
+    generate_stats_message,
+    get_delivery_time,
+    get_retry_delay,
+    split_into_batches,
+)
+from config.celery import celery_app
+from config.settings import DISTRIBUTION_CHUNK_SIZE
+from external.mailing_service import MailingServiceError, MailingServiceOverloaded
+
+
+class RedisMockMixin:
+    """
+    Replaces the Redis client of the distribution state flags with a mock.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.redis_mock = MagicMock()
+        self.redis_mock.get.return_value = None
+        patcher = patch(
+            "api.send_context.get_redis_client", return_value=self.redis_mock
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
 
 # Models
 
@@ -59,6 +111,31 @@ class DistributionModelTestCase(TestCase):
             client_filter_tag="test_tag",
         )
 
+    def test_save_keeps_message_counters(self):
+        Distribution.objects.increment_stats(
+            self.distribution.id, total_messages=10, sent_messages=7
+        )
+
+        self.distribution.message_text = "Edited Message"
+        self.distribution.save()
+
+        self.distribution.refresh_from_db()
+        self.assertEqual(self.distribution.message_text, "Edited Message")
+        self.assertEqual(self.distribution.total_messages_count, 10)
+        self.assertEqual(self.distribution.sent_messages_count, 7)
+
+    def test_save_keeps_state(self):
+        Distribution.objects.filter(id=self.distribution.id).update(
+            state=Distribution.State.PAUSED
+        )
+
+        self.distribution.message_text = "Edited Message"
+        self.distribution.save()
+
+        self.distribution.refresh_from_db()
+        self.assertEqual(self.distribution.message_text, "Edited Message")
+        self.assertEqual(self.distribution.state, Distribution.State.PAUSED)
+
     def test_create_distribution(self):
         created_distribution = Distribution.objects.get(id=self.distribution.id)
 
@@ -87,7 +164,7 @@ class DistributionModelTestCase(TestCase):
             timezone=5,
         )
 
-        messages, created = self.distribution.get_or_create_messages_for_sending()
+        self.distribution.materialize_messages(chunk_size=10)
 
         stats = self.distribution.get_stats()
 
@@ -96,6 +173,163 @@ class DistributionModelTestCase(TestCase):
         self.assertEqual(stats["sent_messages"], 0)
         self.assertEqual(stats["not_sent_messages"], 1)
 
+    def test_materialize_messages(self):
+        clients = [
+            Client.objects.create(
+                phone_number=f"7890123456{i}",
+                operator_code=self.distribution.client_filter_operator_code,
+                tag=self.distribution.client_filter_tag,
+            )
+            for i in range(5)
+        ]
+        Client.objects.create(phone_number="79000000000", operator_code="000")
+
+        counts = self.distribution.materialize_messages(chunk_size=2)
+
+        self.assertEqual(counts, {"created": 5, "existing": 0})
+        messages = Message.objects.filter(distribution=self.distribution)
+        self.assertEqual(
+            sorted(messages.values_list("client_id", flat=True)),
+            [client.id for client in clients],
+        )
+
+    def test_materialize_messages_again(self):
+        for i in range(3):
+            Client.objects.create(
+                phone_number=f"7890123456{i}",
+                operator_code=self.distribution.client_filter_operator_code,
+                tag=self.distribution.client_filter_tag,
+            )
+        self.distribution.materialize_messages(chunk_size=2)
+        Client.objects.create(
+            phone_number="78901234563",
+            operator_code=self.distribution.client_filter_operator_code,
+            tag=self.distribution.client_filter_tag,
+        )
+
+        counts = self.distribution.materialize_messages(chunk_size=2)
+
+        self.assertEqual(counts, {"created": 1, "existing": 3})
+        self.distribution.refresh_from_db()
+        self.assertEqual(self.distribution.total_messages, 4)
+
+    def test_materialize_messages_does_not_fetch_clients(self):
+        for i in range(3):
+            Client.objects.create(
+                phone_number=f"7890123456{i}",
+                operator_code=self.distribution.client_filter_operator_code,
+                tag=self.distribution.client_filter_tag,
+            )
+
+        with CaptureQueriesContext(connection) as context:
+            self.distribution.materialize_messages(chunk_size=2)
+
+        client_queries = [
+            query["sql"]
+            for query in context.captured_queries
+            if "api_client" in query["sql"]
+        ]
+        self.assertEqual(len(client_queries), 3)
+        self.assertTrue(all("INSERT INTO" in sql for sql in client_queries))
+
+    def test_iter_pending_message_ids(self):
+        for i in range(5):
+            Client.objects.create(
+                phone_number=f"7890123456{i}",
+                operator_code=self.distribution.client_filter_operator_code,
+                tag=self.distribution.client_filter_tag,
+            )
+        self.distribution.materialize_messages(chunk_size=10)
+        message_ids = list(
+            Message.objects.filter(distribution=self.distribution)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        Message.objects.mark_sent(self.distribution.id, message_ids[1:3])
+
+        chunks = list(self.distribution.iter_pending_message_ids(chunk_size=2))
+
+        self.assertEqual(chunks, [[message_ids[0], message_ids[3]], [message_ids[4]]])
+
+    def test_create_messages_for_clients(self):
+        clients = [
+            Client.objects.create(phone_number=f"7890123456{i}") for i in range(3)
+        ]
+        Message.objects.create(distribution=self.distribution, client=clients[0])
+
+        created_messages, existing_messages, last_client_id = (
+            Message.objects.create_for_clients(
+                self.distribution.id, Client.objects.order_by("id")
+            )
+        )
+
+        self.assertEqual(created_messages, 2)
+        self.assertEqual(existing_messages, 1)
+        self.assertEqual(last_client_id, clients[-1].id)
+        self.assertEqual(
+            Message.objects.filter(
+                distribution=self.distribution, status=Message.MessageStatus.NOT_SENT
+            ).count(),
+            3,
+        )
+
+    def test_create_messages_for_no_clients(self):
+        self.assertEqual(
+            Message.objects.create_for_clients(
+                self.distribution.id, Client.objects.none()
+            ),
+            (0, 0, None),
+        )
+
+    def test_with_stats(self):
+        client = Client.objects.create(phone_number="7890123456")
+        Message.objects.create(
+            distribution=self.distribution,
+            client=client,
+            status=Message.MessageStatus.SENT,
+        )
+
+        distribution = Distribution.objects.with_stats().get(id=self.distribution.id)
+
+        self.assertEqual(distribution.stats_total_messages, 1)
+        self.assertEqual(distribution.stats_sent_messages, 1)
+
+    def test_message_counters(self):
+        for i in range(3):
+            Client.objects.create(
+                phone_number=f"7890123456{i}",
+                operator_code=self.distribution.client_filter_operator_code,
+                tag=self.distribution.client_filter_tag,
+            )
+
+        self.distribution.materialize_messages(chunk_size=2)
+        self.distribution.materialize_messages(chunk_size=2)
+        chunks = list(self.distribution.iter_pending_message_ids(chunk_size=2))
+        Message.objects.mark_sent(self.distribution.id, chunks[0])
+        Message.objects.mark_sent(self.distribution.id, chunks[0])
+
+        self.distribution.refresh_from_db()
+        with self.assertNumQueries(0):
+            stats = self.distribution.get_stats()
+
+        self.assertEqual(stats["total_messages"], 3)
+        self.assertEqual(stats["sent_messages"], 2)
+        self.assertEqual(stats["not_sent_messages"], 1)
+
+    def test_rebuild_distribution_stats(self):
+        client = Client.objects.create(phone_number="7890123456")
+        Message.objects.create(
+            distribution=self.distribution,
+            client=client,
+            status=Message.MessageStatus.SENT,
+        )
+
+        call_command("rebuild_distribution_stats", stdout=StringIO())
+
+        self.distribution.refresh_from_db()
+        self.assertEqual(self.distribution.total_messages_count, 1)
+        self.assertEqual(self.distribution.sent_messages_count, 1)
+
     def test_get_by_previous_day(self):
         distribution_1 = Distribution.objects.create(
             start_datetime=timezone.now() - timezone.timedelta(days=2),
@@ -157,6 +391,108 @@ class MessageModelTestCase(TestCase):
         self.assertEqual(str(message), f"Сообщение №{message.id}")
 
 
+@skipUnless(connection.vendor == "postgresql", "Query plans are checked on PostgreSQL")
+class QueryPlanTestCase(TestCase):
+    """
+    Checks that the hot queries can be served by the indexes.
+    Sequential scans are disabled, as the seeded tables are small enough
+    for the planner to prefer them otherwise.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        clients = Client.objects.bulk_create(
+            Client(
+                phone_number=f"7900{i:07d}",
+                operator_code=f"9{i % 10:02d}",
+                tag=f"tag_{i % 7}",
+            )
+            for i in range(1000)
+        )
+        distributions = Distribution.objects.bulk_create(
+            Distribution(
+                start_datetime=timezone.now() - timezone.timedelta(days=i),
+                end_datetime=timezone.now() + timezone.timedelta(days=1),
+                message_text="Test message",
+            )
+            for i in range(10)
+        )
+        cls.distribution = distributions[0]
+        Message.objects.bulk_create(
+            Message(
+                distribution=distribution,
+                client=client,
+                status=(
+                    Message.MessageStatus.NOT_SENT
+                    if client.id % 50 == 0
+                    else Message.MessageStatus.SENT
+                ),
+            )
+            for distribution in distributions
+            for client in clients
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE api_client, api_distribution, api_message")
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute("RESET enable_seqscan")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_messages_by_status(self):
+        messages = Message.objects.filter(
+            distribution=self.distribution, status=Message.MessageStatus.SENT
+        )
+
+        self.assertUsesIndex(messages, "api_message_dist_status_idx")
+
+    def test_not_sent_messages(self):
+        messages = Message.objects.filter(
+            distribution=self.distribution,
+            status=Message.MessageStatus.NOT_SENT,
+            id__gt=0,
+        ).order_by("id")[:100]
+
+        self.assertUsesIndex(messages, "api_message_not_sent_idx")
+
+    def test_filtered_clients(self):
+        self.distribution.client_filter_operator_code = "901"
+        self.distribution.client_filter_tag = "tag_1"
+        clients = (
+            self.distribution.get_filtered_clients()
+            .filter(id__gt=0)
+            .order_by("id")[:100]
+        )
+
+        self.assertUsesIndex(clients, "api_client_operator_tag_idx")
+
+    def test_distribution_messages(self):
+        messages = Message.objects.filter(
+            distribution=self.distribution, id__gt=0
+        ).order_by("id")[:100]
+
+        self.assertUsesIndex(messages, "api_message_dist_id_idx")
+
+    def test_clients_filtered_by_tag(self):
+        self.distribution.client_filter_tag = "tag_1"
+        clients = self.distribution.get_filtered_clients().filter(id__gt=0)
+
+        self.assertUsesIndex(clients, "api_client_tag_idx")
+
+    def test_previous_day_distributions(self):
+        distributions = Distribution.objects.get_by_previous_day()
+
+        self.assertUsesIndex(distributions, "api_distribution_start_idx")
+
+
 # Serializers
 
 
@@ -231,6 +567,8 @@ class DistributionSerializerTestCase(TestCase):
             "message_text": self.distribution.message_text,
             "client_filter_operator_code": self.distribution.client_filter_operator_code,
             "client_filter_tag": self.distribution.client_filter_tag,
+            "priority": self.distribution.priority,
+            "state": self.distribution.state,
         }
 
         self.assertEqual(serializer.data, expected_data)
@@ -249,6 +587,18 @@ class DistributionSerializerTestCase(TestCase):
         self.assertTrue(serializer.is_valid())
         self.assertEqual(serializer.validated_data, valid_data)
 
+    def test_deserialize_distribution_invalid_priority(self):
+        invalid_data = {
+            "end_datetime": timezone.now() + timezone.timedelta(days=2),
+            "message_text": "Test Message",
+            "priority": 10,
+        }
+
+        serializer = DistributionSerializer(data=invalid_data)
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("priority", serializer.errors)
+
     def test_deserialize_distribution_invalid_data(self):
         invalid_data = {
             "start_datetime": timezone.now(),
@@ -397,6 +747,123 @@ class ClientViewSetTestCase(APITestCase):
             Client.objects.get(id=self.client_instance.id)
 
 
+class ClientImportViewTestCase(APITestCase):
+    def setUp(self):
+        self.url = reverse("api:client-import-clients")
+        self.client_instance = Client.objects.create(
+            phone_number="79000000001", operator_code="900", tag="old_tag", timezone=0
+        )
+
+    def test_import_csv(self):
+        body = (
+            "phone_number,operator_code,tag,timezone\n"
+            "79000000001,900,new_tag,3\n"
+            "79000000002,,test_tag,-5\n"
+        )
+
+        response = self.client.post(self.url, data=body, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data, {"rows": 2, "created": 1, "updated": 1, "errors": []}
+        )
+
+        self.client_instance.refresh_from_db()
+        self.assertEqual(self.client_instance.tag, "new_tag")
+        self.assertEqual(self.client_instance.timezone, 3)
+
+        new_client = Client.objects.get(phone_number="79000000002")
+        self.assertEqual(new_client.operator_code, "900")
+        self.assertEqual(new_client.timezone, -5)
+
+    def test_import_ndjson_with_errors(self):
+        body = (
+            '{"phone_number": 79000000003, "tag": "test_tag", "timezone": 2}\n'
+            '{"phone_number": "12345", "operator_code": "9", "timezone": 20}\n'
+            "not json\n"
+        )
+
+        response = self.client.post(
+            self.url, data=body, content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["rows"], 3)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(
+            response.data["errors"],
+            [
+                {
+                    "line": 2,
+                    "errors": {
+                        "phone_number": "Expected format: 7XXXXXXXXXX.",
+                        "operator_code": "Expected 3 digits.",
+                        "timezone": "Expected an integer from -12 to 14.",
+                    },
+                },
+                {"line": 3, "errors": {"non_field_errors": "Invalid JSON object."}},
+            ],
+        )
+        self.assertTrue(Client.objects.filter(phone_number="79000000003").exists())
+
+    def test_import_unsupported_media_type(self):
+        response = self.client.post(self.url, data={}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_import_empty_body(self):
+        response = self.client.post(self.url, data="", content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ClientExportViewTestCase(APITestCase):
+    def setUp(self):
+        self.url = reverse("api:client-export-clients")
+        self.clients = [
+            Client.objects.create(
+                phone_number=f"7900000000{i}", operator_code="900", tag="Тэг, 1"
+            )
+            for i in range(3)
+        ]
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(rows, ClientSerializer(instance=self.clients, many=True).data)
+
+    def test_export_csv(self):
+        response = self.client.get(self.url, {"format": "csv"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('filename="clients.csv"', response["Content-Disposition"])
+
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(
+            rows[0], ["id", "phone_number", "operator_code", "tag", "timezone"]
+        )
+        self.assertEqual(
+            rows[1:],
+            [
+                [str(client.id), client.phone_number, "900", "Тэг, 1", "0"]
+                for client in self.clients
+            ],
+        )
+
+    def test_export_is_rendered_by_chunks(self):
+        chunks = list(
+            iter_export(
+                Client.objects.order_by("id"), CLIENT_EXPORT_FIELDS, "csv", chunk_size=2
+            )
+        )
+
+        # the header and two chunks of rows
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[2].decode().count("\n"), 1)
+
+
 class DistributionViewSetTestCase(APITestCase):
     def setUp(self):
         self.distribution_data = {
@@ -466,6 +933,70 @@ class DistributionViewSetTestCase(APITestCase):
             Distribution.objects.get(id=self.distribution.id)
 
 
+class DistributionStateViewTestCase(RedisMockMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.distribution = Distribution.objects.create(
+            start_datetime=timezone.now(),
+            end_datetime=timezone.now() + timezone.timedelta(days=1),
+            message_text="Test Message",
+        )
+
+    def post(self, action):
+        return self.client.post(
+            reverse(f"api:distribution-{action}", kwargs={"pk": self.distribution.id})
+        )
+
+    def test_pause(self):
+        response = self.post("pause")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["state"], Distribution.State.PAUSED)
+        self.distribution.refresh_from_db()
+        self.assertEqual(self.distribution.state, Distribution.State.PAUSED)
+        key, state = self.redis_mock.set.call_args.args
+        self.assertEqual(key, f"distribution:{self.distribution.id}:state")
+        self.assertEqual(state, Distribution.State.PAUSED)
+
+    def test_pause_paused_distribution(self):
+        self.post("pause")
+
+        response = self.post("pause")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch("api.tasks.resume_distribution_task.apply_async")
+    def test_resume(self, resume_distribution_task_mock):
+        self.post("pause")
+
+        response = self.post("resume")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["state"], Distribution.State.ACTIVE)
+        resume_distribution_task_mock.assert_called_once_with(
+            args=[self.distribution.id], priority=self.distribution.priority
+        )
+
+    def test_cancel(self):
+        message = Message.objects.create(
+            distribution=self.distribution,
+            client=Client.objects.create(phone_number="79000000001"),
+        )
+        failed_delivery = FailedDelivery.objects.create(
+            message=message,
+            attempts=1,
+            error="ConnectionError",
+            next_attempt_at=timezone.now(),
+        )
+
+        response = self.post("cancel")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        failed_delivery.refresh_from_db()
+        self.assertIsNone(failed_delivery.next_attempt_at)
+        self.assertEqual(self.post("resume").status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class DistributionStatsViewTestCase(APITestCase):
     def setUp(self):
         self.distribution_data = {
@@ -523,7 +1054,41 @@ class DistributionsStatsViewTestCase(APITestCase):
             instance=[self.distribution_1.get_stats(), self.distribution_2.get_stats()],
             many=True,
         ).data
-        self.assertEqual(response.data, expected_stats)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["results"], expected_stats)
+
+    def test_get_all_distribution_stats_paginated(self):
+        response = self.client.get(self.url, {"page": 2, "page_size": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        expected_stats = DistributionStatsSerializer(
+            instance=[self.distribution_2.get_stats()], many=True
+        ).data
+        self.assertEqual(response.data["results"], expected_stats)
+
+    def test_get_all_distribution_stats_counts_messages(self):
+        for i in range(3):
+            Client.objects.create(
+                phone_number=f"7900000000{i}",
+                operator_code=self.distribution_1.client_filter_operator_code,
+                tag=self.distribution_1.client_filter_tag,
+            )
+        self.distribution_1.materialize_messages(chunk_size=1)
+        chunks = list(self.distribution_1.iter_pending_message_ids(chunk_size=1))
+        Message.objects.mark_sent(self.distribution_1.id, chunks[0])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.data["results"][0],
+            {
+                "distribution_id": self.distribution_1.id,
+                "total_messages": 3,
+                "sent_messages": 1,
+                "not_sent_messages": 2,
+            },
+        )
 
 
 class MessageViewSetTestCase(APITestCase):
@@ -558,14 +1123,239 @@ class MessageViewSetTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         expected_data = MessageSerializer(instance=[self.message_1], many=True).data
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(response.data["results"], expected_data)
 
     def test_get_messages_by_distribution(self):
         response = self.client.get(self.url_by_distribution)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         expected_data = MessageSerializer(instance=[self.message_1], many=True).data
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(response.data["results"], expected_data)
+
+    def test_get_messages_flat(self):
+        response = self.client.get(self.url_by_distribution, {"flat": "true"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        expected_data = MessageFlatSerializer(instance=[self.message_1], many=True).data
+        self.assertEqual(response.data["results"], expected_data)
+        self.assertEqual(response.data["results"][0]["client"], self.client_1.id)
+
+    def test_get_messages_pages(self):
+        messages = [self.message_1]
+        for i in range(4):
+            client = Client.objects.create(phone_number=f"7900000000{i}")
+            messages.append(
+                Message.objects.create(distribution=self.distribution_1, client=client)
+            )
+
+        message_ids = []
+        url = self.url_by_distribution
+        params = {"page_size": 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+
+            message_ids += [message["id"] for message in response.data["results"]]
+            url, params = response.data["next"], None
+
+        self.assertEqual(message_ids, [message.id for message in messages])
+
+    def test_export_messages_by_distribution(self):
+        url = reverse(
+            "api:message-export-by-distribution", args=[self.distribution_1.id]
+        )
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        expected_data = MessageFlatSerializer(instance=[self.message_1], many=True).data
+        self.assertEqual([json.loads(row) for row in rows], expected_data)
+
+    def test_export_messages_of_missing_distribution(self):
+        url = reverse("api:message-export-by-distribution", args=[0])
+
+        response = self.client.get(url, {"format": "csv"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_messages_query_count(self):
+        for i in range(4):
+            client = Client.objects.create(phone_number=f"7900000000{i}")
+            Message.objects.create(distribution=self.distribution_1, client=client)
+
+        for url in (reverse("api:message-list"), self.url_by_distribution):
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+
+            self.assertEqual(len(response.data["results"]), 5)
+
+
+@patch("api.tasks.resume_distribution_task.apply_async", MagicMock())
+class QueryCountTestCase(RedisMockMixin, APITestCase):
+    """
+    Requests every route of the API and every admin changelist with a few rows
+    and with more rows, and checks that the number of queries stays the same.
+    """
+
+    sizes = (2, 5)
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "x")
+
+    def seed(self, size: int) -> None:
+        """
+        Creates size clients and distributions, a message for every pair of them,
+        a failed delivery for every message of the first distribution
+        and a schedule for every distribution.
+        """
+
+        Distribution.objects.all().delete()
+        Client.objects.all().delete()
+
+        self.clients = Client.objects.bulk_create(
+            Client(phone_number=f"7900000000{i}", tag="tag") for i in range(size)
+        )
+        # bulk_create does not send post_save, so the distributions are not started
+        self.distributions = Distribution.objects.bulk_create(
+            Distribution(
+                end_datetime=timezone.now() + timezone.timedelta(days=1),
+                message_text="Test Message",
+            )
+            for _ in range(size)
+        )
+        messages = Message.objects.bulk_create(
+            Message(distribution=distribution, client=client)
+            for distribution in self.distributions
+            for client in self.clients
+        )
+        FailedDelivery.objects.bulk_create(
+            FailedDelivery(message=message, attempts=1, error="ConnectionError")
+            for message in messages[:size]
+        )
+        DistributionSchedule.objects.bulk_create(
+            DistributionSchedule(distribution=distribution, run_at=timezone.now())
+            for distribution in self.distributions
+        )
+
+    def get_api_requests(self) -> dict:
+        """
+        Returns the request of every route of the API by the route name:
+        (method, URL arguments, extra arguments of the request).
+        """
+
+        client_id = self.clients[0].id
+        distribution_id = self.distributions[0].id
+        # the state routes change the state, pause -> resume -> cancel is valid
+        stateful_distribution_id = self.distributions[-1].id
+        message_id = Message.objects.values_list("id", flat=True).first()
+
+        return {
+            "api-root": ("get", [], {}),
+            "client-list": ("get", [], {}),
+            "client-detail": ("get", [client_id], {}),
+            "client-export-clients": ("get", [], {}),
+            "client-import-clients": (
+                "post",
+                [],
+                {
+                    "data": "phone_number,tag\n79000000001,new\n79000000099,new\n",
+                    "content_type": "text/csv",
+                },
+            ),
+            "distribution-list": ("get", [], {}),
+            "distribution-detail": ("get", [distribution_id], {}),
+            "distribution-pause": ("post", [stateful_distribution_id], {}),
+            "distribution-resume": ("post", [stateful_distribution_id], {}),
+            "distribution-cancel": ("post", [stateful_distribution_id], {}),
+            "distribution-stats": ("get", [distribution_id], {}),
+            "distributions-stats": ("get", [], {}),
+            "message-list": ("get", [], {}),
+            "message-detail": ("get", [message_id], {}),
+            "message-get-by-client": ("get", [client_id], {}),
+            "message-get-by-distribution": ("get", [distribution_id], {}),
+            "message-export-by-distribution": ("get", [distribution_id], {}),
+        }
+
+    def count_queries(self, method: str, url: str, **kwargs) -> CaptureQueriesContext:
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+        self.assertLess(response.status_code, 400, url)
+
+        return context
+
+    def assertQueryCountIsConstant(self, requests) -> None:
+        """
+        Makes the requests at every size and compares their query counts.
+
+        Args:
+            requests: A function returning the requests by name,
+                as (method, URL, extra arguments) tuples.
+        """
+
+        counts = {}
+
+        for size in self.sizes:
+            self.seed(size)
+            for name, (method, url, kwargs) in requests().items():
+                counts.setdefault(name, []).append(
+                    self.count_queries(method, url, **kwargs)
+                )
+
+        for name, contexts in counts.items():
+            with self.subTest(name):
+                queries = [len(context) for context in contexts]
+                self.assertEqual(
+                    len(set(queries)),
+                    1,
+                    f"{name}: {queries} queries for {self.sizes} rows.\n"
+                    + "\n".join(query["sql"] for query in contexts[-1].captured_queries),
+                )
+
+    def test_every_api_route_is_covered(self):
+        def get_route_names(patterns):
+            for pattern in patterns:
+                if hasattr(pattern, "url_patterns"):
+                    yield from get_route_names(pattern.url_patterns)
+                else:
+                    yield pattern.name
+
+        self.seed(1)
+
+        self.assertEqual(
+            set(get_route_names(get_resolver("api.urls").url_patterns)),
+            set(self.get_api_requests()),
+        )
+
+    def test_api_routes(self):
+        def requests():
+            return {
+                name: (method, reverse(f"api:{name}", args=args), kwargs)
+                for name, (method, args, kwargs) in self.get_api_requests().items()
+            }
+
+        self.assertQueryCountIsConstant(requests)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin)
+
+        def requests():
+            return {
+                model._meta.label: (
+                    "get",
+                    reverse(
+                        f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist"
+                    ),
+                    {},
+                )
+                for model in admin.site._registry
+            }
+
+        self.assertQueryCountIsConstant(requests)
 
 
 # Handlers
@@ -586,7 +1376,10 @@ class DistributionSignalHandlerTestCase(TestCase):
         start_distribution_task_mock.assert_called_once_with(
             args=[distribution.id],
             countdown=0,
+            priority=distribution.priority,
         )
+        schedule = DistributionSchedule.objects.get(distribution=distribution)
+        self.assertIsNotNone(schedule.claimed_at)
 
     @patch("api.tasks.start_distribution_task")
     def test_handle_deferred_distribution_creation(self, start_distribution_task_mock):
@@ -607,19 +1400,72 @@ class DistributionSignalHandlerTestCase(TestCase):
             )
 
         start_distribution_task_mock.assert_not_called()
+        schedule = DistributionSchedule.objects.get(distribution=distribution)
+        self.assertEqual(schedule.run_at, distribution.start_datetime)
+        self.assertIsNone(schedule.claimed_at)
+
+    def test_handle_deferred_distribution_update(self):
+        distribution = Distribution.objects.create(
+            start_datetime=timezone.now() + timezone.timedelta(days=1),
+            end_datetime=timezone.now() + timezone.timedelta(days=2),
+            message_text="Test Message",
+        )
+
+        distribution.start_datetime += timezone.timedelta(hours=1)
+        distribution.save()
+
+        schedule = DistributionSchedule.objects.get(distribution=distribution)
+        self.assertEqual(schedule.run_at, distribution.start_datetime)
 
     @patch("api.tasks.start_distribution_task.apply_async")
-    def test_handle_invalid_distribution_creation(self, start_distribution_task_mock):
-        distribution_data = {
-            "start_datetime": timezone.now(),
-            "end_datetime": timezone.now() - timezone.timedelta(days=1),
-            "message_text": "Test Message",
-        }
+    def test_handle_update_keeps_retried_start(self, start_distribution_task_mock):
+        distribution = Distribution.objects.create(
+            start_datetime=timezone.now(),
+            end_datetime=timezone.now() + timezone.timedelta(days=1),
+            message_text="Test Message",
+        )
+        # scheduled by start_distribution_task after its last retry failed
+        retry_at = timezone.now() + timezone.timedelta(hours=1)
+        retry = DistributionSchedule.objects.create(
+            distribution=distribution, run_at=retry_at
+        )
 
-        with self.assertLogs(logger, level="INFO") as log_output:
-            distribution = Distribution.objects.create(**distribution_data)
+        distribution = Distribution.objects.get(id=distribution.id)
+        distribution.start_datetime -= timezone.timedelta(minutes=1)
+        distribution.message_text = "Edited Message"
+        distribution.save()
 
-            time.sleep(1)
+        retry.refresh_from_db()
+        self.assertEqual(retry.run_at, retry_at)
+
+    def test_schedule_start_once(self):
+        distribution = Distribution.objects.create(
+            start_datetime=timezone.now() + timezone.timedelta(days=1),
+            end_datetime=timezone.now() + timezone.timedelta(days=2),
+            message_text="Test Message",
+        )
+
+        DistributionSchedule.objects.bulk_create(
+            [DistributionSchedule(distribution=distribution, run_at=timezone.now())],
+            ignore_conflicts=True,
+        )
+
+        self.assertEqual(
+            DistributionSchedule.objects.filter(distribution=distribution).count(), 1
+        )
+
+    @patch("api.tasks.start_distribution_task.apply_async")
+    def test_handle_invalid_distribution_creation(self, start_distribution_task_mock):
+        distribution_data = {
+            "start_datetime": timezone.now(),
+            "end_datetime": timezone.now() - timezone.timedelta(days=1),
+            "message_text": "Test Message",
+        }
+
+        with self.assertLogs(logger, level="INFO") as log_output:
+            distribution = Distribution.objects.create(**distribution_data)
+
+            time.sleep(1)
 
             self.assertIn(
                 f"INFO:{logger.name}:Distribution #{distribution.id}: Will not be started!",
@@ -632,6 +1478,8 @@ class DistributionSignalHandlerTestCase(TestCase):
 # Services
 
 
+@patch("api.services.DELIVERY_WINDOW_START_HOUR", 0)
+@patch("api.services.DELIVERY_WINDOW_END_HOUR", 24)
 class StartDistributionTestCase(TestCase):
     def setUp(self):
         self.distribution = Distribution.objects.create(
@@ -640,44 +1488,288 @@ class StartDistributionTestCase(TestCase):
             message_text="Test Message",
         )
 
-    @patch("api.tasks.send_message_task.apply_async")
-    @patch("api.models.Distribution.get_or_create_messages_for_sending")
+    @patch("api.services.MESSAGE_BATCH_SIZE", 2)
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    @patch("api.models.Distribution.iter_pending_message_ids")
+    @patch("api.models.Distribution.materialize_messages")
     def test_start_distribution_with_messages(
-        self, get_or_create_mock, send_message_task_mock
+        self, materialize_mock, iter_pending_mock, send_message_batch_task_mock
     ):
-        messages = [Message(id=1), Message(id=2)]
-        get_or_create_mock.return_value = (messages, True)
+        materialize_mock.return_value = {"created": 4, "existing": 0}
+        iter_pending_mock.return_value = iter([[1, 2, 3], [4]])
+        self.distribution.priority = 0
+        self.distribution.save()
 
         start_distribution(self.distribution.id)
 
-        get_or_create_mock.assert_called_once_with()
-        send_message_task_mock.assert_has_calls(
-            [call(args=[1], countdown=0), call(args=[2], countdown=0)]
+        materialize_mock.assert_called_once_with(DISTRIBUTION_CHUNK_SIZE)
+        iter_pending_mock.assert_called_once_with(DISTRIBUTION_CHUNK_SIZE, None)
+        send_message_batch_task_mock.assert_has_calls(
+            [
+                call(args=[[1, 2], self.distribution.id], countdown=0, priority=0),
+                call(args=[[3], self.distribution.id], countdown=0, priority=0),
+                call(args=[[4], self.distribution.id], countdown=0, priority=0),
+            ]
         )
 
-    @patch("api.tasks.send_message_task.apply_async")
-    @patch("api.models.Distribution.get_or_create_messages_for_sending")
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    @patch("api.models.Distribution.iter_pending_message_ids")
+    @patch("api.models.Distribution.materialize_messages")
     def test_start_distribution_no_messages(
-        self, get_or_create_mock, send_message_task_mock
+        self, materialize_mock, iter_pending_mock, send_message_batch_task_mock
     ):
-        get_or_create_mock.return_value = ([], False)
+        materialize_mock.return_value = {"created": 0, "existing": 0}
+        iter_pending_mock.return_value = iter([])
 
         start_distribution(self.distribution.id)
 
-        get_or_create_mock.assert_called_once_with()
-        send_message_task_mock.assert_not_called()
+        iter_pending_mock.assert_called_once_with(DISTRIBUTION_CHUNK_SIZE, None)
+        send_message_batch_task_mock.assert_not_called()
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_restart_half_sent_distribution(self, send_message_batch_task_mock):
+        for i in range(4):
+            Client.objects.create(phone_number=f"7900000000{i}")
+        self.distribution.materialize_messages(chunk_size=10)
+        message_ids = list(
+            Message.objects.filter(distribution=self.distribution)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        Message.objects.mark_sent(self.distribution.id, message_ids[:2])
 
-    @patch("api.tasks.send_message_task.apply_async")
-    def test_start_distribution_nonexistent_distribution(self, send_message_task_mock):
+        start_distribution(self.distribution.id)
+
+        send_message_batch_task_mock.assert_called_once_with(
+            args=[message_ids[2:], self.distribution.id],
+            countdown=0,
+            priority=self.distribution.priority,
+        )
+        self.assertEqual(
+            Message.objects.filter(distribution=self.distribution).count(), 4
+        )
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_start_paused_distribution(self, send_message_batch_task_mock):
+        Client.objects.create(phone_number="79000000001")
+        Distribution.objects.filter(id=self.distribution.id).update(
+            state=Distribution.State.PAUSED
+        )
+
+        start_distribution(self.distribution.id)
+
+        self.assertEqual(
+            Message.objects.filter(distribution=self.distribution).count(), 1
+        )
+        send_message_batch_task_mock.assert_not_called()
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_start_cancelled_distribution(self, send_message_batch_task_mock):
+        Client.objects.create(phone_number="79000000001")
+        Distribution.objects.filter(id=self.distribution.id).update(
+            state=Distribution.State.CANCELLED
+        )
+
+        start_distribution(self.distribution.id)
+
+        self.assertFalse(Message.objects.exists())
+        send_message_batch_task_mock.assert_not_called()
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_resume_distribution(self, send_message_batch_task_mock):
+        for i in range(3):
+            Client.objects.create(phone_number=f"7900000000{i}")
+        self.distribution.materialize_messages(chunk_size=10)
+        message_ids = list(
+            Message.objects.filter(distribution=self.distribution)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        Message.objects.mark_sent(self.distribution.id, message_ids[:1])
+
+        resume_distribution(self.distribution.id)
+
+        send_message_batch_task_mock.assert_called_once_with(
+            args=[message_ids[1:], self.distribution.id],
+            countdown=0,
+            priority=self.distribution.priority,
+        )
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_resume_distribution_leaves_failures_to_retries(
+        self, send_message_batch_task_mock
+    ):
+        for i in range(3):
+            Client.objects.create(phone_number=f"7900000000{i}")
+        self.distribution.materialize_messages(chunk_size=10)
+        messages = list(
+            Message.objects.filter(distribution=self.distribution).order_by("id")
+        )
+        for message, next_attempt_in in ((messages[0], -1), (messages[1], 1)):
+            FailedDelivery.objects.create(
+                message=message,
+                attempts=1,
+                error="MailingServiceUnavailable",
+                next_attempt_at=timezone.now()
+                + timezone.timedelta(minutes=next_attempt_in),
+            )
+
+        resume_distribution(self.distribution.id)
+
+        # the due failure is sent, the one waiting for its next attempt is not
+        send_message_batch_task_mock.assert_called_once_with(
+            args=[[messages[0].id, messages[2].id], self.distribution.id],
+            countdown=0,
+            priority=self.distribution.priority,
+        )
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_start_distribution_nonexistent_distribution(
+        self, send_message_batch_task_mock
+    ):
         start_distribution(999)
 
         self.assertRaises(Distribution.DoesNotExist)
         self.assertLogs(logger, level="ERROR")
-        send_message_task_mock.assert_not_called()
+        send_message_batch_task_mock.assert_not_called()
 
 
-class SendMessageTestCase(TestCase):
+@patch("api.services.DELIVERY_WINDOW_START_HOUR", 9)
+@patch("api.services.DELIVERY_WINDOW_END_HOUR", 21)
+class StartDistributionByTimezoneTestCase(TestCase):
+    current_time = timezone.datetime(2024, 1, 1, 10, tzinfo=dt_timezone.utc)
+
     def setUp(self):
+        self.distribution = Distribution.objects.create(
+            start_datetime=self.current_time,
+            end_datetime=self.current_time + timezone.timedelta(days=1),
+            message_text="Test Message",
+        )
+        # local time: 10:00, 22:00 and 00:00
+        for i, client_timezone in enumerate((0, 12, -10)):
+            Client.objects.create(
+                phone_number=f"7900000000{i}", timezone=client_timezone
+            )
+
+    def get_message_ids(self, client_timezone):
+        return list(
+            Message.objects.filter(client__timezone=client_timezone).values_list(
+                "id", flat=True
+            )
+        )
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_timezones_are_scheduled(self, send_message_batch_task_mock):
+        with patch("django.utils.timezone.now", return_value=self.current_time):
+            start_distribution(self.distribution.id)
+
+        send_message_batch_task_mock.assert_called_once_with(
+            args=[self.get_message_ids(0), self.distribution.id],
+            countdown=0,
+            priority=5,
+        )
+        schedules = DistributionSchedule.objects.filter(
+            distribution=self.distribution, client_timezone__isnull=False
+        ).order_by("client_timezone")
+        self.assertEqual(
+            [(schedule.client_timezone, schedule.run_at) for schedule in schedules],
+            [
+                (-10, timezone.datetime(2024, 1, 1, 19, tzinfo=dt_timezone.utc)),
+                (12, timezone.datetime(2024, 1, 1, 21, tzinfo=dt_timezone.utc)),
+            ],
+        )
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_timezones_without_delivery_window(self, send_message_batch_task_mock):
+        self.distribution.end_datetime = self.current_time + timezone.timedelta(hours=5)
+        self.distribution.save()
+
+        with patch("django.utils.timezone.now", return_value=self.current_time):
+            with self.assertLogs(logger, level="ERROR"):
+                start_distribution(self.distribution.id)
+
+        self.assertEqual(send_message_batch_task_mock.call_count, 1)
+        self.assertFalse(
+            DistributionSchedule.objects.filter(client_timezone__isnull=False).exists()
+        )
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_start_scheduled_timezone(self, send_message_batch_task_mock):
+        self.distribution.materialize_messages(chunk_size=10)
+        run_at = timezone.datetime(2024, 1, 1, 21, tzinfo=dt_timezone.utc)
+
+        with patch("django.utils.timezone.now", return_value=run_at):
+            start_distribution(self.distribution.id, client_timezone=12)
+
+        send_message_batch_task_mock.assert_called_once_with(
+            args=[self.get_message_ids(12), self.distribution.id],
+            countdown=0,
+            priority=5,
+        )
+
+
+class StartDueDistributionsTestCase(TestCase):
+    def create_distribution(self, start_datetime, **kwargs):
+        # bulk_create does not send post_save, so the distribution is not scheduled
+        (distribution,) = Distribution.objects.bulk_create(
+            [
+                Distribution(
+                    start_datetime=start_datetime,
+                    end_datetime=timezone.now() + timezone.timedelta(days=1),
+                    message_text="Test Message",
+                    **kwargs,
+                )
+            ]
+        )
+        return distribution
+
+    @patch("api.tasks.start_distribution_task.apply_async")
+    def test_start_due_distributions(self, apply_async_mock):
+        due = self.create_distribution(timezone.now(), priority=1)
+        future = self.create_distribution(timezone.now() + timezone.timedelta(days=1))
+        DistributionSchedule.objects.create(distribution=due, run_at=due.start_datetime)
+        DistributionSchedule.objects.create(
+            distribution=future, run_at=future.start_datetime
+        )
+
+        self.assertEqual(start_due_distributions(), 1)
+
+        apply_async_mock.assert_called_once_with(
+            args=[due.id, None], countdown=0, priority=1
+        )
+        # claimed once
+        self.assertEqual(start_due_distributions(), 0)
+        self.assertEqual(apply_async_mock.call_count, 1)
+
+    @patch("api.services.DISTRIBUTION_CHUNK_SIZE", 2)
+    @patch("api.tasks.start_distribution_task.apply_async")
+    def test_start_due_distributions_by_chunks(self, apply_async_mock):
+        for _ in range(5):
+            distribution = self.create_distribution(timezone.now())
+            DistributionSchedule.objects.create(
+                distribution=distribution, run_at=distribution.start_datetime
+            )
+
+        self.assertEqual(start_due_distributions(), 5)
+        self.assertEqual(apply_async_mock.call_count, 5)
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_start_ended_distribution(self, apply_async_mock):
+        distribution = self.create_distribution(timezone.now())
+        Distribution.objects.filter(id=distribution.id).update(
+            end_datetime=timezone.now() - timezone.timedelta(minutes=1)
+        )
+        Client.objects.create(phone_number="1234567890")
+
+        start_distribution(distribution.id)
+
+        apply_async_mock.assert_not_called()
+        self.assertFalse(Message.objects.exists())
+
+
+class SendMessageTestCase(RedisMockMixin, TestCase):
+    def setUp(self):
+        super().setUp()
         self.client = Client.objects.create(phone_number="1234567890")
         self.distribution = Distribution.objects.create(
             start_datetime=timezone.now(),
@@ -704,6 +1796,20 @@ class SendMessageTestCase(TestCase):
             message_id=self.message.id,
         )
 
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_failure(self, send_message_mock):
+        send_message_mock.side_effect = MailingServiceError(self.message.id, 400)
+
+        send_message(self.message.id)
+
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, Message.MessageStatus.NOT_SENT)
+        failed_delivery = FailedDelivery.objects.get(message=self.message)
+        self.assertEqual(failed_delivery.attempts, 1)
+        self.assertEqual(failed_delivery.error, "MailingServiceError")
+        self.assertEqual(failed_delivery.status_code, 400)
+        self.assertGreater(failed_delivery.next_attempt_at, timezone.now())
+
     @patch("api.services.mailing_service.send_message")
     def test_send_message_does_not_exist(self, send_message_mock):
         send_message_mock.return_value = True
@@ -722,7 +1828,7 @@ class SendMessageTestCase(TestCase):
 
         send_message_mock.assert_not_called()
         self.message.refresh_from_db()
-        self.assertEqual(self.message.status, Message.MessageStatus.NOT_SENT)
+        self.assertEqual(self.message.status, Message.MessageStatus.FAILED)
 
     @patch("api.services.mailing_service.send_message")
     def test_send_message_already_sent(self, send_message_mock):
@@ -737,9 +1843,682 @@ class SendMessageTestCase(TestCase):
         self.assertEqual(self.message.status, Message.MessageStatus.SENT)
 
 
+class SendMessageBatchTestCase(RedisMockMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.distribution = Distribution.objects.create(
+            start_datetime=timezone.now(),
+            end_datetime=timezone.now() + timezone.timedelta(days=1),
+            message_text="Test Message",
+        )
+        self.messages = [
+            Message.objects.create(
+                distribution=self.distribution,
+                client=Client.objects.create(phone_number=f"123456789{i}"),
+            )
+            for i in range(3)
+        ]
+        self.message_ids = [message.id for message in self.messages]
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_success(self, send_message_mock):
+        # send context, claim, savepoint, status update, counter update,
+        # release savepoint
+        with self.assertNumQueries(6):
+            send_message_batch(self.message_ids)
+
+        self.assertEqual(send_message_mock.call_count, 3)
+        self.assertFalse(
+            Message.objects.exclude(status=Message.MessageStatus.SENT).exists()
+        )
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_context_is_cached(self, send_message_mock):
+        send_message_batch(self.message_ids[:1], self.distribution.id)
+
+        # claim, savepoint, status update, counter update, release savepoint
+        with self.assertNumQueries(5):
+            send_message_batch(self.message_ids[1:], self.distribution.id)
+
+        self.assertEqual(send_message_mock.call_count, 3)
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_of_ended_distribution(self, send_message_mock):
+        self.distribution.end_datetime = timezone.now() - timezone.timedelta(days=1)
+        self.distribution.save()
+
+        # the send context and one update of the not sent messages
+        with self.assertNumQueries(2):
+            send_message_batch(self.message_ids[:1], self.distribution.id)
+
+        # the worker has marked the messages already
+        with self.assertNumQueries(0):
+            send_message_batch(self.message_ids[1:], self.distribution.id)
+
+        send_message_mock.assert_not_called()
+        self.assertFalse(
+            Message.objects.exclude(status=Message.MessageStatus.FAILED).exists()
+        )
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_of_paused_distribution(self, send_message_mock):
+        self.redis_mock.get.return_value = b"PAUSED"
+
+        # the send context, loaded again as it disagrees with the state flag,
+        # the messages are not queried
+        with self.assertNumQueries(2):
+            send_message_batch(self.message_ids, self.distribution.id)
+
+        self.redis_mock.get.assert_called_once_with(
+            f"distribution:{self.distribution.id}:state"
+        )
+        send_message_mock.assert_not_called()
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_without_state_flag(self, send_message_mock):
+        self.redis_mock.get.side_effect = RedisError()
+        Distribution.objects.filter(id=self.distribution.id).update(
+            state=Distribution.State.CANCELLED
+        )
+
+        with self.assertLogs(logger, level="WARNING"):
+            send_message_batch(self.message_ids, self.distribution.id)
+
+        send_message_mock.assert_not_called()
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_after_resume(self, send_message_mock):
+        Distribution.objects.filter(id=self.distribution.id).update(
+            state=Distribution.State.PAUSED
+        )
+        self.redis_mock.get.return_value = b"PAUSED"
+        send_message_batch(self.message_ids[:1], self.distribution.id)
+
+        # resumed by the API process, the worker still has the paused context
+        Distribution.objects.filter(id=self.distribution.id).update(
+            state=Distribution.State.ACTIVE
+        )
+        self.redis_mock.get.return_value = b"ACTIVE"
+        send_message_batch(self.message_ids[:1], self.distribution.id)
+        send_message_batch(self.message_ids[1:])
+
+        self.assertEqual(send_message_mock.call_count, 3)
+        self.assertFalse(
+            Message.objects.exclude(status=Message.MessageStatus.SENT).exists()
+        )
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_after_resume_without_state_flag(self, send_message_mock):
+        Distribution.objects.filter(id=self.distribution.id).update(
+            state=Distribution.State.PAUSED
+        )
+        send_message_batch(self.message_ids, self.distribution.id)
+        send_message_mock.assert_not_called()
+
+        Distribution.objects.filter(id=self.distribution.id).update(
+            state=Distribution.State.ACTIVE
+        )
+        send_message_batch(self.message_ids, self.distribution.id)
+
+        self.assertEqual(send_message_mock.call_count, 3)
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_partial_failure(self, send_message_mock):
+        failed_message = self.messages[1]
+
+        def send_message_side_effect(message_id, **kwargs):
+            if message_id == failed_message.id:
+                raise ConnectionError()
+
+        send_message_mock.side_effect = send_message_side_effect
+
+        send_message_batch(self.message_ids)
+
+        failed_message.refresh_from_db()
+        self.assertEqual(failed_message.status, Message.MessageStatus.NOT_SENT)
+        self.assertEqual(
+            Message.objects.filter(status=Message.MessageStatus.SENT).count(), 2
+        )
+        failed_delivery = FailedDelivery.objects.get()
+        self.assertEqual(failed_delivery.message_id, failed_message.id)
+        self.assertEqual(failed_delivery.attempts, 1)
+        self.assertEqual(failed_delivery.error, "ConnectionError")
+        self.assertIsNone(failed_delivery.status_code)
+        self.assertIsNotNone(failed_delivery.next_attempt_at)
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_counts_attempts(self, send_message_mock):
+        send_message_mock.side_effect = ConnectionError()
+
+        send_message_batch(self.message_ids[:1])
+        send_message_batch(self.message_ids[:1])
+
+        failed_delivery = FailedDelivery.objects.get()
+        self.assertEqual(failed_delivery.attempts, 2)
+
+    @patch("api.managers.MESSAGE_MAX_ATTEMPTS", 2)
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_abandons_after_max_attempts(self, send_message_mock):
+        send_message_mock.side_effect = ConnectionError()
+
+        send_message_batch(self.message_ids[:1])
+        send_message_batch(self.message_ids[:1])
+
+        failed_delivery = FailedDelivery.objects.get()
+        self.assertEqual(failed_delivery.attempts, 2)
+        self.assertIsNone(failed_delivery.next_attempt_at)
+        self.assertEqual(
+            Message.objects.get(id=self.message_ids[0]).status,
+            Message.MessageStatus.FAILED,
+        )
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_clears_failed_deliveries(self, send_message_mock):
+        FailedDelivery.objects.create(
+            message=self.messages[0], attempts=1, error="ConnectionError"
+        )
+
+        send_message_batch(self.message_ids)
+
+        self.assertFalse(FailedDelivery.objects.exists())
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_skips_sent_messages(self, send_message_mock):
+        Message.objects.filter(id=self.message_ids[0]).update(
+            status=Message.MessageStatus.SENT
+        )
+
+        send_message_batch(self.message_ids)
+
+        self.assertEqual(send_message_mock.call_count, 2)
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_skips_claimed_messages(self, send_message_mock):
+        # claimed by another worker, e.g. a duplicate delivery of the task
+        Message.objects.claim(self.message_ids[:1])
+
+        send_message_batch(self.message_ids)
+
+        self.assertEqual(send_message_mock.call_count, 2)
+        self.assertEqual(
+            Message.objects.get(id=self.message_ids[0]).status,
+            Message.MessageStatus.SENDING,
+        )
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_reclaims_expired_claims(self, send_message_mock):
+        Message.objects.claim(self.message_ids[:1])
+        Message.objects.filter(id=self.message_ids[0]).update(
+            claimed_until=timezone.now() - timezone.timedelta(minutes=1)
+        )
+
+        send_message_batch(self.message_ids)
+
+        self.assertEqual(send_message_mock.call_count, 3)
+        self.assertFalse(
+            Message.objects.exclude(status=Message.MessageStatus.SENT).exists()
+        )
+
+    @patch("api.services.send_outgoing_messages")
+    def test_send_message_batch_releases_messages_on_error(self, send_messages_mock):
+        send_messages_mock.side_effect = RedisError()
+
+        with self.assertRaises(RedisError):
+            send_message_batch(self.message_ids)
+
+        self.assertFalse(
+            Message.objects.exclude(status=Message.MessageStatus.NOT_SENT).exists()
+        )
+        self.assertFalse(FailedDelivery.objects.exists())
+
+    def test_expired_claim_does_not_release_new_claim(self):
+        expired_claim = timezone.now() - timezone.timedelta(minutes=1)
+        Message.objects.filter(id=self.message_ids[0]).update(
+            status=Message.MessageStatus.SENDING, claimed_until=expired_claim
+        )
+        new_claim, _ = Message.objects.claim(self.message_ids[:1])
+
+        released_messages = Message.objects.release(
+            self.message_ids[:1], Message.MessageStatus.NOT_SENT, expired_claim
+        )
+
+        self.assertEqual(released_messages, 0)
+        message = Message.objects.get(id=self.message_ids[0])
+        self.assertEqual(message.status, Message.MessageStatus.SENDING)
+        self.assertEqual(message.claimed_until, new_claim)
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_releases_failed_messages(self, send_message_mock):
+        send_message_mock.side_effect = ConnectionError()
+
+        send_message_batch(self.message_ids)
+
+        self.assertFalse(
+            Message.objects.exclude(status=Message.MessageStatus.NOT_SENT).exists()
+        )
+        self.assertFalse(Message.objects.filter(claimed_until__isnull=False).exists())
+
+    @patch("api.services.mailing_service.send_messages")
+    def test_send_message_batch_with_mailing_backend(self, send_messages_mock):
+        send_messages_mock.return_value = {
+            self.message_ids[0]: None,
+            self.message_ids[1]: None,
+            self.message_ids[2]: ConnectionError(),
+        }
+
+        send_message_batch(self.message_ids)
+
+        sent_messages = Message.objects.filter(status=Message.MessageStatus.SENT)
+        self.assertEqual(
+            sorted(sent_messages.values_list("id", flat=True)), self.message_ids[:2]
+        )
+        outgoing_messages = send_messages_mock.call_args.args[0]
+        self.assertEqual(
+            sorted(message.message_id for message in outgoing_messages),
+            self.message_ids,
+        )
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_parks_while_circuit_is_open(self, send_message_mock):
+        FailedDelivery.objects.create(
+            message=self.messages[0],
+            attempts=2,
+            error="MailingServiceOverloaded",
+            status_code=503,
+        )
+
+        with patch("api.services.circuit_breaker") as circuit_breaker_mock:
+            circuit_breaker_mock.get_retry_after.return_value = 30
+            send_message_batch(self.message_ids)
+
+        send_message_mock.assert_not_called()
+        self.assertFalse(
+            Message.objects.exclude(status=Message.MessageStatus.NOT_SENT).exists()
+        )
+        failed_deliveries = FailedDelivery.objects.order_by("message_id")
+        # parked messages do not use up their attempts
+        self.assertEqual(
+            [failed_delivery.attempts for failed_delivery in failed_deliveries],
+            [2, 0, 0],
+        )
+        # the last error of a failed message is kept
+        self.assertEqual(
+            [
+                (failed_delivery.error, failed_delivery.status_code)
+                for failed_delivery in failed_deliveries
+            ],
+            [
+                ("MailingServiceOverloaded", 503),
+                ("MailingServiceUnavailable", None),
+                ("MailingServiceUnavailable", None),
+            ],
+        )
+        for failed_delivery in failed_deliveries:
+            self.assertGreater(
+                failed_delivery.next_attempt_at,
+                timezone.now() + timezone.timedelta(seconds=29),
+            )
+
+    @patch("api.services.mailing_service.batch_size", 100)
+    @patch("api.services.mailing_service.send_message_batch")
+    def test_send_message_batch_by_batch_requests(self, send_batch_mock):
+        send_batch_mock.return_value = dict.fromkeys(self.message_ids)
+
+        send_message_batch(self.message_ids)
+
+        send_batch_mock.assert_called_once()
+        self.assertFalse(
+            Message.objects.exclude(status=Message.MessageStatus.SENT).exists()
+        )
+
+    @patch("api.services.mailing_service.send_messages")
+    def test_send_message_batch_overloaded(self, send_messages_mock):
+        send_messages_mock.return_value = {
+            self.message_ids[0]: MailingServiceOverloaded(
+                self.message_ids[0], 429, retry_after=600
+            ),
+            self.message_ids[1]: ConnectionError(),
+            self.message_ids[2]: None,
+        }
+
+        send_message_batch(self.message_ids)
+
+        failed_delivery = FailedDelivery.objects.get(message_id=self.message_ids[0])
+        self.assertEqual(failed_delivery.error, "MailingServiceOverloaded")
+        self.assertEqual(failed_delivery.status_code, 429)
+        # not sooner than the service asked for
+        self.assertGreaterEqual(
+            failed_delivery.next_attempt_at,
+            failed_delivery.last_attempt_at + timezone.timedelta(seconds=600),
+        )
+
+    @patch("api.services.mailing_service.send_message")
+    def test_send_message_batch_distribution_ended(self, send_message_mock):
+        self.distribution.end_datetime = timezone.now() - timezone.timedelta(days=1)
+        self.distribution.save()
+
+        send_message_batch(self.message_ids)
+
+        send_message_mock.assert_not_called()
+        self.assertFalse(
+            Message.objects.exclude(status=Message.MessageStatus.FAILED).exists()
+        )
+
+
+class RetryFailedDeliveriesTestCase(TestCase):
+    def setUp(self):
+        self.distribution = Distribution.objects.create(
+            start_datetime=timezone.now(),
+            end_datetime=timezone.now() + timezone.timedelta(days=1),
+            message_text="Test Message",
+            priority=2,
+        )
+        self.messages = [
+            Message.objects.create(
+                distribution=self.distribution,
+                client=Client.objects.create(phone_number=f"123456789{i}"),
+            )
+            for i in range(3)
+        ]
+
+    def create_failed_delivery(self, message, next_attempt_at):
+        return FailedDelivery.objects.create(
+            message=message,
+            attempts=1,
+            error="ConnectionError",
+            next_attempt_at=next_attempt_at,
+        )
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_retry_due_failed_deliveries(self, apply_async_mock):
+        due = self.create_failed_delivery(
+            self.messages[0], timezone.now() - timezone.timedelta(minutes=1)
+        )
+        self.create_failed_delivery(
+            self.messages[1], timezone.now() + timezone.timedelta(minutes=1)
+        )
+        self.create_failed_delivery(self.messages[2], None)
+
+        retried_messages = retry_failed_deliveries()
+
+        self.assertEqual(retried_messages, 1)
+        apply_async_mock.assert_called_once_with(
+            args=[[due.message_id], self.distribution.id], priority=2
+        )
+        due.refresh_from_db()
+        # leased, so the next sweep does not enqueue it again
+        self.assertGreater(due.next_attempt_at, timezone.now())
+        self.assertEqual(retry_failed_deliveries(), 0)
+
+    @patch("api.services.MESSAGE_BATCH_SIZE", 2)
+    @patch("api.services.MESSAGE_RETRY_SWEEP_LIMIT", 2)
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_retry_limit(self, apply_async_mock):
+        for message in self.messages:
+            self.create_failed_delivery(
+                message, timezone.now() - timezone.timedelta(minutes=1)
+            )
+
+        self.assertEqual(retry_failed_deliveries(), 2)
+        self.assertEqual(retry_failed_deliveries(), 1)
+        self.assertEqual(apply_async_mock.call_count, 2)
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_distribution_ended(self, apply_async_mock):
+        failed_delivery = self.create_failed_delivery(
+            self.messages[0], timezone.now() - timezone.timedelta(minutes=1)
+        )
+        self.distribution.end_datetime = timezone.now() - timezone.timedelta(days=1)
+        self.distribution.save()
+
+        self.assertEqual(retry_failed_deliveries(), 0)
+
+        apply_async_mock.assert_not_called()
+        failed_delivery.refresh_from_db()
+        self.assertIsNone(failed_delivery.next_attempt_at)
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_expired_claims(self, apply_async_mock):
+        Message.objects.claim([self.messages[0].id])
+        Message.objects.filter(id=self.messages[0].id).update(
+            claimed_until=timezone.now() - timezone.timedelta(minutes=1)
+        )
+        Message.objects.claim([self.messages[1].id])
+
+        with CaptureQueriesContext(connection) as queries:
+            retry_failed_deliveries()
+
+        # locked, so a worker cannot claim them again while they are released
+        self.assertIn("FOR UPDATE SKIP LOCKED", queries[1]["sql"])
+        failed_delivery = FailedDelivery.objects.get()
+        self.assertEqual(failed_delivery.message_id, self.messages[0].id)
+        self.assertEqual(failed_delivery.error, "ClaimExpired")
+        self.assertEqual(
+            Message.objects.get(id=self.messages[0].id).status,
+            Message.MessageStatus.NOT_SENT,
+        )
+        self.assertEqual(
+            Message.objects.get(id=self.messages[1].id).status,
+            Message.MessageStatus.SENDING,
+        )
+
+    @patch("api.tasks.send_message_batch_task.apply_async")
+    def test_sent_messages_are_not_retried(self, apply_async_mock):
+        self.create_failed_delivery(
+            self.messages[0], timezone.now() - timezone.timedelta(minutes=1)
+        )
+        Message.objects.filter(id=self.messages[0].id).update(
+            status=Message.MessageStatus.SENT
+        )
+
+        self.assertEqual(retry_failed_deliveries(), 0)
+
+        apply_async_mock.assert_not_called()
+        self.assertFalse(FailedDelivery.objects.exists())
+
+
+class ImportClientsTestCase(TestCase):
+    def test_import_by_chunks(self):
+        body = (
+            "phone_number,tag\n"
+            "79000000001,first\n"
+            "79000000002,first\n"
+            "79000000001,second\n"
+            "79000000001,third\n"
+            "79000000003,first\n"
+        ).encode()
+
+        result = import_clients(BytesIO(body), "csv", chunk_size=2)
+
+        self.assertEqual(result, {"rows": 5, "created": 3, "updated": 1, "errors": []})
+        self.assertEqual(Client.objects.get(phone_number="79000000001").tag, "third")
+
+    def test_last_duplicate_in_chunk_wins(self):
+        body = b"phone_number,tag\n79000000001,first\n79000000001,second\n"
+
+        result = import_clients(BytesIO(body), "csv")
+
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(Client.objects.get(phone_number="79000000001").tag, "second")
+
+    def test_unchanged_clients_are_not_updated(self):
+        body = b"phone_number,tag\n79000000001,test_tag\n"
+        import_clients(BytesIO(body), "csv")
+
+        result = import_clients(BytesIO(body), "csv")
+
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(result["updated"], 0)
+
+    def test_import_does_not_send_signals(self):
+        body = b'{"phone_number": "79000000001"}\n'
+
+        with patch("api.logs.logger.info") as logger_mock:
+            import_clients(BytesIO(body), "ndjson")
+
+        logger_mock.assert_called_once()
+
+    def test_import_command(self):
+        with NamedTemporaryFile("w", suffix=".csv") as file:
+            file.write("phone_number,timezone\n79000000001,3\n79000000002,x\n")
+            file.flush()
+
+            stdout, stderr = StringIO(), StringIO()
+            call_command("import_clients", file.name, stdout=stdout, stderr=stderr)
+
+        self.assertIn("Rows: 2, created: 1, updated: 0, rejected: 1.", stdout.getvalue())
+        self.assertIn("Line 3:", stderr.getvalue())
+
+
+class BenchmarkDistributionTestCase(RedisMockMixin, TestCase):
+    def test_benchmark_eagerly(self):
+        stdout = StringIO()
+
+        call_command("benchmark_distribution", "--clients", "30", stdout=stdout)
+
+        self.assertIn("Sending: 30 of 30 messages sent", stdout.getvalue())
+        self.assertIn("Delivery latency since start: p50", stdout.getvalue())
+        # the seeded rows are deleted
+        self.assertFalse(Client.objects.exists())
+        self.assertFalse(Distribution.objects.exists())
+        self.assertFalse(celery_app.conf.task_always_eager)
+
+    def test_benchmark_single_client(self):
+        stdout = StringIO()
+
+        call_command("benchmark_distribution", "--clients", "1", stdout=stdout)
+
+        self.assertIn("Sending: 1 of 1 messages sent", stdout.getvalue())
+        self.assertNotIn("Delivery latency", stdout.getvalue())
+
+
+# Tasks
+
+
+class StartDistributionTaskTestCase(TestCase):
+    def setUp(self):
+        # bulk_create does not send post_save, so nothing is scheduled
+        (self.distribution,) = Distribution.objects.bulk_create(
+            [
+                Distribution(
+                    start_datetime=timezone.now(),
+                    end_datetime=timezone.now() + timezone.timedelta(days=1),
+                    message_text="Test Message",
+                )
+            ]
+        )
+
+    @patch("api.tasks.start_distribution")
+    def test_shifts_start_after_last_retry(self, start_distribution_mock):
+        start_distribution_mock.side_effect = Exception()
+
+        with self.assertLogs(logger, level="ERROR"):
+            result = start_distribution_task.apply(
+                args=(self.distribution.id, 3), retries=3
+            )
+
+        self.assertTrue(result.successful())
+        start_distribution_mock.assert_called_once_with(self.distribution.id, 3)
+        schedule = DistributionSchedule.objects.get(distribution=self.distribution)
+        self.assertEqual(schedule.client_timezone, 3)
+        self.assertAlmostEqual(
+            schedule.run_at,
+            timezone.now() + timezone.timedelta(hours=1),
+            delta=timezone.timedelta(minutes=1),
+        )
+
+    @patch("api.tasks.start_distribution")
+    def test_retries_before_shifting_start(self, start_distribution_mock):
+        start_distribution_mock.side_effect = Exception()
+
+        # eager retries run at once
+        with self.assertLogs(logger, level="ERROR"):
+            start_distribution_task.apply(args=(self.distribution.id,))
+
+        self.assertEqual(start_distribution_mock.call_count, 4)
+        self.assertEqual(
+            DistributionSchedule.objects.filter(distribution=self.distribution).count(),
+            1,
+        )
+
+
+class TaskRoutingTestCase(TestCase):
+    def test_task_queues(self):
+        queues = {
+            "api.tasks.start_distribution_task": "distributions",
+            "api.tasks.start_due_distributions_task": "distributions",
+            "api.tasks.resume_distribution_task": "distributions",
+            "api.tasks.send_message_task": "messages",
+            "api.tasks.send_message_batch_task": "messages",
+            "api.tasks.retry_failed_deliveries_task": "distributions",
+            "api.tasks.send_daily_report_to_admins_task": "reports",
+        }
+
+        for task_name, queue in queues.items():
+            route = celery_app.amqp.router.route({}, task_name)
+            self.assertEqual(route["queue"].name, queue)
+
+
 # Utils
 
 
+class SplitIntoBatchesTestCase(TestCase):
+    def test_split_into_batches(self):
+        batches = list(split_into_batches([1, 2, 3, 4, 5], 2))
+        self.assertEqual(batches, [[1, 2], [3, 4], [5]])
+
+    def test_split_empty_list(self):
+        self.assertEqual(list(split_into_batches([], 2)), [])
+
+    def test_split_generator(self):
+        batches = list(split_into_batches(iter(range(5)), 2))
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+
+
+class GetRetryDelayTestCase(TestCase):
+    def test_exponential_backoff(self):
+        for attempt, max_delay in ((1, 60), (2, 120), (3, 240), (10, 3600)):
+            delay = get_retry_delay(attempt, 60, 3600)
+            self.assertGreaterEqual(delay, max_delay / 2)
+            self.assertLessEqual(delay, max_delay)
+
+    def test_retry_after(self):
+        self.assertEqual(get_retry_delay(1, 60, 3600, retry_after=900), 900)
+
+
+class GetDeliveryTimeTestCase(TestCase):
+    start = timezone.datetime(2024, 1, 1, 10, tzinfo=dt_timezone.utc)
+    end = timezone.datetime(2024, 1, 2, 10, tzinfo=dt_timezone.utc)
+
+    def test_window_is_open(self):
+        self.assertEqual(get_delivery_time(self.start, self.end, 3, 9, 21), self.start)
+
+    def test_window_opens_later(self):
+        self.assertEqual(
+            get_delivery_time(self.start, self.end, -5, 9, 21),
+            timezone.datetime(2024, 1, 1, 14, tzinfo=dt_timezone.utc),
+        )
+
+    def test_window_opens_next_day(self):
+        self.assertEqual(
+            get_delivery_time(self.start, self.end, 14, 9, 21),
+            timezone.datetime(2024, 1, 1, 19, tzinfo=dt_timezone.utc),
+        )
+
+    def test_window_does_not_open(self):
+        end = self.start + timezone.timedelta(hours=1)
+        self.assertIsNone(get_delivery_time(self.start, end, -5, 9, 21))
+
+    def test_round_the_clock(self):
+        self.assertEqual(get_delivery_time(self.start, self.end, 7, 0, 24), self.start)
+
+    def test_invalid_window(self):
+        for start_hour, end_hour in ((22, 6), (9, 9), (-1, 21), (9, 25), (24, 24)):
+            with self.subTest(start_hour=start_hour, end_hour=end_hour):
+                with self.assertRaises(ValueError):
+                    get_delivery_time(self.start, self.end, 3, start_hour, end_hour)
+
+
 class GenerateStatsMessageTestCase(TestCase):
     def test_empty_stats(self):
         stats = []
@@ -1,3 +1,104 @@
+import random
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+
+def split_into_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    """
+    Split items into consecutive batches of the given size.
+    The items are consumed lazily, so they can be a generator of any length.
+
+    Args:
+        items (Iterable): The items to split.
+        batch_size (int): The maximum number of items in a batch.
+
+    Yields:
+        List: The next batch of items.
+    """
+
+    items = iter(items)
+    while batch := list(islice(items, batch_size)):
+        yield batch
+
+
+def get_retry_delay(
+    attempt: int,
+    base_delay: float,
+    max_delay: float,
+    retry_after: Optional[float] = None,
+) -> float:
+    """
+    Get the delay before the next attempt with an exponential backoff:
+    the base delay is doubled with every attempt up to the maximum delay,
+    and a random jitter spreads the attempts of failed messages over time.
+
+    Args:
+        attempt (int): The number of the failed attempt, starting with 1.
+        base_delay (float): The delay after the first attempt, in seconds.
+        max_delay (float): The maximum delay, in seconds.
+        retry_after (Optional[float]): The delay the service asked for, if any.
+            The result is never shorter.
+
+    Returns:
+        float: The delay in seconds.
+    """
+
+    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+    delay = random.uniform(delay / 2, delay)
+
+    return max(delay, retry_after or 0)
+
+
+def get_delivery_time(
+    start_datetime: datetime,
+    end_datetime: datetime,
+    utc_offset: int,
+    start_hour: int,
+    end_hour: int,
+) -> Optional[datetime]:
+    """
+    Get the earliest time within the given period when the local time
+    of the given timezone is between the start and the end hours.
+
+    Args:
+        start_datetime (datetime): The start of the period.
+        end_datetime (datetime): The end of the period.
+        utc_offset (int): The UTC offset of the timezone in hours.
+        start_hour (int): The local hour the delivery window opens at.
+        end_hour (int): The local hour the delivery window closes at, up to 24.
+
+    Returns:
+        Optional[datetime]: The delivery time, or None if the delivery window
+            does not open within the period.
+
+    Raises:
+        ValueError: If the window is empty, wraps around midnight
+            or is out of the 0..24 range.
+    """
+
+    if not 0 <= start_hour < end_hour <= 24:
+        raise ValueError(f"Invalid delivery window: {start_hour}..{end_hour}.")
+
+    local_timezone = dt_timezone(timedelta(hours=utc_offset))
+    local_start = start_datetime.astimezone(local_timezone)
+
+    if start_hour <= local_start.hour < end_hour:
+        return start_datetime
+
+    delivery_date = local_start.date()
+    if local_start.hour >= end_hour:
+        delivery_date += timedelta(days=1)
+
+    delivery_time = datetime.combine(
+        delivery_date, time(start_hour), tzinfo=local_timezone
+    )
+    if delivery_time > end_datetime:
+        return None
+
+    return delivery_time
+
+
 def generate_stats_message(stats: list) -> str:
     """
     Generate a distribution stats message for previous day.
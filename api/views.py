@@ -2,17 +2,26 @@ from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from api.exports import CLIENT_EXPORT_FIELDS, MESSAGE_EXPORT_FIELDS, export_response
+from api.imports import import_clients
 from api.models import Client, Distribution, Message
+from api.pagination import MessagePagination, StatsPagination
+from api.parsers import CSVClientImportParser, NDJSONClientImportParser
+from api.renderers import CSVRenderer, NDJSONRenderer
 from api.serializers import (
     ClientSerializer,
     DistributionSerializer,
     DistributionStatsSerializer,
+    MessageFlatSerializer,
     MessageSerializer,
 )
+from api.services import change_distribution_state
 
 docs_view = get_schema_view(
     openapi.Info(
@@ -28,11 +37,86 @@ class ClientViewSet(ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
 
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="import",
+        parser_classes=[CSVClientImportParser, NDJSONClientImportParser],
+    )
+    def import_clients(self, request):
+        """
+        Import clients from a CSV (text/csv, with a header row)
+        or NDJSON (application/x-ndjson) request body.
+        Existing clients are updated by phone number, invalid rows are skipped
+        and reported with their line numbers.
+        """
+
+        stream = request.data.get("stream")
+        if stream is None:
+            raise ParseError("Empty request body.")
+
+        result = import_clients(stream, request.data["format"])
+        return Response(result)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="export",
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export_clients(self, request):
+        """
+        Export all clients as NDJSON (by default) or CSV (?format=csv)
+        """
+
+        return export_response(
+            Client.objects.order_by("id"),
+            CLIENT_EXPORT_FIELDS,
+            request.accepted_renderer.format,
+            filename="clients",
+        )
+
 
 class DistributionViewSet(ModelViewSet):
     queryset = Distribution.objects.all()
     serializer_class = DistributionSerializer
 
+    def change_state(self, state: str) -> Response:
+        distribution = self.get_object()
+
+        if not change_distribution_state(distribution, state):
+            raise ValidationError(
+                {"state": f"Distribution is {distribution.state.lower()}."}
+            )
+
+        return Response(self.get_serializer(distribution).data)
+
+    @action(detail=True, methods=["POST"])
+    def pause(self, request, pk=None):
+        """
+        Pause an active distribution: queued messages are dropped by the workers
+        and stay not sent until the distribution is resumed
+        """
+
+        return self.change_state(Distribution.State.PAUSED)
+
+    @action(detail=True, methods=["POST"])
+    def resume(self, request, pk=None):
+        """
+        Resume a paused distribution: its not sent messages are enqueued again
+        """
+
+        return self.change_state(Distribution.State.ACTIVE)
+
+    @action(detail=True, methods=["POST"])
+    def cancel(self, request, pk=None):
+        """
+        Cancel an active or paused distribution: its not sent messages
+        are not sent anymore
+        """
+
+        return self.change_state(Distribution.State.CANCELLED)
+
 
 class DistributionStatsView(APIView):
     def get(self, request, pk, *args, **kwargs):
@@ -47,30 +131,62 @@ class DistributionStatsView(APIView):
         return Response(serializer.data)
 
 
-class DistributionsStatsView(APIView):
+class DistributionsStatsView(ListAPIView):
+    queryset = Distribution.objects.order_by("id")
+    serializer_class = DistributionStatsSerializer
+    pagination_class = StatsPagination
+
     def get(self, request, *args, **kwargs):
         """
         Get all distribution stats: total messages, sent messages, not sent messages
         """
 
-        distributions = Distribution.objects.all()
+        return self.list(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        distributions = self.paginate_queryset(self.get_queryset())
         stats = [distribution.get_stats() for distribution in distributions]
-        serializer = DistributionStatsSerializer(stats, many=True)
+        serializer = self.get_serializer(stats, many=True)
 
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
 
 class MessageViewSet(ReadOnlyModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
+    pagination_class = MessagePagination
+
+    @property
+    def is_flat(self) -> bool:
+        """
+        Whether the messages are requested with `?flat=true`,
+        i.e. with the IDs of their distribution and client only.
+        """
+
+        return self.request.query_params.get("flat", "").lower() in ("1", "true")
+
+    def get_serializer_class(self):
+        if self.is_flat:
+            return MessageFlatSerializer
+        return MessageSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.is_flat:
+            return queryset
+        return queryset.select_related("distribution", "client")
+
+    def list_messages(self, messages):
+        page = self.paginate_queryset(messages)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=["GET"], url_path="by-client/(?P<client_id>\\d+)")
     def get_by_client(self, request, client_id):
         """Get messages by client ID"""
 
-        messages = Message.objects.filter(client_id=client_id)
-        serializer = self.get_serializer(messages, many=True)
-        return Response(serializer.data)
+        messages = self.get_queryset().filter(client_id=client_id)
+        return self.list_messages(messages)
 
     @action(
         detail=False,
@@ -80,6 +196,25 @@ class MessageViewSet(ReadOnlyModelViewSet):
     def get_by_distribution(self, request, distribution_id):
         """Get messages by distribution ID"""
 
-        messages = Message.objects.filter(distribution_id=distribution_id)
-        serializer = self.get_serializer(messages, many=True)
-        return Response(serializer.data)
+        messages = self.get_queryset().filter(distribution_id=distribution_id)
+        return self.list_messages(messages)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="by-distribution/(?P<distribution_id>\\d+)/export",
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export_by_distribution(self, request, distribution_id):
+        """
+        Export all messages of a distribution as NDJSON (by default) or CSV (?format=csv)
+        """
+
+        distribution = get_object_or_404(Distribution, pk=distribution_id)
+
+        return export_response(
+            Message.objects.filter(distribution=distribution).order_by("id"),
+            MESSAGE_EXPORT_FIELDS,
+            request.accepted_renderer.format,
+            filename=f"distribution_{distribution.id}_messages",
+        )
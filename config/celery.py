@@ -3,7 +3,11 @@ import os
 from celery import Celery
 from celery.schedules import crontab
 
-from config.settings import REPORT_MAIL_HOUR
+from config.settings import (
+    DISTRIBUTION_SCHEDULER_INTERVAL,
+    MESSAGE_RETRY_SWEEP_INTERVAL,
+    REPORT_MAIL_HOUR,
+)
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
@@ -12,8 +16,43 @@ celery_app.config_from_object("django.conf:settings", namespace="CELERY")
 celery_app.autodiscover_tasks()
 
 celery_app.conf.beat_schedule = {
+    # a tick that is not handled before the next one is dropped
+    "start_due_distributions_task": {
+        "task": "api.tasks.start_due_distributions_task",
+        "schedule": DISTRIBUTION_SCHEDULER_INTERVAL,
+        "options": {"expires": DISTRIBUTION_SCHEDULER_INTERVAL},
+    },
     "send_daily_report_to_admins_task": {
         "task": "api.tasks.send_daily_report_to_admins_task",
         "schedule": crontab(hour=REPORT_MAIL_HOUR, minute=0),
     },
+    "retry_failed_deliveries_task": {
+        "task": "api.tasks.retry_failed_deliveries_task",
+        "schedule": MESSAGE_RETRY_SWEEP_INTERVAL,
+    },
+}
+
+# Each queue is consumed by its own worker pool (see docker-compose.yaml),
+# so sending a large distribution does not hold back starting new
+# distributions or the daily report.
+celery_app.conf.task_routes = {
+    "api.tasks.start_distribution_task": {"queue": "distributions"},
+    "api.tasks.start_due_distributions_task": {"queue": "distributions"},
+    "api.tasks.resume_distribution_task": {"queue": "distributions"},
+    "api.tasks.send_message_task": {"queue": "messages"},
+    "api.tasks.send_message_batch_task": {"queue": "messages"},
+    "api.tasks.retry_failed_deliveries_task": {"queue": "distributions"},
+    "api.tasks.send_daily_report_to_admins_task": {"queue": "reports"},
 }
+
+# Redis priorities: 0 is the highest, 9 is the lowest. Every priority gets
+# its own list, and a worker takes tasks of the higher priorities first.
+celery_app.conf.broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+}
+celery_app.conf.task_default_priority = 5
+
+# A worker reserves one task per process, so tasks of a higher priority
+# published later are not stuck behind tasks prefetched by busy workers.
+celery_app.conf.worker_prefetch_multiplier = 1
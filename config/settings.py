@@ -1,6 +1,7 @@
 from pathlib import Path
 
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -148,6 +149,45 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
 
+REDIS_URL = config("REDIS_URL", default=CELERY_BROKER_URL)
+
+
+# API
+
+API_PAGE_SIZE = config("API_PAGE_SIZE", default=100, cast=int)
+API_MAX_PAGE_SIZE = config("API_MAX_PAGE_SIZE", default=1000, cast=int)
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", default=5000, cast=int)
+
+
+# Clients
+
+CLIENT_IMPORT_CHUNK_SIZE = config("CLIENT_IMPORT_CHUNK_SIZE", default=50000, cast=int)
+
+
+# Distributions
+
+DISTRIBUTION_CHUNK_SIZE = config("DISTRIBUTION_CHUNK_SIZE", default=1000, cast=int)
+DELIVERY_WINDOW_START_HOUR = config("DELIVERY_WINDOW_START_HOUR", default=9, cast=int)
+DELIVERY_WINDOW_END_HOUR = config("DELIVERY_WINDOW_END_HOUR", default=21, cast=int)
+if not 0 <= DELIVERY_WINDOW_START_HOUR < DELIVERY_WINDOW_END_HOUR <= 24:
+    raise ImproperlyConfigured(
+        "The delivery window must satisfy "
+        "0 <= DELIVERY_WINDOW_START_HOUR < DELIVERY_WINDOW_END_HOUR <= 24."
+    )
+DISTRIBUTION_SCHEDULER_INTERVAL = config(
+    "DISTRIBUTION_SCHEDULER_INTERVAL", default=10, cast=int
+)
+MESSAGE_BATCH_SIZE = config("MESSAGE_BATCH_SIZE", default=100, cast=int)
+SEND_CONTEXT_CACHE_TTL = config("SEND_CONTEXT_CACHE_TTL", default=30, cast=int)
+MESSAGE_CLAIM_TIMEOUT = config("MESSAGE_CLAIM_TIMEOUT", default=900, cast=int)
+MESSAGE_MAX_ATTEMPTS = config("MESSAGE_MAX_ATTEMPTS", default=10, cast=int)
+MESSAGE_RETRY_DELAY = config("MESSAGE_RETRY_DELAY", default=60, cast=int)
+MESSAGE_RETRY_MAX_DELAY = config("MESSAGE_RETRY_MAX_DELAY", default=3600, cast=int)
+MESSAGE_RETRY_SWEEP_INTERVAL = config(
+    "MESSAGE_RETRY_SWEEP_INTERVAL", default=60, cast=int
+)
+MESSAGE_RETRY_SWEEP_LIMIT = config("MESSAGE_RETRY_SWEEP_LIMIT", default=10000, cast=int)
+
 
 # Stats report
 
@@ -158,6 +198,51 @@ REPORT_MAIL_HOUR = config("REPORT_MAIL_HOUR", default=9, cast=int)
 
 MAILING_SERVICE_URL = config("MAILING_SERVICE_URL")
 MAILING_SERVICE_JWT_TOKEN = config("MAILING_SERVICE_JWT_TOKEN")
+MAILING_SERVICE_CONCURRENCY = config("MAILING_SERVICE_CONCURRENCY", default=1, cast=int)
+MAILING_SERVICE_RATE_LIMIT = config("MAILING_SERVICE_RATE_LIMIT", default=0, cast=float)
+MAILING_SERVICE_RATE_LIMIT_BURST = config(
+    "MAILING_SERVICE_RATE_LIMIT_BURST", default=0, cast=float
+)
+MAILING_SERVICE_BATCH_SIZE = config("MAILING_SERVICE_BATCH_SIZE", default=0, cast=int)
+MAILING_SERVICE_BACKEND = config(
+    "MAILING_SERVICE_BACKEND",
+    default=(
+        "async_http"
+        if MAILING_SERVICE_CONCURRENCY > 1 and not MAILING_SERVICE_BATCH_SIZE
+        else "http"
+    ),
+)
+MAILING_SERVICE_FAKE_LATENCY = config(
+    "MAILING_SERVICE_FAKE_LATENCY", default=0.0, cast=float
+)
+MAILING_SERVICE_FAKE_ERROR_RATE = config(
+    "MAILING_SERVICE_FAKE_ERROR_RATE", default=0.0, cast=float
+)
+MAILING_SERVICE_FILE_PATH = config(
+    "MAILING_SERVICE_FILE_PATH", default=str(BASE_DIR / "sent_messages.ndjson")
+)
+MAILING_SERVICE_BREAKER_FAILURE_RATE = config(
+    "MAILING_SERVICE_BREAKER_FAILURE_RATE", default=0, cast=float
+)
+MAILING_SERVICE_BREAKER_MIN_REQUESTS = config(
+    "MAILING_SERVICE_BREAKER_MIN_REQUESTS", default=20, cast=int
+)
+MAILING_SERVICE_BREAKER_WINDOW = config(
+    "MAILING_SERVICE_BREAKER_WINDOW", default=30, cast=float
+)
+MAILING_SERVICE_BREAKER_OPEN_TIMEOUT = config(
+    "MAILING_SERVICE_BREAKER_OPEN_TIMEOUT", default=30, cast=float
+)
+MAILING_SERVICE_BREAKER_PROBES = config(
+    "MAILING_SERVICE_BREAKER_PROBES", default=3, cast=int
+)
+MAILING_SERVICE_POOL_SIZE = config("MAILING_SERVICE_POOL_SIZE", default=10, cast=int)
+MAILING_SERVICE_CONNECT_TIMEOUT = config(
+    "MAILING_SERVICE_CONNECT_TIMEOUT", default=3.0, cast=float
+)
+MAILING_SERVICE_READ_TIMEOUT = config(
+    "MAILING_SERVICE_READ_TIMEOUT", default=10.0, cast=float
+)
 
 
 # Emails
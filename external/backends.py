@@ -0,0 +1,163 @@
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from api.logs import logger
+from config.settings import (
+    MAILING_SERVICE_BACKEND,
+    MAILING_SERVICE_FAKE_ERROR_RATE,
+    MAILING_SERVICE_FAKE_LATENCY,
+    MAILING_SERVICE_FILE_PATH,
+)
+from external.circuit_breaker import CircuitBreaker
+from external.mailing_service import (
+    AsyncMailingServiceClient,
+    MailingServiceClient,
+    MailingServiceOverloaded,
+    OutgoingMessage,
+)
+from external.rate_limit import TokenBucket
+
+# Every backend sends messages with send_messages(messages), which returns
+# the outcome for every message ID: None if the message was sent,
+# otherwise the error.
+
+
+class AsyncMailingServiceBackend:
+    """
+    Sends messages with the async client from synchronous callers
+    such as Celery tasks.
+    """
+
+    def __init__(
+        self,
+        rate_limiter: Optional[TokenBucket] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.client = AsyncMailingServiceClient(
+            rate_limiter=rate_limiter, circuit_breaker=circuit_breaker
+        )
+
+    def send_messages(
+        self, messages: List[OutgoingMessage]
+    ) -> Dict[int, Optional[Exception]]:
+        return self.client.send_messages_sync(messages)
+
+
+class FakeMailingService:
+    """
+    An in-process stand-in for the Mailing Service API for load testing.
+    Spends latency seconds on every message and fails a share of error_rate
+    of them, as an overloaded service would.
+    """
+
+    def __init__(
+        self,
+        latency: float = MAILING_SERVICE_FAKE_LATENCY,
+        error_rate: float = MAILING_SERVICE_FAKE_ERROR_RATE,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.sent_count = 0
+        self.failed_count = 0
+
+    def send_messages(
+        self, messages: List[OutgoingMessage]
+    ) -> Dict[int, Optional[Exception]]:
+        results = {}
+
+        for message in messages:
+            if self.latency:
+                time.sleep(self.latency)
+
+            if random.random() < self.error_rate:
+                results[message.message_id] = MailingServiceOverloaded(
+                    message.message_id, 503
+                )
+                self.failed_count += 1
+            else:
+                results[message.message_id] = None
+                self.sent_count += 1
+
+        return results
+
+
+class FileMailingService:
+    """
+    Appends messages to an NDJSON file instead of sending them,
+    one {"id": ..., "phone": ..., "text": ...} object per line.
+    Every batch is written at once, so the workers can share the file.
+    """
+
+    def __init__(self, path: str = MAILING_SERVICE_FILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send_messages(
+        self, messages: List[OutgoingMessage]
+    ) -> Dict[int, Optional[Exception]]:
+        lines = "".join(
+            json.dumps(
+                {
+                    "id": message.message_id,
+                    "phone": message.phone_number,
+                    "text": message.text,
+                },
+                ensure_ascii=False,
+            )
+            + "\n"
+            for message in messages
+        )
+
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+
+        return {message.message_id: None for message in messages}
+
+
+MAILING_BACKENDS = {
+    "http": MailingServiceClient,
+    "async_http": AsyncMailingServiceBackend,
+    "fake": FakeMailingService,
+    "file": FileMailingService,
+}
+HTTP_BACKENDS = ("http", "async_http")
+
+
+def create_mailing_backend(
+    name: str = MAILING_SERVICE_BACKEND,
+    rate_limiter: Optional[TokenBucket] = None,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+):
+    """
+    Creates the backend messages are sent with.
+
+    Args:
+        name (str): The name of the backend in MAILING_BACKENDS.
+        rate_limiter (Optional[TokenBucket]): The rate limiter of the HTTP backends.
+        circuit_breaker (Optional[CircuitBreaker]): The circuit breaker
+            of the HTTP backends.
+
+    Returns:
+        The backend with a send_messages(messages) method.
+
+    Raises:
+        ValueError: If there is no backend with the given name.
+    """
+
+    if name not in MAILING_BACKENDS:
+        raise ValueError(
+            f"Unknown mailing backend: {name!r}. "
+            f"Expected one of: {', '.join(MAILING_BACKENDS)}."
+        )
+
+    if name in HTTP_BACKENDS:
+        return MAILING_BACKENDS[name](
+            rate_limiter=rate_limiter, circuit_breaker=circuit_breaker
+        )
+
+    logger.warning(f"Messages are not sent to the clients: {name} mailing backend.")
+
+    return MAILING_BACKENDS[name]()
@@ -0,0 +1,260 @@
+from typing import Optional
+
+from redis import RedisError
+
+from api.logs import logger
+from config.settings import (
+    MAILING_SERVICE_BREAKER_FAILURE_RATE,
+    MAILING_SERVICE_BREAKER_MIN_REQUESTS,
+    MAILING_SERVICE_BREAKER_OPEN_TIMEOUT,
+    MAILING_SERVICE_BREAKER_PROBES,
+    MAILING_SERVICE_BREAKER_WINDOW,
+)
+from external.redis_client import get_redis_client
+
+# Lets a request through if the circuit is closed, or as one of the probes
+# if it is half-open. An open circuit becomes half-open after the open timeout,
+# and probes that did not report in time are replaced by new ones.
+# Returns the number of seconds to wait before trying again, 0 if allowed.
+ALLOW_SCRIPT = """
+local open_timeout = tonumber(ARGV[1])
+local max_probes = tonumber(ARGV[2])
+
+local redis_time = redis.call("TIME")
+local now = tonumber(redis_time[1]) + tonumber(redis_time[2]) / 1000000
+
+local circuit = redis.call("HMGET", KEYS[1], "state", "opened_at", "probes")
+local state = circuit[1] or "closed"
+
+if state == "closed" then
+    return "0"
+end
+
+local wait = tonumber(circuit[2]) + open_timeout - now
+local probes = tonumber(circuit[3]) or 0
+
+if wait <= 0 then
+    -- open for long enough, or the probes got lost
+    redis.call(
+        "HSET", KEYS[1],
+        "state", "half_open", "opened_at", now, "probes", 0, "successes", 0
+    )
+    state = "half_open"
+    probes = 0
+    wait = open_timeout
+end
+
+if state == "half_open" and probes < max_probes then
+    redis.call("HINCRBY", KEYS[1], "probes", 1)
+    return "0"
+end
+
+return tostring(wait)
+"""
+
+# Counts the outcome of a request. A closed circuit opens when the failure rate
+# within the current window reaches the threshold, a half-open one opens on
+# the first failed probe and closes when all the probes succeed.
+# Returns the state and whether it has changed.
+RECORD_SCRIPT = """
+local failed = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local min_requests = tonumber(ARGV[3])
+local failure_rate = tonumber(ARGV[4])
+local max_probes = tonumber(ARGV[5])
+local open_timeout = tonumber(ARGV[6])
+
+local redis_time = redis.call("TIME")
+local now = tonumber(redis_time[1]) + tonumber(redis_time[2]) / 1000000
+
+local circuit = redis.call(
+    "HMGET", KEYS[1], "state", "window_start", "requests", "failures", "successes"
+)
+local state = circuit[1] or "closed"
+local ttl = math.ceil(math.max(window, open_timeout) * 2)
+
+if state == "open" then
+    -- a late outcome of a request sent before the circuit opened
+    return {state, 0}
+end
+
+if state == "half_open" then
+    if failed == 1 then
+        redis.call("HSET", KEYS[1], "state", "open", "opened_at", now)
+        redis.call("EXPIRE", KEYS[1], ttl)
+        return {"open", 1}
+    end
+    if (tonumber(circuit[5]) or 0) + 1 >= max_probes then
+        redis.call("DEL", KEYS[1])
+        return {"closed", 1}
+    end
+    redis.call("HINCRBY", KEYS[1], "successes", 1)
+    return {state, 0}
+end
+
+local window_start = tonumber(circuit[2])
+local requests = tonumber(circuit[3]) or 0
+local failures = tonumber(circuit[4]) or 0
+
+if window_start == nil or now - window_start >= window then
+    window_start = now
+    requests = 0
+    failures = 0
+end
+
+requests = requests + 1
+failures = failures + failed
+
+if requests >= min_requests and failures >= failure_rate * requests then
+    redis.call("DEL", KEYS[1])
+    redis.call("HSET", KEYS[1], "state", "open", "opened_at", now)
+    redis.call("EXPIRE", KEYS[1], ttl)
+    return {"open", 1}
+end
+
+redis.call(
+    "HSET", KEYS[1],
+    "window_start", window_start, "requests", requests, "failures", failures
+)
+redis.call("EXPIRE", KEYS[1], ttl)
+
+return {state, 0}
+"""
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker shared by all workers through Redis.
+
+    While the circuit is closed, requests go through and their outcomes are counted
+    by fixed time windows. When the failure rate reaches the threshold, the circuit
+    opens and requests fail fast without reaching the service. After the open
+    timeout the circuit becomes half-open and lets a few probe requests through:
+    it closes if they all succeed and opens again on the first failure.
+
+    If Redis is unavailable, requests go through as if the circuit were closed.
+
+    Args:
+        key (str): The Redis key of the circuit.
+        failure_rate (float): The share of failed requests that opens the circuit.
+        min_requests (int): The number of requests in a window before it can open.
+        window (float): The length of a window in seconds.
+        open_timeout (float): The number of seconds the circuit stays open.
+        probes (int): The number of probe requests of a half-open circuit.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        failure_rate: float,
+        min_requests: int,
+        window: float,
+        open_timeout: float,
+        probes: int,
+    ):
+        self.key = key
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.open_timeout = open_timeout
+        self.probes = probes
+
+        redis_client = get_redis_client()
+        self._allow_script = redis_client.register_script(ALLOW_SCRIPT)
+        self._record_script = redis_client.register_script(RECORD_SCRIPT)
+
+    def allow_request(self) -> float:
+        """
+        Asks the circuit whether a request may be sent.
+
+        Returns:
+            float: 0 if the request may be sent, otherwise the number of seconds
+                before the circuit lets requests through again.
+        """
+
+        try:
+            wait = self._allow_script(
+                keys=[self.key], args=[self.open_timeout, self.probes]
+            )
+        except RedisError as error:
+            logger.warning(f"Circuit breaker is unavailable: {error!r}")
+            return 0
+
+        return float(wait)
+
+    def get_retry_after(self) -> float:
+        """
+        Checks the circuit without taking a probe.
+
+        Returns:
+            float: The number of seconds the circuit stays open, 0 if it is not open.
+        """
+
+        try:
+            state, opened_at, (seconds, microseconds) = self._get_circuit()
+        except RedisError as error:
+            logger.warning(f"Circuit breaker is unavailable: {error!r}")
+            return 0
+
+        if state != b"open":
+            return 0
+
+        now = seconds + microseconds / 1_000_000
+        return max(0.0, float(opened_at) + self.open_timeout - now)
+
+    def _get_circuit(self) -> tuple:
+        with get_redis_client().pipeline(transaction=False) as pipeline:
+            pipeline.hmget(self.key, "state", "opened_at")
+            pipeline.time()
+            (state, opened_at), redis_time = pipeline.execute()
+
+        return state, opened_at, redis_time
+
+    def record(self, failed: bool) -> None:
+        """
+        Counts the outcome of a request and logs the state changes of the circuit.
+
+        Args:
+            failed (bool): Whether the service failed the request.
+        """
+
+        try:
+            state, changed = self._record_script(
+                keys=[self.key],
+                args=[
+                    int(failed),
+                    self.window,
+                    self.min_requests,
+                    self.failure_rate,
+                    self.probes,
+                    self.open_timeout,
+                ],
+            )
+        except RedisError as error:
+            logger.warning(f"Circuit breaker is unavailable: {error!r}")
+            return
+
+        if changed:
+            logger.warning(f"Mailing service circuit breaker is {state.decode()}.")
+
+
+def create_circuit_breaker() -> Optional[CircuitBreaker]:
+    """
+    Creates the circuit breaker of requests to the Mailing Service API.
+
+    Returns:
+        Optional[CircuitBreaker]: The breaker, or None
+            if MAILING_SERVICE_BREAKER_FAILURE_RATE is 0.
+    """
+
+    if not MAILING_SERVICE_BREAKER_FAILURE_RATE:
+        return None
+
+    return CircuitBreaker(
+        key="mailing_service:circuit_breaker",
+        failure_rate=MAILING_SERVICE_BREAKER_FAILURE_RATE,
+        min_requests=MAILING_SERVICE_BREAKER_MIN_REQUESTS,
+        window=MAILING_SERVICE_BREAKER_WINDOW,
+        open_timeout=MAILING_SERVICE_BREAKER_OPEN_TIMEOUT,
+        probes=MAILING_SERVICE_BREAKER_PROBES,
+    )
@@ -1,29 +1,95 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 
 from api.logs import logger
-from config.settings import MAILING_SERVICE_JWT_TOKEN, MAILING_SERVICE_URL
+from api.utils import split_into_batches
+from config.settings import (
+    MAILING_SERVICE_BATCH_SIZE,
+    MAILING_SERVICE_CONCURRENCY,
+    MAILING_SERVICE_CONNECT_TIMEOUT,
+    MAILING_SERVICE_JWT_TOKEN,
+    MAILING_SERVICE_POOL_SIZE,
+    MAILING_SERVICE_READ_TIMEOUT,
+    MAILING_SERVICE_URL,
+)
+from external.circuit_breaker import CircuitBreaker
+from external.rate_limit import AdaptiveConcurrencyLimit, TokenBucket
 
 
-class MailingServiceClient:
-    def __init__(self):
-        self.base_url = MAILING_SERVICE_URL
-        self.jwt_token = MAILING_SERVICE_JWT_TOKEN
+class MailingServiceError(Exception):
+    """
+    The message was not accepted by the Mailing Service.
+    """
 
-    def send_message(self, text: str, phone_number: str, message_id: int) -> dict:
-        """
-        Sends a message using the Mailing Service API.
+    def __init__(self, message_id: int, status: Optional[int] = None):
+        super().__init__(f"Message #{message_id}: Failed to send. Status: {status}.")
+        self.message_id = message_id
+        self.status = status
 
-        Args:
-            text (str): The text of the message.
-            phone_number (str): The phone number to send the message to.
-            message_id (int): The ID of the message.
 
-        Returns:
-            dict: The JSON response from the server.
+class MailingServiceOverloaded(MailingServiceError):
+    """
+    The Mailing Service throttled the request (429) or failed to handle it (5xx).
+    """
+
+    def __init__(
+        self, message_id: int, status: int, retry_after: Optional[float] = None
+    ):
+        super().__init__(message_id, status)
+        self.retry_after = retry_after
+
+
+class MailingServiceUnavailable(MailingServiceError):
+    """
+    The request was not sent, as the circuit breaker of the Mailing Service is open.
+    """
+
+    def __init__(self, message_id: int, retry_after: float):
+        super().__init__(message_id)
+        self.retry_after = retry_after
+
+
+class OutgoingMessage(NamedTuple):
+    message_id: int
+    phone_number: str
+    text: str
+
+
+class BaseMailingServiceClient:
+    def __init__(
+        self,
+        base_url: str = MAILING_SERVICE_URL,
+        jwt_token: str = MAILING_SERVICE_JWT_TOKEN,
+        timeout: Tuple[float, float] = (
+            MAILING_SERVICE_CONNECT_TIMEOUT,
+            MAILING_SERVICE_READ_TIMEOUT,
+        ),
+        rate_limiter: Optional[TokenBucket] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url
+        self.jwt_token = jwt_token
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.jwt_token}"}
+
+    def build_request(
+        self, text: str, phone_number: str, message_id: int
+    ) -> Tuple[str, dict]:
+        """
+        Builds the url and the JSON body of a send message request.
         """
 
         url = f"{self.base_url}/send/{message_id}"
-        headers = {"Authorization": f"Bearer {self.jwt_token}"}
         json = {
             "id": message_id,
             "phone": phone_number,
@@ -32,15 +98,441 @@ class MailingServiceClient:
 
         logger.info(f"Message #{message_id}: Request url: {url}. Request json: {json}")
 
-        response = requests.post(url, headers=headers, json=json)
-        response.raise_for_status()
-        response_json = response.json()
+        return url, json
+
+    def check_circuit(self, message_id: int) -> None:
+        """
+        Checks that the circuit breaker lets the request through.
+
+        Raises:
+            MailingServiceUnavailable: If the circuit is open.
+        """
+
+        if self.circuit_breaker is None:
+            return
+
+        if wait := self.circuit_breaker.allow_request():
+            raise MailingServiceUnavailable(message_id, wait)
+
+    def record_outcome(self, error: Optional[Exception]) -> None:
+        """
+        Reports the outcome of a request to the circuit breaker.
+        Only failures of the service itself count: throttling, server errors,
+        timeouts and connection errors, not rejected messages.
+        """
+
+        if self.circuit_breaker is None:
+            return
+
+        self.circuit_breaker.record(
+            failed=isinstance(
+                error,
+                (
+                    MailingServiceOverloaded,
+                    requests.RequestException,
+                    aiohttp.ClientError,
+                    asyncio.TimeoutError,
+                ),
+            )
+        )
+
+    def check_status(self, message_id: int, status: int, headers: Mapping) -> None:
+        """
+        Checks the HTTP status of a send message request.
+
+        Raises:
+            MailingServiceOverloaded: If the service throttled or failed the request.
+            MailingServiceError: If the service rejected the request.
+        """
+
+        if status == 429 or status >= 500:
+            logger.error(
+                f"Message #{message_id}: Mailing service overloaded ({status})."
+            )
+            raise MailingServiceOverloaded(
+                message_id, status, parse_retry_after(headers.get("Retry-After"))
+            )
+
+        if status >= 400:
+            logger.error(f"Message #{message_id}: Failed to send ({status}).")
+            raise MailingServiceError(message_id, status)
+
+    def check_response(self, message_id: int, response_json: dict) -> None:
+        """
+        Checks the response of a send message request.
+
+        Raises:
+            MailingServiceError: If the message was not accepted.
+        """
 
         logger.info(f"Message #{message_id}: Response: {response_json}")
 
-        is_ok = response.ok and response_json.get("message") == "OK"
-        if not is_ok:
+        if response_json.get("message") != "OK":
             logger.error(f"Message #{message_id}: Failed to send.")
-            raise Exception()
+            raise MailingServiceError(message_id)
+
+    def build_batch_request(self, messages: List[OutgoingMessage]) -> Tuple[str, dict]:
+        """
+        Builds the url and the JSON body of a send messages batch request.
+        """
+
+        url = f"{self.base_url}/send"
+        json = {
+            "messages": [
+                {
+                    "id": message.message_id,
+                    "phone": message.phone_number,
+                    "text": message.text,
+                }
+                for message in messages
+            ]
+        }
+
+        logger.info(f"Request url: {url}. Request messages: {len(messages)}")
+
+        return url, json
+
+    def check_batch_response(
+        self, message_ids: Iterable[int], response_json: dict
+    ) -> Dict[int, Optional[Exception]]:
+        """
+        Checks the per-message results of a send messages batch request.
+        Messages missing from the results are considered not accepted.
+
+        Returns:
+            Dict[int, Optional[Exception]]: The outcome for every message ID:
+                None if the message was accepted, otherwise the error.
+        """
+
+        results = {
+            result.get("id"): result.get("message")
+            for result in response_json.get("results", [])
+        }
+        outcomes = {}
+
+        for message_id in message_ids:
+            if results.get(message_id) == "OK":
+                outcomes[message_id] = None
+            else:
+                logger.error(
+                    f"Message #{message_id}: Failed to send. "
+                    f"Response: {results.get(message_id)}"
+                )
+                outcomes[message_id] = MailingServiceError(message_id)
+
+        return outcomes
+
+
+class MailingServiceClient(BaseMailingServiceClient):
+    def __init__(
+        self,
+        base_url: str = MAILING_SERVICE_URL,
+        jwt_token: str = MAILING_SERVICE_JWT_TOKEN,
+        pool_size: int = MAILING_SERVICE_POOL_SIZE,
+        timeout: Tuple[float, float] = (
+            MAILING_SERVICE_CONNECT_TIMEOUT,
+            MAILING_SERVICE_READ_TIMEOUT,
+        ),
+        rate_limiter: Optional[TokenBucket] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        batch_size: int = MAILING_SERVICE_BATCH_SIZE,
+    ):
+        super().__init__(base_url, jwt_token, timeout, rate_limiter, circuit_breaker)
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+
+        self._session: Optional[requests.Session] = None
+        self._session_pid: Optional[int] = None
+
+    @property
+    def session(self) -> requests.Session:
+        """
+        The keep-alive HTTP session of the current process.
+
+        The session is created lazily and recreated after a fork,
+        so pooled connections are never shared between worker processes.
+        """
+
+        if self._session is None or self._session_pid != os.getpid():
+            self._session = self._create_session()
+            self._session_pid = os.getpid()
+
+        return self._session
+
+    def _create_session(self) -> requests.Session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(self.headers)
+
+        return session
+
+    def close(self) -> None:
+        """
+        Closes the pooled connections of the current process.
+        """
+
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def send_message(self, text: str, phone_number: str, message_id: int) -> dict:
+        """
+        Sends a message using the Mailing Service API.
+
+        Args:
+            text (str): The text of the message.
+            phone_number (str): The phone number to send the message to.
+            message_id (int): The ID of the message.
+
+        Returns:
+            dict: The JSON response from the server.
+        """
+
+        url, json = self.build_request(text, phone_number, message_id)
+
+        self.check_circuit(message_id)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        try:
+            response = self.session.post(url, json=json, timeout=self.timeout)
+            self.check_status(message_id, response.status_code, response.headers)
+        except Exception as error:
+            self.record_outcome(error)
+            raise
+
+        self.record_outcome(None)
+        self.check_response(message_id, response.json())
 
         return response
+
+    def send_message_batch(
+        self, messages: List[OutgoingMessage]
+    ) -> Dict[int, Optional[Exception]]:
+        """
+        Sends messages in a single request using the batch Mailing Service API.
+        The service accepts or rejects every message separately.
+
+        Args:
+            messages (List[OutgoingMessage]): The messages to send.
+
+        Returns:
+            Dict[int, Optional[Exception]]: The outcome for every message ID:
+                None if the message was sent, otherwise the error.
+        """
+
+        url, json = self.build_batch_request(messages)
+        message_ids = [message.message_id for message in messages]
+
+        try:
+            self.check_circuit(message_ids[0])
+        except MailingServiceUnavailable as error:
+            return dict.fromkeys(message_ids, error)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        try:
+            response = self.session.post(url, json=json, timeout=self.timeout)
+            self.check_status(message_ids[0], response.status_code, response.headers)
+            response_json = response.json()
+        except Exception as error:
+            self.record_outcome(error)
+            # the whole request failed, so did every message in it
+            return dict.fromkeys(message_ids, error)
+
+        self.record_outcome(None)
+
+        return self.check_batch_response(message_ids, response_json)
+
+    def send_messages(
+        self, messages: List[OutgoingMessage]
+    ) -> Dict[int, Optional[Exception]]:
+        """
+        Sends messages by batches of batch_size messages per request,
+        or one by one if batch_size is 0.
+
+        Args:
+            messages (List[OutgoingMessage]): The messages to send.
+
+        Returns:
+            Dict[int, Optional[Exception]]: The outcome for every message ID:
+                None if the message was sent, otherwise the error.
+        """
+
+        results = {}
+
+        if self.batch_size > 0:
+            for batch in split_into_batches(messages, self.batch_size):
+                results.update(self.send_message_batch(batch))
+            return results
+
+        for message in messages:
+            try:
+                self.send_message(
+                    text=message.text,
+                    phone_number=message.phone_number,
+                    message_id=message.message_id,
+                )
+            except Exception as error:
+                results[message.message_id] = error
+            else:
+                results[message.message_id] = None
+
+        return results
+
+
+class AsyncMailingServiceClient(BaseMailingServiceClient):
+    """
+    Sends batches of messages with many requests in flight at once.
+
+    The number of requests in flight is bounded by an AIMD limit: it ramps up
+    while requests succeed and backs off when the service throttles us or fails,
+    so throughput follows the real capacity of the service.
+    """
+
+    def __init__(
+        self,
+        base_url: str = MAILING_SERVICE_URL,
+        jwt_token: str = MAILING_SERVICE_JWT_TOKEN,
+        concurrency: int = MAILING_SERVICE_CONCURRENCY,
+        timeout: Tuple[float, float] = (
+            MAILING_SERVICE_CONNECT_TIMEOUT,
+            MAILING_SERVICE_READ_TIMEOUT,
+        ),
+        rate_limiter: Optional[TokenBucket] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        super().__init__(base_url, jwt_token, timeout, rate_limiter, circuit_breaker)
+        self.concurrency = concurrency
+        # kept between batches, so every batch starts from the learned limit
+        self.concurrency_limit = AdaptiveConcurrencyLimit(max_limit=concurrency)
+
+    def create_http_session(self) -> aiohttp.ClientSession:
+        connect_timeout, read_timeout = self.timeout
+
+        return aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=connect_timeout, sock_read=read_timeout
+            ),
+        )
+
+    async def send_message(
+        self,
+        http_session: aiohttp.ClientSession,
+        text: str,
+        phone_number: str,
+        message_id: int,
+    ) -> dict:
+        """
+        Sends a message using the Mailing Service API.
+
+        Args:
+            http_session (aiohttp.ClientSession): The session to send the request with.
+            text (str): The text of the message.
+            phone_number (str): The phone number to send the message to.
+            message_id (int): The ID of the message.
+
+        Returns:
+            dict: The JSON response from the server.
+        """
+
+        url, json = self.build_request(text, phone_number, message_id)
+
+        # the circuit breaker calls Redis synchronously, so not on the event loop
+        await asyncio.to_thread(self.check_circuit, message_id)
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async()
+
+        try:
+            async with http_session.post(url, json=json) as response:
+                self.check_status(message_id, response.status, response.headers)
+                response_json = await response.json()
+        except Exception as error:
+            await asyncio.to_thread(self.record_outcome, error)
+            raise
+
+        await asyncio.to_thread(self.record_outcome, None)
+        self.check_response(message_id, response_json)
+
+        return response_json
+
+    async def send_messages(
+        self, messages: List[OutgoingMessage]
+    ) -> Dict[int, Optional[Exception]]:
+        """
+        Sends messages concurrently using the Mailing Service API.
+
+        Args:
+            messages (List[OutgoingMessage]): The messages to send.
+
+        Returns:
+            Dict[int, Optional[Exception]]: The outcome for every message ID:
+                None if the message was sent, otherwise the error.
+        """
+
+        concurrency_limit = self.concurrency_limit
+        condition = asyncio.Condition()
+        in_flight = 0
+
+        async def send(http_session: aiohttp.ClientSession, message: OutgoingMessage):
+            nonlocal in_flight
+
+            async with condition:
+                await condition.wait_for(lambda: in_flight < concurrency_limit.limit)
+                in_flight += 1
+
+            try:
+                await self.send_message(
+                    http_session,
+                    text=message.text,
+                    phone_number=message.phone_number,
+                    message_id=message.message_id,
+                )
+            except Exception as error:
+                if isinstance(error, MailingServiceOverloaded):
+                    concurrency_limit.on_overload()
+                return message.message_id, error
+            else:
+                concurrency_limit.on_success()
+                return message.message_id, None
+            finally:
+                async with condition:
+                    in_flight -= 1
+                    condition.notify_all()
+
+        async with self.create_http_session() as http_session:
+            results = await asyncio.gather(
+                *(send(http_session, message) for message in messages)
+            )
+
+        return dict(results)
+
+    def send_messages_sync(
+        self, messages: List[OutgoingMessage]
+    ) -> Dict[int, Optional[Exception]]:
+        """
+        Runs send_messages in a new event loop, for synchronous callers
+        such as Celery tasks.
+        """
+
+        return asyncio.run(self.send_messages(messages))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses the Retry-After header given in seconds.
+    HTTP dates are not supported and treated as a missing header.
+    """
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,128 @@
+import logging
+import time
+from typing import List
+
+import requests
+from django.core.management.base import BaseCommand
+
+from external.mailing_service import (
+    AsyncMailingServiceClient,
+    MailingServiceClient,
+    OutgoingMessage,
+)
+from external.stub_server import stub_server_process
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures messages/second sent to a local Mailing Service stub: "
+        "a new connection per request, the pooled keep-alive client, "
+        "the concurrent async client and the batch endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1000)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.0,
+            help="Stub server response latency in seconds.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=100,
+            help="Requests in flight for the async client.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Messages per request to the batch endpoint.",
+        )
+
+    def handle(self, *args, **options):
+        messages = options["messages"]
+
+        # per-message request logs would dominate the measurement
+        logging.disable(logging.INFO)
+
+        try:
+            with stub_server_process(latency=options["latency"]) as url:
+                before = self.measure(messages, self.send_without_pool(url))
+
+                client = MailingServiceClient(base_url=url)
+                pooled = self.measure(messages, client.send_message)
+                client.close()
+
+                async_client = AsyncMailingServiceClient(
+                    base_url=url, concurrency=options["concurrency"]
+                )
+                concurrent = self.measure_async(messages, async_client)
+
+                batch_client = MailingServiceClient(
+                    base_url=url, batch_size=options["batch_size"]
+                )
+                batched = self.measure_batches(messages, batch_client)
+                batch_client.close()
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.stdout.write(f"Messages: {messages}")
+        self.stdout.write(f"Before (requests.post): {before:.0f} messages/second")
+        self.stdout.write(f"After (pooled session): {pooled:.0f} messages/second")
+        self.stdout.write(
+            f"Async ({options['concurrency']} in flight): "
+            f"{concurrent:.0f} messages/second"
+        )
+        self.stdout.write(
+            f"Batch endpoint ({options['batch_size']} per request): "
+            f"{batched:.0f} messages/second"
+        )
+
+    @staticmethod
+    def send_without_pool(base_url: str):
+        def send_message(text: str, phone_number: str, message_id: int):
+            response = requests.post(
+                f"{base_url}/send/{message_id}",
+                json={"id": message_id, "phone": phone_number, "text": text},
+            )
+            response.raise_for_status()
+
+        return send_message
+
+    @staticmethod
+    def measure(messages: int, send_message) -> float:
+        started_at = time.perf_counter()
+
+        for message_id in range(1, messages + 1):
+            send_message(
+                text="Benchmark", phone_number="79000000000", message_id=message_id
+            )
+
+        return messages / (time.perf_counter() - started_at)
+
+    @staticmethod
+    def outgoing_messages(messages: int) -> List[OutgoingMessage]:
+        return [
+            OutgoingMessage(
+                message_id=message_id, phone_number="79000000000", text="Benchmark"
+            )
+            for message_id in range(1, messages + 1)
+        ]
+
+    def measure_async(self, messages: int, client: AsyncMailingServiceClient) -> float:
+        outgoing_messages = self.outgoing_messages(messages)
+
+        started_at = time.perf_counter()
+        client.send_messages_sync(outgoing_messages)
+
+        return messages / (time.perf_counter() - started_at)
+
+    def measure_batches(self, messages: int, client: MailingServiceClient) -> float:
+        outgoing_messages = self.outgoing_messages(messages)
+
+        started_at = time.perf_counter()
+        client.send_messages(outgoing_messages)
+
+        return messages / (time.perf_counter() - started_at)
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from typing import Optional
+
+from redis import RedisError
+
+from api.logs import logger
+from config.settings import (
+    MAILING_SERVICE_RATE_LIMIT,
+    MAILING_SERVICE_RATE_LIMIT_BURST,
+)
+from external.redis_client import get_redis_client
+
+# Refills the bucket by the time passed since the last call and takes the
+# requested tokens if there are enough of them. Returns the number of seconds
+# to wait before the tokens are available (as a string, Redis truncates floats).
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+
+local redis_time = redis.call("TIME")
+local now = tonumber(redis_time[1]) + tonumber(redis_time[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "timestamp")
+local tokens = tonumber(bucket[1]) or capacity
+local timestamp = tonumber(bucket[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - timestamp) * rate)
+
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+
+redis.call("HSET", KEYS[1], "tokens", tokens, "timestamp", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """
+    A token bucket rate limiter shared by all workers through Redis.
+
+    If Redis is unavailable, requests go through without a limit.
+
+    Args:
+        key (str): The Redis key of the bucket.
+        rate (float): The number of tokens added per second.
+        capacity (float): The maximum number of tokens, i.e. the allowed burst.
+    """
+
+    def __init__(self, key: str, rate: float, capacity: float):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self._script = get_redis_client().register_script(TOKEN_BUCKET_SCRIPT)
+
+    def try_acquire(self, tokens: int = 1) -> float:
+        """
+        Tries to take tokens from the bucket.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the number of seconds
+                to wait before trying again.
+        """
+
+        try:
+            wait = self._script(keys=[self.key], args=[self.rate, self.capacity, tokens])
+        except RedisError as error:
+            logger.warning(f"Rate limiter is unavailable: {error!r}")
+            return 0
+
+        return float(wait)
+
+    def acquire(self, tokens: int = 1) -> None:
+        """
+        Takes tokens from the bucket, blocking until they are available.
+        """
+
+        while wait := self.try_acquire(tokens):
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 1) -> None:
+        """
+        Takes tokens from the bucket without blocking the event loop while waiting.
+        The Redis calls are made in a thread, as the Redis client is synchronous.
+        """
+
+        while wait := await asyncio.to_thread(self.try_acquire, tokens):
+            await asyncio.sleep(wait)
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    Additive increase / multiplicative decrease (AIMD) limit of requests in flight.
+
+    Every successful request raises the limit by 1 / limit, so the limit grows
+    by about one per round of requests. A throttled or failed request
+    multiplies the limit by the decrease factor.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: Optional[int] = None,
+        decrease_factor: float = 0.5,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_factor = decrease_factor
+        self._limit = float(initial_limit or max_limit)
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def on_success(self) -> None:
+        self._limit = min(self.max_limit, self._limit + 1 / self.limit)
+
+    def on_overload(self) -> None:
+        self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+        logger.info(f"Mailing service overloaded. Concurrency limit: {self.limit}.")
+
+
+def create_rate_limiter() -> Optional[TokenBucket]:
+    """
+    Creates the rate limiter of requests to the Mailing Service API.
+
+    The bucket holds at least one token, otherwise a rate below one request
+    per second without a burst would never let a request through.
+
+    Returns:
+        Optional[TokenBucket]: The limiter, or None if MAILING_SERVICE_RATE_LIMIT is 0.
+    """
+
+    if not MAILING_SERVICE_RATE_LIMIT:
+        return None
+
+    return TokenBucket(
+        key="mailing_service:rate_limit",
+        rate=MAILING_SERVICE_RATE_LIMIT,
+        capacity=max(1, MAILING_SERVICE_RATE_LIMIT_BURST or MAILING_SERVICE_RATE_LIMIT),
+    )
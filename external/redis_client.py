@@ -0,0 +1,15 @@
+from functools import lru_cache
+
+import redis
+
+from config.settings import REDIS_URL
+
+
+@lru_cache(maxsize=None)
+def get_redis_client() -> redis.Redis:
+    """
+    Returns the Redis client shared by the workers of the current host.
+    The connection pool of the client reconnects after a fork by itself.
+    """
+
+    return redis.Redis.from_url(REDIS_URL)
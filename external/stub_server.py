@@ -0,0 +1,158 @@
+import json
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+
+class MailingServiceStubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, Nagle would delay the body
+    disable_nagle_algorithm = True
+
+    server: "MailingServiceStubServer"
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(content_length)
+
+        self.server.request_started()
+        try:
+            if self.server.latency:
+                time.sleep(self.server.latency)
+        finally:
+            self.server.request_finished()
+
+        if self.server.response_status != 200:
+            self.send_json(
+                {"message": "Error"},
+                status=self.server.response_status,
+                headers={"Retry-After": "1"},
+            )
+            return
+
+        if self.path.rstrip("/").endswith("/send"):
+            self.send_batch_results(json.loads(body)["messages"])
+            return
+
+        self.send_json({"code": 0, "message": "OK"})
+
+    def send_batch_results(self, messages: list) -> None:
+        results = []
+
+        for message in messages:
+            self.server.message_received()
+            if message["id"] in self.server.rejected_message_ids:
+                results.append({"id": message["id"], "code": 1, "message": "Error"})
+            else:
+                results.append({"id": message["id"], "code": 0, "message": "OK"})
+
+        self.send_json({"results": results})
+
+    def send_json(self, data: dict, status: int = 200, headers: dict = None) -> None:
+        body = json.dumps(data).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MailingServiceStubServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the external Mailing Service API.
+    Accepts every message and answers like the real service does,
+    or answers every request with response_status if it is not 200.
+
+    POST /send takes a batch of messages and rejects the ones
+    in rejected_message_ids, accepting the rest.
+
+    Usage:
+        with MailingServiceStubServer() as server:
+            client = MailingServiceClient(base_url=server.url)
+    """
+
+    daemon_threads = True
+    # the default backlog of 5 drops connections under concurrent load
+    request_queue_size = 1024
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        super().__init__((host, port), MailingServiceStubHandler)
+        self.latency = latency
+        self.response_status = 200
+        self.rejected_message_ids = set()
+        self.requests_count = 0
+        self.messages_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def request_started(self) -> None:
+        with self._lock:
+            self.requests_count += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def message_received(self) -> None:
+        with self._lock:
+            self.messages_count += 1
+
+    def request_finished(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def start(self) -> "MailingServiceStubServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "MailingServiceStubServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+
+def _serve_stub_server(latency: float, urls: multiprocessing.Queue) -> None:
+    server = MailingServiceStubServer(latency=latency)
+    urls.put(server.url)
+    server.serve_forever()
+
+
+@contextmanager
+def stub_server_process(latency: float = 0.0) -> Iterator[str]:
+    """
+    Runs the stub server in a separate process, so it does not compete
+    for the GIL with the measured client. Yields the server url.
+    """
+
+    urls = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve_stub_server, args=(latency, urls), daemon=True
+    )
+    process.start()
+
+    try:
+        yield urls.get(timeout=10)
+    finally:
+        process.terminate()
+        process.join()
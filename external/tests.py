@@ -0,0 +1,466 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+from redis import RedisError
+
+from external.backends import (
+    AsyncMailingServiceBackend,
+    FakeMailingService,
+    FileMailingService,
+    create_mailing_backend,
+)
+from external.circuit_breaker import CircuitBreaker
+from external.mailing_service import (
+    AsyncMailingServiceClient,
+    MailingServiceClient,
+    MailingServiceError,
+    MailingServiceOverloaded,
+    MailingServiceUnavailable,
+    OutgoingMessage,
+)
+from external.rate_limit import (
+    AdaptiveConcurrencyLimit,
+    TokenBucket,
+    create_rate_limiter,
+)
+from external.stub_server import MailingServiceStubServer
+
+
+class MailingServiceClientTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = MailingServiceStubServer().start()
+        self.mailing_service = MailingServiceClient(
+            base_url=self.server.url, jwt_token="token", timeout=(1, 2)
+        )
+
+    def tearDown(self):
+        self.mailing_service.close()
+        self.server.stop()
+
+    def test_send_message(self):
+        response = self.mailing_service.send_message(
+            text="Test Message", phone_number="79123456789", message_id=1
+        )
+
+        self.assertEqual(response.json(), {"code": 0, "message": "OK"})
+        self.assertEqual(self.server.requests_count, 1)
+
+    def test_session_is_reused(self):
+        session = self.mailing_service.session
+
+        for message_id in range(3):
+            self.mailing_service.send_message(
+                text="Test Message", phone_number="79123456789", message_id=message_id
+            )
+
+        self.assertIs(self.mailing_service.session, session)
+        self.assertEqual(
+            session.headers["Authorization"], f"Bearer {self.mailing_service.jwt_token}"
+        )
+
+    def test_session_is_recreated_after_fork(self):
+        session = self.mailing_service.session
+
+        with patch("external.mailing_service.os.getpid", return_value=-1):
+            self.assertIsNot(self.mailing_service.session, session)
+
+    def test_send_message_uses_timeout(self):
+        with patch.object(
+            self.mailing_service.session, "post", wraps=self.mailing_service.session.post
+        ) as post_mock:
+            self.mailing_service.send_message(
+                text="Test Message", phone_number="79123456789", message_id=1
+            )
+
+        self.assertEqual(post_mock.call_args.kwargs["timeout"], (1, 2))
+
+    def test_send_message_throttled(self):
+        self.server.response_status = 429
+
+        with self.assertRaises(MailingServiceOverloaded) as context:
+            self.mailing_service.send_message(
+                text="Test Message", phone_number="79123456789", message_id=1
+            )
+
+        self.assertEqual(context.exception.status, 429)
+        self.assertEqual(context.exception.retry_after, 1)
+
+    def test_send_message_rejected(self):
+        self.server.response_status = 400
+
+        with self.assertRaises(MailingServiceError) as context:
+            self.mailing_service.send_message(
+                text="Test Message", phone_number="79123456789", message_id=1
+            )
+
+        self.assertNotIsInstance(context.exception, MailingServiceOverloaded)
+
+    def test_send_message_acquires_rate_limit(self):
+        self.mailing_service.rate_limiter = MagicMock()
+
+        self.mailing_service.send_message(
+            text="Test Message", phone_number="79123456789", message_id=1
+        )
+
+        self.mailing_service.rate_limiter.acquire.assert_called_once_with()
+
+    def test_send_message_circuit_open(self):
+        self.mailing_service.circuit_breaker = MagicMock()
+        self.mailing_service.circuit_breaker.allow_request.return_value = 5.0
+
+        with self.assertRaises(MailingServiceUnavailable) as context:
+            self.mailing_service.send_message(
+                text="Test Message", phone_number="79123456789", message_id=1
+            )
+
+        self.assertEqual(context.exception.retry_after, 5.0)
+        self.assertEqual(self.server.requests_count, 0)
+
+    def test_send_message_reports_outcome(self):
+        self.mailing_service.circuit_breaker = MagicMock()
+        self.mailing_service.circuit_breaker.allow_request.return_value = 0
+
+        for status, failed in ((200, False), (400, False), (503, True)):
+            self.server.response_status = status
+            try:
+                self.mailing_service.send_message(
+                    text="Test Message", phone_number="79123456789", message_id=1
+                )
+            except MailingServiceError:
+                pass
+
+            self.mailing_service.circuit_breaker.record.assert_called_with(failed=failed)
+
+
+class MailingServiceBatchTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = MailingServiceStubServer().start()
+        self.mailing_service = MailingServiceClient(
+            base_url=self.server.url, jwt_token="token", batch_size=4
+        )
+        self.messages = [
+            OutgoingMessage(message_id=i, phone_number="79123456789", text="Test")
+            for i in range(10)
+        ]
+
+    def tearDown(self):
+        self.mailing_service.close()
+        self.server.stop()
+
+    def test_send_messages_by_batches(self):
+        results = self.mailing_service.send_messages(self.messages)
+
+        self.assertEqual(
+            results, {message.message_id: None for message in self.messages}
+        )
+        self.assertEqual(self.server.requests_count, 3)
+        self.assertEqual(self.server.messages_count, 10)
+
+    def test_send_messages_partial_success(self):
+        self.server.rejected_message_ids = {1, 5}
+
+        results = self.mailing_service.send_messages(self.messages)
+
+        self.assertEqual(
+            {message_id for message_id, error in results.items() if error}, {1, 5}
+        )
+        self.assertIsInstance(results[1], MailingServiceError)
+
+    def test_check_batch_response_missing_results(self):
+        results = self.mailing_service.check_batch_response(
+            [1, 2], {"results": [{"id": 1, "code": 0, "message": "OK"}]}
+        )
+
+        self.assertIsNone(results[1])
+        self.assertIsInstance(results[2], MailingServiceError)
+
+    def test_send_messages_overloaded(self):
+        self.server.response_status = 503
+
+        results = self.mailing_service.send_message_batch(self.messages[:4])
+
+        self.assertEqual(len(results), 4)
+        self.assertTrue(
+            all(
+                isinstance(error, MailingServiceOverloaded) for error in results.values()
+            )
+        )
+
+    def test_send_messages_one_by_one(self):
+        self.mailing_service.batch_size = 0
+
+        self.mailing_service.send_messages(self.messages)
+
+        self.assertEqual(self.server.requests_count, 10)
+
+
+class AsyncMailingServiceClientTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = MailingServiceStubServer(latency=0.05).start()
+        self.mailing_service = AsyncMailingServiceClient(
+            base_url=self.server.url, jwt_token="token", concurrency=5
+        )
+        self.messages = [
+            OutgoingMessage(message_id=i, phone_number="79123456789", text="Test")
+            for i in range(20)
+        ]
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_send_messages(self):
+        results = self.mailing_service.send_messages_sync(self.messages)
+
+        self.assertEqual(
+            results, {message.message_id: None for message in self.messages}
+        )
+        self.assertEqual(self.server.requests_count, 20)
+
+    def test_send_messages_bounded_concurrency(self):
+        self.mailing_service.send_messages_sync(self.messages)
+
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, 5)
+
+    def test_send_messages_collects_errors(self):
+        with patch.object(
+            self.mailing_service, "check_response", side_effect=[None, Exception()]
+        ):
+            results = self.mailing_service.send_messages_sync(self.messages[:2])
+
+        self.assertEqual(sum(error is not None for error in results.values()), 1)
+
+    def test_send_messages_backs_off_when_overloaded(self):
+        self.server.response_status = 503
+
+        results = self.mailing_service.send_messages_sync(self.messages[:4])
+
+        self.assertTrue(
+            all(
+                isinstance(error, MailingServiceOverloaded) for error in results.values()
+            )
+        )
+        self.assertEqual(self.mailing_service.concurrency_limit.limit, 1)
+
+    def test_send_messages_checks_circuit_off_the_event_loop(self):
+        threads = []
+
+        def record_thread(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return 0
+
+        circuit_breaker = MagicMock()
+        circuit_breaker.allow_request.side_effect = record_thread
+        circuit_breaker.record.side_effect = record_thread
+        self.mailing_service.circuit_breaker = circuit_breaker
+
+        results = self.mailing_service.send_messages_sync(self.messages[:2])
+
+        self.assertEqual(results, {0: None, 1: None})
+        self.assertEqual(len(threads), 4)
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+class MailingBackendsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.messages = [
+            OutgoingMessage(message_id=i, phone_number="79123456789", text="Тест")
+            for i in range(3)
+        ]
+
+    def test_create_mailing_backend(self):
+        circuit_breaker = MagicMock()
+
+        backend = create_mailing_backend("http", circuit_breaker=circuit_breaker)
+
+        self.assertIsInstance(backend, MailingServiceClient)
+        self.assertIs(backend.circuit_breaker, circuit_breaker)
+        self.assertIsInstance(
+            create_mailing_backend("async_http"), AsyncMailingServiceBackend
+        )
+        self.assertIsInstance(create_mailing_backend("fake"), FakeMailingService)
+
+    def test_create_unknown_mailing_backend(self):
+        with self.assertRaises(ValueError):
+            create_mailing_backend("smtp")
+
+    def test_fake_mailing_service(self):
+        backend = FakeMailingService(latency=0, error_rate=0)
+
+        self.assertEqual(
+            backend.send_messages(self.messages), {0: None, 1: None, 2: None}
+        )
+        self.assertEqual(backend.sent_count, 3)
+
+    def test_fake_mailing_service_errors(self):
+        backend = FakeMailingService(latency=0, error_rate=1)
+
+        results = backend.send_messages(self.messages)
+
+        self.assertTrue(
+            all(
+                isinstance(error, MailingServiceOverloaded) for error in results.values()
+            )
+        )
+        self.assertEqual(backend.failed_count, 3)
+
+    def test_file_mailing_service(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "messages.ndjson")
+            backend = FileMailingService(path)
+
+            backend.send_messages(self.messages[:2])
+            results = backend.send_messages(self.messages[2:])
+
+            with open(path, encoding="utf-8") as file:
+                lines = [json.loads(line) for line in file]
+
+        self.assertEqual(results, {2: None})
+        self.assertEqual([line["id"] for line in lines], [0, 1, 2])
+        self.assertEqual(lines[0], {"id": 0, "phone": "79123456789", "text": "Тест"})
+
+
+class TokenBucketTestCase(SimpleTestCase):
+    def setUp(self):
+        self.script_mock = MagicMock()
+        redis_client_mock = MagicMock()
+        redis_client_mock.register_script.return_value = self.script_mock
+
+        with patch(
+            "external.rate_limit.get_redis_client", return_value=redis_client_mock
+        ):
+            self.bucket = TokenBucket(key="test", rate=10, capacity=20)
+
+    def test_try_acquire(self):
+        self.script_mock.return_value = b"0.25"
+
+        self.assertEqual(self.bucket.try_acquire(), 0.25)
+        self.script_mock.assert_called_once_with(keys=["test"], args=[10, 20, 1])
+
+    def test_try_acquire_without_redis(self):
+        self.script_mock.side_effect = RedisError()
+
+        with self.assertLogs("API", level="WARNING"):
+            self.assertEqual(self.bucket.try_acquire(), 0)
+
+    @patch("external.rate_limit.time.sleep")
+    def test_acquire_waits_for_tokens(self, sleep_mock):
+        self.script_mock.side_effect = [b"0.1", b"0.05", b"0"]
+
+        self.bucket.acquire()
+
+        self.assertEqual(self.script_mock.call_count, 3)
+        self.assertEqual(
+            [call.args[0] for call in sleep_mock.call_args_list], [0.1, 0.05]
+        )
+
+    def test_acquire_async_calls_redis_off_the_event_loop(self):
+        self.script_mock.side_effect = [b"0.01", b"0"]
+
+        with patch(
+            "external.rate_limit.asyncio.to_thread", wraps=asyncio.to_thread
+        ) as to_thread_mock:
+            asyncio.run(self.bucket.acquire_async())
+
+        self.assertEqual(self.script_mock.call_count, 2)
+        self.assertEqual(to_thread_mock.call_count, 2)
+
+    @patch("external.rate_limit.MAILING_SERVICE_RATE_LIMIT_BURST", 0)
+    @patch("external.rate_limit.MAILING_SERVICE_RATE_LIMIT", 0.5)
+    @patch("external.rate_limit.get_redis_client", MagicMock())
+    def test_create_rate_limiter_below_one_request_per_second(self):
+        rate_limiter = create_rate_limiter()
+
+        self.assertEqual(rate_limiter.rate, 0.5)
+        self.assertEqual(rate_limiter.capacity, 1)
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.redis_client_mock = MagicMock()
+        self.allow_script_mock = MagicMock()
+        self.record_script_mock = MagicMock()
+        self.redis_client_mock.register_script.side_effect = [
+            self.allow_script_mock,
+            self.record_script_mock,
+        ]
+
+        patcher = patch(
+            "external.circuit_breaker.get_redis_client",
+            return_value=self.redis_client_mock,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.circuit_breaker = CircuitBreaker(
+            key="test",
+            failure_rate=0.5,
+            min_requests=20,
+            window=30,
+            open_timeout=10,
+            probes=3,
+        )
+
+    def test_allow_request(self):
+        self.allow_script_mock.return_value = b"2.5"
+
+        self.assertEqual(self.circuit_breaker.allow_request(), 2.5)
+        self.allow_script_mock.assert_called_once_with(keys=["test"], args=[10, 3])
+
+    def test_allow_request_without_redis(self):
+        self.allow_script_mock.side_effect = RedisError()
+
+        self.assertEqual(self.circuit_breaker.allow_request(), 0)
+
+    def test_record(self):
+        self.record_script_mock.return_value = [b"open", 1]
+
+        with self.assertLogs("API", level="WARNING"):
+            self.circuit_breaker.record(failed=True)
+
+        self.record_script_mock.assert_called_once_with(
+            keys=["test"], args=[1, 30, 20, 0.5, 3, 10]
+        )
+
+    def test_get_retry_after(self):
+        pipeline = self.redis_client_mock.pipeline.return_value.__enter__.return_value
+        pipeline.execute.return_value = [[b"open", b"100.0"], (104, 500000)]
+
+        self.assertEqual(self.circuit_breaker.get_retry_after(), 5.5)
+
+        pipeline.execute.return_value = [[b"half_open", b"100.0"], (104, 500000)]
+
+        self.assertEqual(self.circuit_breaker.get_retry_after(), 0)
+
+
+class AdaptiveConcurrencyLimitTestCase(SimpleTestCase):
+    def test_additive_increase(self):
+        concurrency_limit = AdaptiveConcurrencyLimit(max_limit=10, initial_limit=2)
+
+        for _ in range(2):
+            concurrency_limit.on_success()
+
+        self.assertEqual(concurrency_limit.limit, 3)
+
+    def test_increase_is_capped(self):
+        concurrency_limit = AdaptiveConcurrencyLimit(max_limit=3)
+
+        for _ in range(10):
+            concurrency_limit.on_success()
+
+        self.assertEqual(concurrency_limit.limit, 3)
+
+    def test_multiplicative_decrease(self):
+        concurrency_limit = AdaptiveConcurrencyLimit(max_limit=100, min_limit=2)
+
+        concurrency_limit.on_overload()
+        self.assertEqual(concurrency_limit.limit, 50)
+
+        for _ in range(10):
+            concurrency_limit.on_overload()
+        self.assertEqual(concurrency_limit.limit, 2)